@@ -0,0 +1,302 @@
+# benchmarks/_common.py
+"""
+ベンチマークのスクリプトで共通に使う処理。
+Qtはoffscreenのプラットフォームで動かし、結果はJSONファイルに書き出す。
+--baselineに以前の結果のJSONを渡すと、許容範囲（--tolerance）を超えて遅くなった項目を報告し、終了コード1で終わる。
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # Windowsにはresourceモジュールが無い
+    resource = None
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_DATA_DIR = REPO_ROOT / "sample_data"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# 子プロセスが結果のJSONを出力する行の先頭に付ける文字列（CalciteのDEBUG出力と区別する）
+RESULT_PREFIX = "BENCH_RESULT "
+
+# 環境の情報として、バージョンを記録するパッケージ
+TRACKED_PACKAGES = (
+    "PySide6", "pandas", "numpy", "matplotlib", "seaborn", "scipy",
+    "statsmodels", "scikit-posthocs", "statannotations", "pyarrow",
+)
+
+# 以前の結果と比べて、これ以上遅くなった場合に回帰とみなす割合の既定値
+DEFAULT_TOLERANCE = 0.25
+
+
+def setup_headless():
+    """
+    このプロセスでCalciteを画面なしで動かせるようにする。
+    calciteをimportする前に呼び出すこと。
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+
+
+def headless_env(**extra):
+    """子プロセスでCalciteを画面なしで動かすための環境変数の辞書を返す"""
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+    env.update({key: str(value) for key, value in extra.items()})
+    return env
+
+
+def peak_rss_bytes():
+    """このプロセスの最大常駐メモリ（バイト）を返す。取得できない場合はNone。"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linuxはキロバイト、macOSはバイト単位
+        return peak if sys.platform == "darwin" else peak * 1024
+    return None
+
+
+def current_rss_bytes():
+    """このプロセスの現在の常駐メモリ（バイト）を返す。取得できない場合はNone。"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def summarize(samples):
+    """計測した時間（秒）のリストを、最小・中央値・平均・最大の辞書にまとめる"""
+    return {
+        "n": len(samples),
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "max_s": max(samples),
+    }
+
+
+def make_symmetrical_data(n_rows, n_groups=4, n_hue=2, n_facets=1, seed=0):
+    """
+    カテゴリの組み合わせが均等な合成データを作る（plot.pyのcreate_symmetrical_dataと同じ考え方）。
+    列は group（X軸）, subgroup（色）, facet（分割）, value（正規分布）, dose（groupごとの数値）,
+    x_value（連続値）, before/after（対応のある2列）。
+    カテゴリごとに平均をずらし、検定やグラフがもっともらしい結果になるようにする。
+    """
+    # bench_startupの子プロセスでは起動時間の計測前にpandasを読み込まないよう、ここでimportする
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    combos = list(itertools.product(range(n_groups), range(max(n_hue, 1)), range(max(n_facets, 1))))
+    codes = np.array(combos)[np.arange(n_rows) % len(combos)]
+    group, hue, facet = codes[:, 0], codes[:, 1], codes[:, 2]
+
+    mean = 15 + 2.0 * group + 1.5 * hue + 3.0 * facet
+    value = rng.normal(mean, 4, size=n_rows)
+    dose = 10.0 ** (group - n_groups / 2)
+    return pd.DataFrame({
+        "group": np.array([f"G{i + 1}" for i in range(n_groups)])[group],
+        "subgroup": np.array([f"S{i + 1}" for i in range(max(n_hue, 1))])[hue],
+        "facet": np.array([f"F{i + 1}" for i in range(max(n_facets, 1))])[facet],
+        "value": value,
+        "dose": dose,
+        "x_value": dose * rng.lognormal(0, 0.3, size=n_rows),
+        "before": value,
+        "after": value + rng.normal(1.0, 2.0, size=n_rows),
+    })
+
+
+def capture_message_boxes():
+    """
+    QMessageBoxのダイアログを表示せずに記録するようにする（画面なしでモーダルのダイアログを待ち続けないため）。
+    記録された (種類, タイトル, 本文) が追加されていくリストを返す。
+    """
+    from PySide6.QtWidgets import QMessageBox
+
+    messages = []
+
+    def record(kind):
+        def show(parent, title, text, *args, **kwargs):
+            messages.append((kind, title, text))
+            return QMessageBox.StandardButton.Ok
+        return staticmethod(show)
+
+    for kind in ("critical", "warning", "information", "question"):
+        setattr(QMessageBox, kind, record(kind))
+    return messages
+
+
+def measure(func, repeat=5, warmup=0):
+    """funcをwarmup回実行してから、repeat回の実行時間を計測する。(時間のリスト, 最後の戻り値) を返す。"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def run_python(args, env=None, timeout=300):
+    """
+    現在のPythonで子プロセスを実行し、(CompletedProcess, 実行時間) を返す。
+    argsはPythonの引数のリスト（["-c", "..."] など）。
+    """
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable] + list(args), env=env or headless_env(),
+        capture_output=True, text=True, timeout=timeout, cwd=REPO_ROOT,
+    )
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(
+            f"Benchmark subprocess failed ({completed.returncode}): {' '.join(args)}\n{completed.stderr[-2000:]}"
+        )
+    return completed, elapsed
+
+
+def emit_child_result(result):
+    """子プロセスから親に結果を渡す。親はparse_child_resultで読み取る。"""
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def parse_child_result(stdout):
+    """子プロセスの標準出力から、emit_child_resultで出力された最後の結果を取り出す"""
+    for line in reversed(stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError("Benchmark subprocess did not report a result.")
+
+
+def environment_info():
+    """結果を比べる際に必要な、実行環境の情報を返す"""
+    versions = {}
+    for package in TRACKED_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "qt_platform": os.environ.get("QT_QPA_PLATFORM", "offscreen"),
+        "packages": versions,
+    }
+
+
+def make_parser(description):
+    """各ベンチマークに共通の引数を持つArgumentParserを作成する"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed repetitions per case")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="JSON file to write (default: benchmarks/results/<benchmark>.json)")
+    parser.add_argument("--baseline", type=Path, default=None,
+                        help="previous result JSON to compare against; exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"allowed relative slowdown against the baseline (default: {DEFAULT_TOLERANCE})")
+    return parser
+
+
+def find_regressions(results, baseline_results, metrics, tolerance):
+    """
+    nameが同じ結果どうしで、metricsの値が許容範囲を超えて大きくなったものを
+    (name, 指標, 以前の値, 今回の値) のリストで返す。
+    """
+    previous = {result["name"]: result for result in baseline_results}
+    regressions = []
+    for result in results:
+        old = previous.get(result["name"])
+        if old is None:
+            continue
+        for metric in metrics:
+            old_value, new_value = _lookup(old, metric), _lookup(result, metric)
+            if old_value is None or new_value is None:
+                continue
+            if new_value > old_value * (1 + tolerance):
+                regressions.append((result["name"], metric, old_value, new_value))
+    return regressions
+
+
+def _lookup(result, metric):
+    """"wall.median_s" のような、ドットで区切った名前で入れ子の値を取り出す"""
+    value = result
+    for key in metric.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value if isinstance(value, (int, float)) else None
+
+
+def finish(benchmark, results, args, metrics):
+    """
+    結果をJSONファイルに書き出し、基準の結果と比較する。終了コードを返す。
+    metricsには回帰の判定に使う指標の名前（"wall.median_s" など）を渡す。
+    """
+    report = {
+        "benchmark": benchmark,
+        "environment": environment_info(),
+        "metrics": list(metrics),
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"{benchmark}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {output}")
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline.get("results", []), metrics, args.tolerance)
+    for name, metric, old_value, new_value in regressions:
+        print(f"REGRESSION {name} {metric}: {old_value:.4g} -> {new_value:.4g} "
+              f"(+{(new_value / old_value - 1) * 100:.0f}%)")
+    if regressions:
+        return 1
+    print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+def print_table(rows, columns):
+    """結果の一覧を、列をそろえて標準出力に表示する。columnsは (見出し, 値を取り出す関数) のリスト。"""
+    cells = [[header for header, _ in columns]]
+    for row in rows:
+        cells.append([_format_cell(getter(row)) for _, getter in columns])
+    widths = [max(len(line[i]) for line in cells) for i in range(len(columns))]
+    for line in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+
+def _format_cell(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    return str(value)
@@ -0,0 +1,222 @@
+# benchmarks/bench_render.py
+"""
+GraphManagerの各グラフの描画時間のベンチマーク。
+
+合成データ（_common.make_symmetrical_data）の行数・サブグループ（色）の数・ファセットの数を変えながら、
+draw_categorical_plot（bar, boxplot, violin, pointplot, lineplot, scatter, summary_scatter）、
+draw_paired_scatterとdraw_histogramでFigureを組み立て、Aggで描画するまでの時間を計測する。
+アプリと同じく、描画済みのFigureは次の描画で使い回す。
+
+ピークメモリは、計測とは別に1回だけtracemallocを有効にして描画し、
+描画中に確保されたメモリ（NumPyの配列を含む）の最大値を記録する。
+
+使い方:
+    python benchmarks/bench_render.py [--rows 1000 100000] [--hues 0 4] [--facets 1 3] [--kinds bar violin]
+"""
+
+import itertools
+import sys
+import time
+import tracemalloc
+
+import _common
+from _common import summarize
+
+CATEGORICAL_KINDS = ("bar", "boxplot", "violin", "pointplot", "lineplot", "scatter", "summary_scatter")
+ALL_KINDS = CATEGORICAL_KINDS + ("paired_scatter", "histogram")
+
+# 既定で計測する行数・サブグループの数（0はサブグループなし）・ファセットの数
+DEFAULT_ROWS = (1_000, 10_000, 100_000)
+DEFAULT_HUES = (0, 3)
+DEFAULT_FACETS = (1, 3)
+
+# X軸のカテゴリの数
+DEFAULT_GROUPS = 4
+
+# 対応のある散布図は1組ごとに線を引くため、行数に比例して遅くなる（2万行で数十秒）。
+# これを超える行数は、--paired-max-rowsで明示しない限り計測しない
+PAIRED_SCATTER_MAX_ROWS = 10_000
+
+# 回帰の判定に使う指標
+METRICS = ("wall.median_s", "peak_traced_bytes")
+
+
+def _data_settings(kind, hue, facets):
+    """グラフの種類ごとに、合成データのどの列を使うかを決める"""
+    if kind == "paired_scatter":
+        return {"col1": "before", "col2": "after"}
+    settings = {
+        "y_col": "value",
+        "x_col": {"scatter": "x_value", "summary_scatter": "dose", "lineplot": "dose"}.get(kind, "group"),
+        "subgroup_col": "subgroup" if hue else "",
+        "facet_col": "facet" if facets > 1 and kind != "histogram" else "",
+    }
+    if kind == "histogram":
+        settings["x_col"] = ""
+    return settings
+
+
+def iter_configurations(kinds, rows, hues, facets, paired_max_rows=PAIRED_SCATTER_MAX_ROWS):
+    """計測する (グラフの種類, 行数, サブグループの数, ファセットの数) を順に返す。使わない次元は省く。"""
+    seen = set()
+    for kind, n_rows, hue, n_facets in itertools.product(kinds, rows, hues, facets):
+        if kind == "paired_scatter":
+            if n_rows > paired_max_rows:
+                continue
+            hue, n_facets = 0, 1
+        elif kind == "histogram":
+            n_facets = 1
+        config = (kind, n_rows, hue, n_facets)
+        if config not in seen:
+            seen.add(config)
+            yield config
+
+
+class RenderBench:
+    """
+    画面に表示しないMainWindowのGraphManagerを使って、描画用スレッドを介さずにFigureを組み立てる。
+    グラフの設定は、プロパティのパネルの既定値を使う。
+    """
+    def __init__(self):
+        from PySide6.QtCore import QCoreApplication
+        from PySide6.QtWidgets import QApplication
+
+        QCoreApplication.setOrganizationName("CalciteBenchmark")
+        QCoreApplication.setApplicationName("Calcite")
+        self.app = QApplication.instance() or QApplication(sys.argv)
+        self.messages = _common.capture_message_boxes()
+
+        from calcite.main_window import MainWindow
+        from calcite.handlers.graph_renderer import snapshot_frame
+
+        self._snapshot_frame = snapshot_frame
+        self.window = MainWindow()
+        self.graph_manager = self.window.graph_manager
+
+    def close(self):
+        self.graph_manager.shutdown()
+        self.window.action_handler.shutdown()
+        self.window.deleteLater()
+
+    def make_properties(self, df, data_settings):
+        """
+        プロパティのパネルの既定値に、サブグループの色（アプリと同じく既定のパレットから割り当てる）を加える
+        """
+        format_tab = self.window.properties_widget.format_tab
+        hue_col = data_settings.get("subgroup_col")
+        format_tab.update_subgroup_color_ui(sorted(df[hue_col].unique()) if hue_col else [])
+        properties = self.window.properties_widget.get_properties()
+        properties.update(data_settings)
+        return properties
+
+    def make_state(self, df, kind, data_settings, properties):
+        """GraphManager._capture_render_stateと同じ形の描画条件を作る"""
+        return {
+            "df": self._snapshot_frame(df),
+            "properties": dict(properties),
+            "data_settings": data_settings,
+            "graph_type": kind,
+            "statistical_annotations": [],
+            "paired_annotations": [],
+            "regression_line_params": None,
+            "fit_params": None,
+        }
+
+    def render(self, state):
+        """Figureを組み立ててAggで描画し、(組み立ての時間, 描画の時間) を返す"""
+        start = time.perf_counter()
+        fig = self.graph_manager._render_figure(state)
+        built = time.perf_counter()
+        if fig is None:
+            raise RuntimeError("The graph manager returned no figure.")
+        fig.canvas.draw()
+        drawn = time.perf_counter()
+        # 表示から外れたFigureと同じく、次の描画で使い回させる
+        self.graph_manager._recycle_figure(fig)
+        return built - start, drawn - built
+
+
+def bench_configuration(bench, kind, n_rows, hue, n_facets, n_groups, repeat):
+    name = f"{kind}/rows={n_rows}/hue={hue}/facets={n_facets}"
+    result = {"name": name, "kind": kind, "rows": n_rows, "hue": hue, "facets": n_facets, "groups": n_groups}
+    df = _common.make_symmetrical_data(n_rows, n_groups=n_groups, n_hue=hue, n_facets=n_facets)
+    data_settings = _data_settings(kind, hue, n_facets)
+    properties = bench.make_properties(df, data_settings)
+
+    try:
+        # 1回目はseabornの内部のキャッシュなどを温めるため、計測しない
+        bench.render(bench.make_state(df, kind, data_settings, properties))
+        build, draw, wall = [], [], []
+        for _ in range(repeat):
+            state = bench.make_state(df, kind, data_settings, properties)
+            start = time.perf_counter()
+            build_time, draw_time = bench.render(state)
+            wall.append(time.perf_counter() - start)
+            build.append(build_time)
+            draw.append(draw_time)
+
+        state = bench.make_state(df, kind, data_settings, properties)
+        tracemalloc.start()
+        bench.render(state)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    except Exception as e:
+        tracemalloc.stop()
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    result.update({
+        "wall": summarize(wall),
+        "build": summarize(build),
+        "draw": summarize(draw),
+        "peak_traced_bytes": peak,
+        "rss_bytes": _common.current_rss_bytes(),
+    })
+    return result
+
+
+def main():
+    parser = _common.make_parser("Measure render time and memory for every Calcite graph type.")
+    parser.set_defaults(repeat=3)
+    parser.add_argument("--kinds", nargs="+", choices=ALL_KINDS, default=list(ALL_KINDS))
+    parser.add_argument("--rows", nargs="+", type=int, default=list(DEFAULT_ROWS))
+    parser.add_argument("--hues", nargs="+", type=int, default=list(DEFAULT_HUES),
+                        help="number of sub-group (colour) levels; 0 disables the sub-group")
+    parser.add_argument("--facets", nargs="+", type=int, default=list(DEFAULT_FACETS))
+    parser.add_argument("--groups", type=int, default=DEFAULT_GROUPS, help="number of X-axis categories")
+    parser.add_argument("--paired-max-rows", type=int, default=PAIRED_SCATTER_MAX_ROWS,
+                        help="largest row count to measure for paired_scatter")
+    args = parser.parse_args()
+    _common.setup_headless()
+
+    bench = RenderBench()
+    results = []
+    try:
+        for kind, n_rows, hue, n_facets in iter_configurations(
+                args.kinds, args.rows, args.hues, args.facets, args.paired_max_rows):
+            result = bench_configuration(bench, kind, n_rows, hue, n_facets, args.groups, args.repeat)
+            results.append(result)
+            if "error" in result:
+                print(f"{result['name']}: {result['error']}")
+            else:
+                print(f"{result['name']}: {result['wall']['median_s']:.4f} s, "
+                      f"peak {result['peak_traced_bytes'] / 2**20:.1f} MiB", flush=True)
+    finally:
+        bench.close()
+
+    print()
+    _common.print_table([r for r in results if "error" not in r], [
+        ("name", lambda r: r["name"]),
+        ("median_s", lambda r: r["wall"]["median_s"]),
+        ("build_s", lambda r: r["build"]["median_s"]),
+        ("draw_s", lambda r: r["draw"]["median_s"]),
+        ("peak_mib", lambda r: r["peak_traced_bytes"] / 2**20),
+    ])
+    status = _common.finish("render", results, args, METRICS)
+    if any("error" in r for r in results):
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# benchmarks/bench_startup.py
+"""
+calciteの起動時間のベンチマーク。
+
+- startup/cold: 新しいプロセスでcalcite.mainを読み込んでplot()を実行し、ウィンドウが表示されるまでの時間
+  （CALCITE_EXIT_AFTER_STARTUPを設定して、表示直後に終了させる）。
+  内訳として、読み込みの時間（import）とplot()の呼び出しから表示までの時間（window）も記録する
+- startup/warm_window: calciteを読み込み済みのプロセスで、MainWindowを新しく作って表示するまでの時間
+- import/...: `python -X importtime` で計測したcalcite.mainの読み込み時間と、パッケージごとの内訳、
+  遅延して読み込むモジュール（lazy_imports.PREWARM_MODULES）それぞれの追加の読み込み時間
+- first_render/...: sample_dataのCSVを読み込んでから、最初のグラフが描画されるまでの時間と、
+  2回目以降（キャッシュを使わない）の描画時間
+
+使い方:
+    python benchmarks/bench_startup.py [--repeat N] [--output results.json] [--baseline old.json]
+"""
+
+import json
+import re
+import sys
+import time
+from collections import defaultdict
+
+import _common
+from _common import SAMPLE_DATA_DIR, summarize
+
+# 最初の描画を計測するsample_dataのファイルと、グラフの種類・データの設定
+# （for_contingency.csvは数値の列が無く、グラフの対象にならないため含めない）
+RENDER_CASES = (
+    ("for_anova.csv", "bar", {"x_col": "group", "y_col": "value"}),
+    ("for_ttest.csv", "boxplot", {"x_col": "group", "y_col": "value"}),
+    ("for_point_plot.csv", "pointplot", {"x_col": "group", "y_col": "value", "subgroup_col": "treatment"}),
+    ("for_4pl_regression.csv", "scatter", {"x_col": "dose", "y_col": "response", "subgroup_col": "group"}),
+    ("for_correlation.csv", "scatter", {"x_col": "x_significant", "y_col": "y_significant"}),
+    ("for_paired_ttest.csv", "paired_scatter", {"col1": "before", "col2": "after"}),
+)
+
+# パッケージごとの読み込み時間の内訳として、結果に残す上位の件数
+TOP_IMPORT_PACKAGES = 15
+
+# 描画の完了を待つ時間の上限（秒）
+RENDER_TIMEOUT_SECONDS = 120
+
+# 回帰の判定に使う指標
+METRICS = ("wall.median_s", "process_wall.median_s", "warm_render.median_s")
+
+_IMPORTTIME_PATTERN = re.compile(r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+
+# --- 親プロセス側の計測 ---
+
+def bench_cold_startup(repeat):
+    """新しいプロセスでウィンドウを表示するまでの時間を計測する"""
+    env = _common.headless_env(CALCITE_EXIT_AFTER_STARTUP=1)
+    visible, imports, window, wall, peaks = [], [], [], [], []
+    for _ in range(repeat):
+        completed, elapsed = _common.run_python([__file__, "--child-startup"], env=env)
+        result = _common.parse_child_result(completed.stdout)
+        if result["window_s"] is None:
+            raise RuntimeError("calcite.main did not record its startup time.")
+        visible.append(result["import_s"] + result["window_s"])
+        imports.append(result["import_s"])
+        window.append(result["window_s"])
+        wall.append(elapsed)
+        peaks.append(result["peak_rss_bytes"])
+    return {
+        "name": "startup/cold",
+        "wall": summarize(visible),
+        "import": summarize(imports),
+        "window": summarize(window),
+        "process_wall": summarize(wall),
+        "peak_rss_bytes": max(peaks) if None not in peaks else None,
+    }
+
+
+def bench_warm_window(repeat):
+    """読み込み済みのプロセスでMainWindowを作って表示するまでの時間を計測する"""
+    completed, _ = _common.run_python([__file__, "--child-warm", str(repeat)])
+    result = _common.parse_child_result(completed.stdout)
+    return {"name": "startup/warm_window", "wall": summarize(result["samples"])}
+
+
+def _parse_importtime(stderr):
+    """-X importtimeの出力を [(モジュール名, 自身の時間, 累積の時間, 深さ)] のリストにする（時間は秒）"""
+    entries = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_PATTERN.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        entries.append((module, int(self_us) / 1e6, int(cumulative_us) / 1e6, (len(indent) - 1) // 2))
+    return entries
+
+
+def bench_imports(repeat):
+    """calcite.mainの読み込み時間と、その内訳・遅延読み込みのモジュールの時間を計測する"""
+    from calcite.lazy_imports import PREWARM_MODULES
+
+    totals = []
+    by_package = defaultdict(list)
+    for _ in range(repeat):
+        completed, _ = _common.run_python(["-X", "importtime", "-c", "import calcite.main"])
+        entries = _parse_importtime(completed.stderr)
+        totals.extend(cumulative for module, _, cumulative, depth in entries
+                      if module == "calcite.main" and depth == 0)
+        package_times = defaultdict(float)
+        for module, self_time, _, _ in entries:
+            package_times[module.split(".")[0]] += self_time
+        for package, seconds in package_times.items():
+            by_package[package].append(seconds)
+
+    results = [{"name": "import/calcite.main", "wall": summarize(totals)}]
+    packages = sorted(by_package, key=lambda p: -sum(by_package[p]) / len(by_package[p]))
+    for package in packages[:TOP_IMPORT_PACKAGES]:
+        results.append({"name": f"import/package/{package}", "wall": summarize(by_package[package])})
+
+    # calcite.mainの読み込み後に、遅延していたモジュールを読み込む際の追加の時間
+    for name in PREWARM_MODULES:
+        samples = []
+        for _ in range(repeat):
+            completed, _ = _common.run_python(["-X", "importtime", "-c", f"import calcite.main; import {name}"])
+            entries = _parse_importtime(completed.stderr)
+            calcite_index = max(i for i, entry in enumerate(entries) if entry[0] == "calcite.main")
+            samples.append(sum(cumulative for _, _, cumulative, depth in entries[calcite_index + 1:] if depth == 0))
+        results.append({"name": f"import/deferred/{name}", "wall": summarize(samples)})
+    return results
+
+
+def bench_first_render(repeat):
+    """sample_dataのファイルごとに、読み込みから最初の描画までの時間を新しいプロセスで計測する"""
+    results = []
+    for file_name, graph_type, settings in RENDER_CASES:
+        first, load, warm, wall, peaks = [], [], [], [], []
+        for _ in range(repeat):
+            completed, elapsed = _common.run_python([
+                __file__, "--child-render", file_name, graph_type, json.dumps(settings), str(repeat),
+            ])
+            result = _common.parse_child_result(completed.stdout)
+            if result.get("error"):
+                raise RuntimeError(f"Rendering {file_name} as {graph_type} failed: {result['error']}")
+            first.append(result["first_render_s"])
+            load.append(result["load_s"])
+            wall.append(result["time_to_first_render_s"])
+            warm.extend(result["warm_render_s"])
+            peaks.append(result["peak_rss_bytes"])
+        results.append({
+            "name": f"first_render/{file_name}:{graph_type}",
+            "wall": summarize(wall),
+            "load": summarize(load),
+            "first_render": summarize(first),
+            "warm_render": summarize(warm),
+            "peak_rss_bytes": max(peaks) if None not in peaks else None,
+        })
+    return results
+
+
+# --- 子プロセス側の処理 ---
+
+def _child_startup():
+    start = time.perf_counter()
+    import calcite.main
+    import_time = time.perf_counter() - start
+
+    calcite.main.plot(prewarm_imports=False)
+    _common.emit_child_result({
+        "import_s": import_time,
+        "window_s": calcite.main.last_startup_seconds,
+        "peak_rss_bytes": _common.peak_rss_bytes(),
+    })
+
+
+def _new_application():
+    from PySide6.QtCore import QCoreApplication
+    from PySide6.QtWidgets import QApplication
+
+    # ウィンドウの位置などの保存先を、普段使っている設定と分ける
+    QCoreApplication.setOrganizationName("CalciteBenchmark")
+    QCoreApplication.setApplicationName("Calcite")
+    return QApplication.instance() or QApplication(sys.argv)
+
+
+def _dispose_window(window):
+    """設定を保存せずにウィンドウを破棄する（closeEventはウィンドウの位置を保存するため呼ばない）"""
+    window.graph_manager.shutdown()
+    window.action_handler.shutdown()
+    window.hide()
+    window.deleteLater()
+
+
+def _child_warm(repeat):
+    from calcite.main_window import MainWindow
+
+    app = _new_application()
+    _common.capture_message_boxes()
+    _dispose_window(MainWindow())
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        window = MainWindow()
+        window.show()
+        app.processEvents()
+        samples.append(time.perf_counter() - start)
+        _dispose_window(window)
+        app.processEvents()
+    _common.emit_child_result({"samples": samples})
+
+
+def _wait_for_render(app, window, previous_fig, messages):
+    """描画用スレッドの描画が終わり、キャンバスに表示されるまでイベントを処理する"""
+    deadline = time.perf_counter() + RENDER_TIMEOUT_SECONDS
+    while window.graph_widget.fig is previous_fig:
+        if messages:
+            raise RuntimeError(messages[-1][2])
+        if time.perf_counter() > deadline:
+            raise RuntimeError("Timed out waiting for the graph to render.")
+        app.processEvents()
+        time.sleep(0.001)
+    window.graph_widget.canvas.draw()
+
+
+def _child_render(file_name, graph_type, settings, repeat):
+    start = time.perf_counter()
+    import pandas as pd
+    from calcite.main_window import MainWindow
+
+    app = _new_application()
+    messages = _common.capture_message_boxes()
+    window = MainWindow()
+    window.show()
+    app.processEvents()
+
+    load_start = time.perf_counter()
+    window.load_dataframe(pd.read_csv(SAMPLE_DATA_DIR / file_name))
+    window.set_graph_type(graph_type)
+    window.data_widget.set_settings(settings)
+    load_time = time.perf_counter() - load_start
+
+    result = {"load_s": load_time}
+    try:
+        render_start = time.perf_counter()
+        window.graph_manager.update_graph()
+        _wait_for_render(app, window, window.graph_widget.fig, messages)
+        end = time.perf_counter()
+        result["first_render_s"] = end - render_start
+        result["time_to_first_render_s"] = end - start
+
+        # 2回目以降はモジュールの読み込みなどが済んだ状態で、キャッシュを使わずに描画させる
+        warm = []
+        for _ in range(repeat):
+            window.graph_manager.clear_figure_cache()
+            render_start = time.perf_counter()
+            window.graph_manager.update_graph()
+            _wait_for_render(app, window, window.graph_widget.fig, messages)
+            warm.append(time.perf_counter() - render_start)
+        result["warm_render_s"] = warm
+    except RuntimeError as e:
+        result["error"] = str(e)
+
+    result["peak_rss_bytes"] = _common.peak_rss_bytes()
+    _dispose_window(window)
+    _common.emit_child_result(result)
+
+
+def main():
+    parser = _common.make_parser("Measure Calcite startup, import and time-to-first-render costs.")
+    parser.add_argument("--skip", action="append", default=[], choices=["cold", "warm", "imports", "render"],
+                        help="skip a section (can be given more than once)")
+    args = parser.parse_args()
+    _common.setup_headless()
+
+    results = []
+    if "cold" not in args.skip:
+        results.append(bench_cold_startup(args.repeat))
+    if "warm" not in args.skip:
+        results.append(bench_warm_window(args.repeat))
+    if "imports" not in args.skip:
+        results.extend(bench_imports(args.repeat))
+    if "render" not in args.skip:
+        results.extend(bench_first_render(args.repeat))
+
+    _common.print_table(results, [
+        ("name", lambda r: r["name"]),
+        ("median_s", lambda r: r["wall"]["median_s"]),
+        ("min_s", lambda r: r["wall"]["min_s"]),
+        ("warm_render_s", lambda r: r.get("warm_render", {}).get("median_s")),
+        ("peak_rss_mb", lambda r: r["peak_rss_bytes"] / 2**20 if r.get("peak_rss_bytes") else None),
+    ])
+    return _common.finish("startup", results, args, METRICS)
+
+
+if __name__ == "__main__":
+    _common.setup_headless()
+    if sys.argv[1:2] == ["--child-startup"]:
+        _child_startup()
+    elif sys.argv[1:2] == ["--child-warm"]:
+        _child_warm(int(sys.argv[2]))
+    elif sys.argv[1:2] == ["--child-render"]:
+        _child_render(sys.argv[2], sys.argv[3], json.loads(sys.argv[4]), int(sys.argv[5]))
+    else:
+        sys.exit(main())
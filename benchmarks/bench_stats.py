@@ -0,0 +1,329 @@
+# benchmarks/bench_stats.py
+"""
+統計処理のベンチマーク。ダイアログを介さずに、StatisticalHandlerが使う処理を直接呼び出す。
+
+- anova_tukey: GroupIndexを作り、ファセットごとに一元配置分散分析とTukeyのHSD検定（facet_stats.anova_facet）
+- kruskal_dunn: ファセットごとにクラスカル・ウォリス検定とダンの検定（facet_stats.kruskal_facet）
+- fit_4pl: サブグループ（曲線）ごとの4PLフィット（dose_response.fit_4pl_batch）
+
+行数・X軸のグループ数・ファセット（4PLでは曲線）の数を変えながら、構成ごとに新しいプロセスで実行し、
+実行時間・プロセスの最大常駐メモリ・参照実装との差を記録する。
+1回目の実行（プロセスプールの起動を含む）は別に記録し、2回目以降の時間をwallとする。
+最大常駐メモリは計測するプロセス自身のもので、プロセスプールのワーカーは含まない。
+参照実装は、分散分析・Tukey・クラスカル・ウォリスがSciPy（f_oneway, tukey_hsd, kruskal）、
+ダンの検定がscikit-posthocs（posthoc_dunn。SciPyには無いため）、4PLが解析的なヤコビアンを使わないcurve_fit。
+
+使い方:
+    python benchmarks/bench_stats.py [--rows 100000 5000000] [--groups 3 6] [--facets 1 64] [--workers 4]
+"""
+
+import itertools
+import json
+import sys
+import time
+
+import _common
+from _common import summarize
+
+WORKLOADS = ("anova_tukey", "kruskal_dunn", "fit_4pl")
+
+# 既定で計測する行数・X軸のグループ数・ファセット（4PLでは曲線）の数
+DEFAULT_ROWS = (10_000, 100_000, 1_000_000)
+DEFAULT_GROUPS = (3, 6)
+DEFAULT_FACETS = (1, 64)
+
+# 参照実装との差の許容範囲。p値は絶対誤差に加えて、TAIL_P_VALUE未満の裾では相対誤差でも比べる
+# （絶対誤差だけでは、有意性の星を決める1e-4付近の誤差を見逃すため）
+P_VALUE_TOLERANCE = 1e-6
+TAIL_P_VALUE = 0.01
+TAIL_RELATIVE_TOLERANCE = 1e-3
+LOG_EC50_TOLERANCE = 1e-3
+
+# 4PLの合成データの用量（log10スケールで等間隔）
+DOSE_LEVELS = 8
+
+# 回帰の判定に使う指標
+METRICS = ("wall.median_s", "peak_rss_bytes")
+
+
+def iter_configurations(workloads, rows, groups, facets):
+    """計測する (処理, 行数, グループ数, ファセット数) を順に返す。4PLはグループ数を使わない。"""
+    seen = set()
+    for workload, n_rows, n_groups, n_facets in itertools.product(workloads, rows, groups, facets):
+        if workload == "fit_4pl":
+            n_groups = 1
+        config = (workload, n_rows, n_groups, n_facets)
+        if config not in seen:
+            seen.add(config)
+            yield config
+
+
+def make_dose_response_data(n_rows, n_curves, seed=0):
+    """
+    曲線ごとにパラメータの異なる4PLの合成データを作る。
+    (log10スケールの用量, 応答) の組のリストと、曲線ごとの真のlog EC50を返す。
+    """
+    import numpy as np
+    from calcite.handlers.dose_response import sigmoid_4pl
+
+    rng = np.random.default_rng(seed)
+    log_doses = np.linspace(-3, 2, DOSE_LEVELS)
+    points = max(n_rows // n_curves, DOSE_LEVELS)
+    datasets, true_log_ec50 = [], []
+    for _ in range(n_curves):
+        bottom, top = rng.uniform(0, 0.1), rng.uniform(0.9, 1.1)
+        hill, log_ec50 = rng.uniform(0.8, 2.0), rng.uniform(-1.5, 0.5)
+        x = np.resize(log_doses, points)
+        y = sigmoid_4pl(x, bottom, top, hill, log_ec50) + rng.normal(0, 0.03, size=points)
+        datasets.append((x, y))
+        true_log_ec50.append(log_ec50)
+    return datasets, true_log_ec50
+
+
+# --- 子プロセスで実行する処理 ---
+
+def _facet_samples(groups, value_col):
+    """ファセットごとの グループ名 -> 値の配列 の辞書のリスト（参照実装との比較用）"""
+    return [groups.group_values(value_col, facet_pos) for facet_pos, _ in groups.facets()]
+
+
+def _max_tail_relative_diff(pairs):
+    """
+    (p値, 参照のp値) の組のリストから、参照のp値がTAIL_P_VALUE未満の組の相対誤差の最大値を返す。
+    NaNを含む組は_max_abs_diffで扱うため除く。
+    """
+    import numpy as np
+
+    diffs = [0.0]
+    for a, b in pairs:
+        if np.isnan(a) or np.isnan(b) or b >= TAIL_P_VALUE:
+            continue
+        if b == 0:
+            diffs.append(0.0 if a == 0 else np.inf)
+        else:
+            diffs.append(abs(a - b) / b)
+    return float(max(diffs))
+
+
+def _max_abs_diff(pairs):
+    """
+    (値, 参照値) の組のリストから、差の絶対値の最大値を返す。
+    両方NaNの組は一致、片方だけNaNの組は不一致（無限大）とみなす。
+    """
+    import numpy as np
+
+    diffs = [0.0]
+    for a, b in pairs:
+        if np.isnan(a) or np.isnan(b):
+            diffs.append(0.0 if np.isnan(a) and np.isnan(b) else np.inf)
+        else:
+            diffs.append(abs(a - b))
+    return float(max(diffs))
+
+
+def _run_group_tests(config, repeat, workers):
+    """anova_tukeyとkruskal_dunnを計測し、参照実装との差を求める"""
+    import numpy as np
+    import scikit_posthocs as sp
+    from scipy import stats
+    from calcite.handlers.grouping import GroupIndex
+    from calcite.handlers.facet_stats import run_facets, anova_facet, kruskal_facet
+    from calcite.handlers.posthoc import tukey_hsd, kruskal_dunn
+
+    df = _common.make_symmetrical_data(
+        config["rows"], n_groups=config["groups"], n_hue=0, n_facets=config["facets"]
+    )
+    facet_col = "facet" if config["facets"] > 1 else None
+    rss_before = _common.current_rss_bytes()
+
+    start = time.perf_counter()
+    groups = GroupIndex(df, "group", None, facet_col)
+    groups.sorted_values("value")
+    index_time = time.perf_counter() - start
+
+    func = anova_facet if config["workload"] == "anova_tukey" else kruskal_facet
+    selected = list(groups.x_labels)
+    # 1回目はプロセスプールの起動などを含むため、別に記録する
+    start = time.perf_counter()
+    run_facets(func, groups, "value", selected, max_workers=workers)
+    first_time = time.perf_counter() - start
+    wall = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        facet_results = run_facets(func, groups, "value", selected, max_workers=workers)
+        wall.append(time.perf_counter() - start)
+
+    samples = _facet_samples(groups, "value")
+    start = time.perf_counter()
+    if config["workload"] == "anova_tukey":
+        reference = [stats.f_oneway(*facet.values()).pvalue for facet in samples]
+    else:
+        reference = [stats.kruskal(*facet.values()).pvalue for facet in samples]
+    reference_time = time.perf_counter() - start
+
+    p_value_pairs = [
+        (result["p_value"] if result else np.nan, p) for (_, _, result), p in zip(facet_results, reference)
+    ]
+    agreement = {
+        "p_value": _max_abs_diff(p_value_pairs),
+        "p_value_tail_relative": _max_tail_relative_diff(p_value_pairs),
+    }
+    # 多重比較は有意かどうかに関わらず、すべてのファセットで参照実装と比べる
+    posthoc_pairs = []
+    for facet in samples:
+        names = sorted(facet)
+        if config["workload"] == "anova_tukey":
+            result = tukey_hsd(facet)
+            matrix = stats.tukey_hsd(*(facet[name] for name in names)).pvalue
+            column = "p_adj"
+        else:
+            _, _, result = kruskal_dunn(facet)
+            matrix = sp.posthoc_dunn(
+                [facet[name] for name in names], p_adjust=None
+            ).to_numpy()
+            column = "p_value"
+        position = {name: i for i, name in enumerate(names)}
+        posthoc_pairs.extend(
+            (row[column], matrix[position[row["group1"]], position[row["group2"]]]) for row in result
+        )
+    agreement["posthoc_p_value"] = _max_abs_diff(posthoc_pairs)
+    agreement["posthoc_p_value_tail_relative"] = _max_tail_relative_diff(posthoc_pairs)
+    agrees = (
+        agreement["p_value"] <= P_VALUE_TOLERANCE and agreement["posthoc_p_value"] <= P_VALUE_TOLERANCE
+        and agreement["p_value_tail_relative"] <= TAIL_RELATIVE_TOLERANCE
+        and agreement["posthoc_p_value_tail_relative"] <= TAIL_RELATIVE_TOLERANCE
+    )
+
+    return {
+        "index_s": index_time,
+        "first_s": first_time,
+        "wall": summarize(wall),
+        "reference_s": reference_time,
+        "agreement": agreement,
+        "agrees": bool(agrees),
+        "significant_facets": int(sum(1 for _, _, r in facet_results if r and r["p_value"] < 0.05)),
+        "data_rss_bytes": rss_before,
+        "min_p_value": float(np.nanmin(reference)) if reference else None,
+    }
+
+
+def _run_fit_4pl(config, repeat, workers):
+    """fit_4plを計測し、解析的なヤコビアンを使わないcurve_fitの結果と比べる"""
+    import numpy as np
+    from scipy.optimize import curve_fit
+    from calcite.handlers.dose_response import fit_4pl_batch, sigmoid_4pl, _initial_guess, FIT_MAXFEV
+
+    datasets, true_log_ec50 = make_dose_response_data(config["rows"], config["facets"])
+    rss_before = _common.current_rss_bytes()
+
+    start = time.perf_counter()
+    fit_4pl_batch(datasets, max_workers=workers)
+    first_time = time.perf_counter() - start
+    wall = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = fit_4pl_batch(datasets, max_workers=workers)
+        wall.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    reference = []
+    for x, y in datasets:
+        try:
+            params, _ = curve_fit(sigmoid_4pl, x, y, p0=_initial_guess(x, y), maxfev=FIT_MAXFEV)
+            reference.append(params[3])
+        except RuntimeError:
+            reference.append(np.nan)
+    reference_time = time.perf_counter() - start
+
+    fitted = [result["params"][3] if result["converged"] else np.nan for result in results]
+    agreement = {
+        "log_ec50": _max_abs_diff(zip(fitted, reference)),
+        "log_ec50_vs_truth": _max_abs_diff(zip(fitted, true_log_ec50)),
+    }
+    return {
+        "first_s": first_time,
+        "wall": summarize(wall),
+        "reference_s": reference_time,
+        "agreement": agreement,
+        "agrees": bool(agreement["log_ec50"] <= LOG_EC50_TOLERANCE),
+        "converged": int(sum(result["converged"] for result in results)),
+        "evaluations": int(sum(result.get("nfev", 0) for result in results)),
+        "data_rss_bytes": rss_before,
+    }
+
+
+def _child(config, repeat, workers):
+    from calcite.handlers.facet_stats import shutdown_executor
+
+    try:
+        if config["workload"] == "fit_4pl":
+            result = _run_fit_4pl(config, repeat, workers)
+        else:
+            result = _run_group_tests(config, repeat, workers)
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        shutdown_executor()
+    result["peak_rss_bytes"] = _common.peak_rss_bytes()
+    _common.emit_child_result(result)
+
+
+# --- 親プロセス ---
+
+def bench_configuration(workload, n_rows, n_groups, n_facets, repeat, workers):
+    config = {"workload": workload, "rows": n_rows, "groups": n_groups, "facets": n_facets}
+    name = f"{workload}/rows={n_rows}/groups={n_groups}/facets={n_facets}"
+    completed, _ = _common.run_python(
+        [__file__, "--child", json.dumps(config), str(repeat), str(workers if workers is not None else "")],
+        timeout=3600,
+    )
+    result = {"name": name, **config}
+    result.update(_common.parse_child_result(completed.stdout))
+    return result
+
+
+def main():
+    parser = _common.make_parser("Measure Calcite statistics workloads and check them against reference results.")
+    parser.set_defaults(repeat=3)
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--rows", nargs="+", type=int, default=list(DEFAULT_ROWS))
+    parser.add_argument("--groups", nargs="+", type=int, default=list(DEFAULT_GROUPS),
+                        help="number of X-axis groups compared by ANOVA and Kruskal-Wallis")
+    parser.add_argument("--facets", nargs="+", type=int, default=list(DEFAULT_FACETS),
+                        help="number of facets (number of curves for fit_4pl)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="process pool size for facet and 4PL batches (default: the app's default)")
+    args = parser.parse_args()
+    _common.setup_headless()
+
+    results = []
+    for workload, n_rows, n_groups, n_facets in iter_configurations(args.workloads, args.rows, args.groups, args.facets):
+        result = bench_configuration(workload, n_rows, n_groups, n_facets, args.repeat, args.workers)
+        results.append(result)
+        if "error" in result:
+            print(f"{result['name']}: {result['error']}")
+        else:
+            print(f"{result['name']}: {result['wall']['median_s']:.4f} s, "
+                  f"agreement {result['agreement']}", flush=True)
+
+    print()
+    _common.print_table([r for r in results if "error" not in r], [
+        ("name", lambda r: r["name"]),
+        ("median_s", lambda r: r["wall"]["median_s"]),
+        ("reference_s", lambda r: r["reference_s"]),
+        ("peak_rss_mb", lambda r: r["peak_rss_bytes"] / 2**20 if r.get("peak_rss_bytes") else None),
+        ("agrees", lambda r: r["agrees"]),
+    ])
+    status = _common.finish("stats", results, args, METRICS)
+    if any("error" in r or not r["agrees"] for r in results):
+        print("Some configurations failed or disagreed with the reference results.")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    _common.setup_headless()
+    if sys.argv[1:2] == ["--child"]:
+        _child(json.loads(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]) if sys.argv[4] else None)
+    else:
+        sys.exit(main())
@@ -0,0 +1,89 @@
+# dialogs/all_pairs_widget.py
+
+from PySide6.QtWidgets import (
+    QGroupBox, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QComboBox,
+    QListWidget, QListWidgetItem, QPushButton
+)
+from PySide6.QtCore import Qt
+
+# 多重比較補正の選択肢（表示名, statsmodelsのメソッド名）。Noneは補正なし
+CORRECTION_METHODS = [
+    ("Holm", 'holm'),
+    ("Bonferroni", 'bonferroni'),
+    ("Benjamini-Hochberg (FDR)", 'fdr_bh'),
+    ("None", None),
+]
+
+
+class AllPairsWidget(QGroupBox):
+    """
+    2群検定のダイアログで、選択したグループのすべてのペアをまとめて検定するための設定欄。
+    チェックを入れると有効になり、対象グループと多重比較補正の方法を選択できる。
+    groupsは (表示用のテキスト, 内部で使うグループ名) のリスト。
+    """
+    def __init__(self, groups, parent=None):
+        super().__init__("Compare all pairs", parent)
+        self.setCheckable(True)
+        self.setChecked(False)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Groups to include:"))
+
+        self.group_list = QListWidget()
+        for display_text, internal_name in groups:
+            item = QListWidgetItem(display_text)
+            item.setData(Qt.ItemDataRole.UserRole, internal_name)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked)
+            self.group_list.addItem(item)
+        layout.addWidget(self.group_list)
+
+        buttons_layout = QHBoxLayout()
+        select_all_button = QPushButton("Select All")
+        select_none_button = QPushButton("Select None")
+        buttons_layout.addWidget(select_all_button)
+        buttons_layout.addWidget(select_none_button)
+        layout.addLayout(buttons_layout)
+
+        form_layout = QFormLayout()
+        self.correction_combo = QComboBox()
+        for display_text, method in CORRECTION_METHODS:
+            self.correction_combo.addItem(display_text, method)
+        form_layout.addRow(QLabel("Correction:"), self.correction_combo)
+        layout.addLayout(form_layout)
+
+        select_all_button.clicked.connect(lambda: self._set_all(Qt.CheckState.Checked))
+        select_none_button.clicked.connect(lambda: self._set_all(Qt.CheckState.Unchecked))
+
+    def _set_all(self, state):
+        for i in range(self.group_list.count()):
+            self.group_list.item(i).setCheckState(state)
+
+    def selected_groups(self):
+        """チェックされているグループの内部名をリストで返す"""
+        return [
+            self.group_list.item(i).data(Qt.ItemDataRole.UserRole)
+            for i in range(self.group_list.count())
+            if self.group_list.item(i).checkState() == Qt.CheckState.Checked
+        ]
+
+    def get_settings(self):
+        """全ペア比較の設定を返す。対象グループが2つ未満の場合はNoneを返す。"""
+        groups = self.selected_groups()
+        if len(groups) < 2:
+            return None
+        return {"all_pairs": True, "groups": groups, "correction": self.correction_combo.currentData()}
+
+
+def build_group_choices(group_names, x_name, hue_name, separator):
+    """
+    内部のグループ名のリストから、AllPairsWidgetに渡す (表示用のテキスト, グループ名) のリストを作成する。
+    """
+    choices = []
+    for name in group_names:
+        if hue_name:
+            x_val, _, hue_val = name.partition(separator)
+            choices.append((f"{x_name}: {x_val}, {hue_name}: {hue_val}", name))
+        else:
+            choices.append((f"{x_name}: {name}", name))
+    return choices
@@ -5,12 +5,14 @@ from PySide6.QtWidgets import (
     QDialogButtonBox, QWidget
 )
 
+from .all_pairs_widget import AllPairsWidget
+
 class MannWhitneyDialog(QDialog):
     """
     マン・ホイットニーのU検定のために2つのグループを選択させるダイアログ。
     TTestDialogをベースに作成。
     """
-    def __init__(self, x_values, hue_values, x_name, hue_name, parent=None):
+    def __init__(self, x_values, hue_values, x_name, hue_name, parent=None, group_choices=None):
         super().__init__(parent)
         # ウィンドウのタイトルを変更
         self.setWindowTitle("Mann-Whitney U Test")
@@ -28,6 +30,12 @@ class MannWhitneyDialog(QDialog):
         group_selectors_layout.addWidget(self.group2_widget)
         
         main_layout.addLayout(group_selectors_layout)
+
+        self.all_pairs_widget = None
+        if group_choices:
+            self.all_pairs_widget = AllPairsWidget(group_choices)
+            self.all_pairs_widget.toggled.connect(self._on_all_pairs_toggled)
+            main_layout.addWidget(self.all_pairs_widget)
         
         button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         main_layout.addWidget(button_box)
@@ -35,6 +43,11 @@ class MannWhitneyDialog(QDialog):
         button_box.accepted.connect(self.accept)
         button_box.rejected.connect(self.reject)
 
+    def _on_all_pairs_toggled(self, checked):
+        """全ペア比較を選んだ場合は、2群の選択欄を無効にする"""
+        self.group1_widget.setEnabled(not checked)
+        self.group2_widget.setEnabled(not checked)
+
     def _create_group_selector(self, title, x_values, hue_values):
         """片方のグループを選択するためのUIウィジェットを作成する（TTestDialogと共通）"""
         widget = QWidget()
@@ -54,6 +67,15 @@ class MannWhitneyDialog(QDialog):
         return widget
 
     def get_settings(self):
+        """
+        ユーザーが選択した2つのグループの条件を返す。
+        全ペア比較が選ばれている場合は、AllPairsWidgetの設定を返す。
+        """
+        if self.all_pairs_widget is not None and self.all_pairs_widget.isChecked():
+            return self.all_pairs_widget.get_settings()
+        return self._get_pair_settings()
+
+    def _get_pair_settings(self):
         """ユーザーが選択した2つのグループの条件を返す（TTestDialogと共通）"""
         
         def get_widget_values(group_widget):
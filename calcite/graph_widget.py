@@ -7,6 +7,16 @@ from PySide6.QtWidgets import QWidget, QVBoxLayout
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
+from .profiling import span
+
+
+class ProfiledCanvas(FigureCanvas):
+    """描画（Aggでのラスタライズ）の時間を計測するキャンバス"""
+    def draw(self):
+        with span("canvas_draw", "qt"):
+            super().draw()
+
+
 class GraphWidget(QWidget):
     """
     Matplotlibのグラフを描画するためのウィジェット。
@@ -23,7 +33,7 @@ class GraphWidget(QWidget):
         # ここで複雑なDPI計算は不要。Matplotlibは内部的に高品質な描画を行う。
         self.fig = Figure(tight_layout=True)
         self.ax = self.fig.add_subplot(111)
-        self.canvas = FigureCanvas(self.fig)
+        self.canvas = ProfiledCanvas(self.fig)
 
         # ウィジェットのレイアウトを設定
         layout = QVBoxLayout()
@@ -1,20 +1,15 @@
 # handlers/action_handler.py
 
 import pandas as pd
-import json
-import zipfile
-import tempfile
 import numpy as np
 import io
 import os
 import traceback
 
-from PySide6.QtWidgets import QFileDialog, QMessageBox, QApplication, QVBoxLayout
-from scipy.optimize import curve_fit
-from statsmodels.stats.multicomp import pairwise_tukeyhsd
-import scikit_posthocs as sp
+from PySide6.QtWidgets import QFileDialog, QMessageBox, QApplication, QVBoxLayout, QAbstractItemView
 
 from ..pandas_model import PandasModel
+from ..profiling import span, profiled
 
 # --- Dialogs ---
 from ..dialogs.restructure_dialog import RestructureDialog
@@ -23,24 +18,10 @@ from ..dialogs.pivot_dialog import PivotDialog
 from ..dialogs.advanced_filter_dialog import AdvancedFilterDialog
 from ..dialogs.license_dialog import LicenseDialog
 
-from .statistical_handler import StatisticalHandler
-
-class NumpyArrayEncoder(json.JSONEncoder):
-    """
-    NumPyのndarrayや数値型を、JSONが理解できるPythonの基本型に変換する。
-    """
-    def default(self, obj):
-        if isinstance(obj, np.ndarray):
-            return obj.tolist() # ndarray -> list
-        if isinstance(obj, pd.Series):
-            return obj.tolist()
-        if isinstance(obj, (np.int_, np.intc, np.intp, np.int8,
-                            np.int16, np.int32, np.int64, np.uint8,
-                            np.uint16, np.uint32, np.uint64)):
-            return int(obj)     # numpy int -> python int
-        if isinstance(obj, (np.float64, np.float16, np.float32)):
-            return float(obj)  # numpy float -> python float
-        return json.JSONEncoder.default(self, obj)
+from .data_loader import DataLoadWorker, BackgroundLoadTask, iter_csv_chunks, combine_csv_chunks
+from .project_io import write_project, read_project_json, project_data_reader
+from .filter_compiler import compile_filter, describe_filter
+from .formula_engine import compile_formula
 
 class ActionHandler:
     
@@ -48,10 +29,39 @@ class ActionHandler:
     
     def __init__(self, main_window):
         self.main = main_window
-        # StatisticalHandlerのインスタンスを生成し、参照を保持する
-        self.statistical_handler = StatisticalHandler(main_window)
+        # StatisticalHandlerはscipyなどの読み込みを伴うため、初めて使うときに生成する
+        self._statistical_handler = None
+        # バックグラウンドで実行中の読み込み処理
+        self._load_task = None
+        self._model_before_load = None
+        self._edit_triggers_before_load = None
 
 
+
+    @property
+    def statistical_handler(self):
+        """統計処理のハンドラー。初めてアクセスしたときにモジュールを読み込んで生成する。"""
+        if self._statistical_handler is None:
+            from .statistical_handler import StatisticalHandler
+            self._statistical_handler = StatisticalHandler(self.main)
+        return self._statistical_handler
+
+    def statistical_action(self, name):
+        """
+        メニューに接続する、StatisticalHandlerのメソッドを呼び出す関数を返す。
+        メニューの作成時にはStatisticalHandlerを生成しない。
+        """
+        def run(*args):
+            # ダイアログで設定している間の時間も含まれる。計算のみの時間はrun_facetsなどの区間で計測する
+            with span(name, "stats"):
+                getattr(self.statistical_handler, name)()
+        return run
+
+    def shutdown(self):
+        """アプリケーションの終了時に呼び出す。生成済みのStatisticalHandlerのみ終了処理を行う。"""
+        if self._statistical_handler is not None:
+            self._statistical_handler.shutdown()
+
     def save_table_as_csv(self):
         """現在表示されているテーブルデータをCSVとして保存する"""
         if not hasattr(self.main, 'model') or self.main.model is None:
@@ -62,8 +72,9 @@ class ActionHandler:
         
         if file_path:
             try:
-                df = self.main.model._data
-                df.to_csv(file_path, index=False)
+                df = self.main.model.view_data()
+                with span("export_csv", "export", rows=len(df)):
+                    df.to_csv(file_path, index=False)
                 QMessageBox.information(self.main, "Success", f"Table successfully saved to:\n{file_path}")
             except Exception as e:
                 QMessageBox.critical(self.main, "Error", f"Failed to save table: {e}")
@@ -71,33 +82,96 @@ class ActionHandler:
 
 
     def open_csv_file(self):
-        """CSVファイルを開き、内容をテーブルに読み込む。"""
+        """
+        CSVファイルをワーカースレッドでチャンクごとに読み込み、内容をテーブルに読み込む。
+        最初のチャンクが読み込まれた時点で、テーブルにプレビューとして表示する。
+        """
+        if self._load_task is not None and self._load_task.is_running():
+            QMessageBox.warning(self.main, "Warning", "Another file is still being loaded.")
+            return
+        
         file_path, _ = QFileDialog.getOpenFileName(self.main, "Open CSV File", "", "CSV Files (*.csv);;All Files (*)")
-        if file_path:
-            try:
-                df = pd.read_csv(file_path)
-                
-                # メモリ削減のためにcategory型に変換
-                for col in df.select_dtypes(include=['object']).columns:
-                    num_unique_values = df[col].nunique()
-                    num_total_values = len(df[col])
-                    # ユニークな値の割合が50%未満ならcategory型に変換
-                    if num_unique_values / num_total_values < 0.5:
-                        print(f"Converting column '{col}' to 'category' type.")
-                        df[col] = df[col].astype('category')
-                
-                self.main.model = PandasModel(df)
-                self.main.table_view.setModel(self.main.model)
-                self.main.properties_widget.set_columns(df.columns)
-                self.main.results_widget.clear_results()
-                
-                # GraphManagerのupdate_graphに接続する
-                self.main.table_view.selectionModel().selectionChanged.connect(self.main.graph_manager.update_graph)
-                self.main.model.dataChanged.connect(self.main.graph_manager.update_graph)
-                self.main.model.headerDataChanged.connect(self.main.graph_manager.update_graph)
-                
-            except Exception as e:
-                QMessageBox.critical(self.main, "Error", f"Error opening file: {e}")
+        if not file_path:
+            return
+        
+        worker = DataLoadWorker(lambda: iter_csv_chunks(file_path), combine_csv_chunks)
+        self._start_background_load(worker, f"Loading {os.path.basename(file_path)}...", self._on_csv_loaded)
+
+
+    def _start_background_load(self, worker, label_text, on_loaded):
+        """
+        DataLoadWorkerをバックグラウンドで実行する。
+        読み込み中は途中までのデータをプレビュー表示し、完了時にon_loaded(df)を呼び出す。
+        """
+        self._model_before_load = self.main.model
+        self._edit_triggers_before_load = self.main.table_view.editTriggers()
+        self._load_task = BackgroundLoadTask(worker, label_text, self.main)
+        self._load_task.partialDataReady.connect(self._show_load_preview)
+        self._load_task.loaded.connect(on_loaded)
+        self._load_task.failed.connect(self._on_load_failed)
+        self._load_task.cancelled.connect(self._on_load_cancelled)
+        # 終了したタスクは破棄されるため、参照を残さない
+        for signal in (self._load_task.loaded, self._load_task.failed, self._load_task.cancelled):
+            signal.connect(self._release_load_task)
+        self._load_task.start()
+
+
+    def _release_load_task(self, *args):
+        self._load_task = None
+
+
+    def _show_load_preview(self, df):
+        """読み込み途中のデータを、編集不可のプレビューとしてテーブルに表示する"""
+        self.main.table_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.main.model = PandasModel(df)
+        self.main.table_view.setModel(self.main.model)
+        self.main.statusBar().showMessage(f"Loading... showing the first {len(df)} rows.")
+
+
+    def _end_load_preview(self):
+        """プレビュー表示中に無効化したテーブルの編集を元に戻す"""
+        self.main.table_view.setEditTriggers(self._edit_triggers_before_load)
+        self._model_before_load = None
+
+
+    def _on_csv_loaded(self, df):
+        self._end_load_preview()
+        try:
+            self._install_dataframe(df)
+            self.main.statusBar().showMessage(f"Loaded {len(df)} rows.")
+        except Exception as e:
+            QMessageBox.critical(self.main, "Error", f"Error opening file: {e}")
+
+
+    def _on_load_failed(self, message):
+        self._restore_model_before_load()
+        QMessageBox.critical(self.main, "Error", f"Error opening file: {message}")
+
+
+    def _on_load_cancelled(self):
+        self._restore_model_before_load()
+        self.main.statusBar().showMessage("Loading cancelled.")
+
+
+    def _restore_model_before_load(self):
+        """読み込みが中断された場合に、読み込み前のテーブルに戻す"""
+        self.main.model = self._model_before_load
+        self.main.table_view.setModel(self.main.model)
+        self._end_load_preview()
+
+
+    @profiled("install_dataframe", "import")
+    def _install_dataframe(self, df):
+        """DataFrameを新しいモデルとしてテーブルに設定し、グラフ更新のシグナルを接続する"""
+        self.main.model = PandasModel(df)
+        self.main.table_view.setModel(self.main.model)
+        self.main.data_widget.set_columns(df.columns)
+        self.main.results_widget.clear_results()
+        
+        # 変更のたびに描画せず、GraphManagerの再描画予約にまとめる
+        self.main.table_view.selectionModel().selectionChanged.connect(self.main.graph_manager.schedule_update)
+        self.main.model.dataChanged.connect(self.main.graph_manager.schedule_update)
+        self.main.model.headerDataChanged.connect(self.main.graph_manager.schedule_update)
 
 
     def paste_from_clipboard(self):
@@ -108,15 +182,9 @@ class ActionHandler:
             if not text:
                 return
             
-            df = pd.read_csv(io.StringIO(text), sep='\t')
-            self.main.model = PandasModel(df)
-            self.main.table_view.setModel(self.main.model)
-            self.main.properties_widget.set_columns(df.columns)
-            self.main.results_widget.clear_results() # ★★★ 追加 ★★★
-            
-            self.main.table_view.selectionModel().selectionChanged.connect(self.main.graph_manager.update_graph)
-            self.main.model.dataChanged.connect(self.main.graph_manager.update_graph)
-            self.main.model.headerDataChanged.connect(self.main.graph_manager.update_graph)
+            with span("parse_clipboard", "import"):
+                df = pd.read_csv(io.StringIO(text), sep='\t')
+            self._install_dataframe(df)
             
         except Exception as e:
             QMessageBox.critical(self.main, "Error", f"Failed to paste from clipboard: {e}")
@@ -136,42 +204,17 @@ class ActionHandler:
             return
 
         try:
-            # 一時的な作業ディレクトリを作成
-            with tempfile.TemporaryDirectory() as temp_dir:
-                print(f"DEBUG: Created temporary directory: {temp_dir}")
-                
-                # 1. データをCSVとして保存
-                csv_path = os.path.join(temp_dir, 'data.csv')
-                self.main.model._data.to_csv(csv_path, index=False)
-                print("DEBUG: Saved data.csv")
-
-                # 2. グラフ設定をJSONとして保存
-                settings_path = os.path.join(temp_dir, 'settings.json')
-                settings = self.main.properties_widget.get_properties()
-                with open(settings_path, 'w') as f:
-                    json.dump(settings, f, indent=4)
-                print("DEBUG: Saved settings.json")
-
-                # 3. 解析結果をJSONとして保存
-                analysis_path = os.path.join(temp_dir, 'analysis.json')
-                analysis_data = {
-                    'statistical_annotations': self.main.statistical_annotations,
-                    'paired_annotations': self.main.paired_annotations,
-                    'regression_line_params': self.main.regression_line_params,
-                    'fit_params': self.main.fit_params,
-                }
-                with open(analysis_path, 'w') as f:
-                    json.dump(analysis_data, f, indent=4, cls=NumpyArrayEncoder)
-                print("DEBUG: Saved analysis.json")
-
-                # 4. 一時ディレクトリの中身をzipファイルに圧縮
-                with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-                    for root, _, files in os.walk(temp_dir):
-                        for file in files:
-                            full_path = os.path.join(root, file)
-                            arcname = os.path.relpath(full_path, temp_dir)
-                            zf.write(full_path, arcname)
-                print(f"DEBUG: Project successfully zipped to {file_path}")
+            settings = self.main.properties_widget.get_properties()
+            analysis_data = {
+                'statistical_annotations': self.main.statistical_annotations,
+                'paired_annotations': self.main.paired_annotations,
+                'regression_line_params': self.main.regression_line_params,
+                'fit_params': self.main.fit_params,
+            }
+            # 各メンバーを一時ファイルを介さずzipへ直接書き込む
+            with span("export_project", "export"):
+                data_name = write_project(file_path, self.main.model.view_data(), settings, analysis_data)
+            print(f"DEBUG: Saved {data_name}, settings.json and analysis.json to {file_path}")
 
             QMessageBox.information(self.main, "Success", f"Project saved to:\n{file_path}")
             self.main.statusBar().showMessage(f"Project saved: {os.path.basename(file_path)}")
@@ -190,58 +233,46 @@ class ActionHandler:
         if not file_path:
             return
 
+        if self._load_task is not None and self._load_task.is_running():
+            QMessageBox.warning(self.main, "Warning", "Another file is still being loaded.")
+            return
+
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # zipファイルを一時ディレクトリに展開
-                with zipfile.ZipFile(file_path, 'r') as zf:
-                    zf.extractall(temp_dir)
-                print(f"DEBUG: Project extracted to {temp_dir}")
-
-                # 1. データをCSVから読み込む
-                csv_path = os.path.join(temp_dir, 'data.csv')
-                if os.path.exists(csv_path):
-                    df = pd.read_csv(csv_path)
-                    self.main.load_dataframe(df) # MainWindowの既存のメソッドを再利用
-                    print("DEBUG: Loaded data.csv")
-
-                # 2. グラフ設定をJSONから読み込む (TODO: 復元ロジック)
-                settings_path = os.path.join(temp_dir, 'settings.json')
-                if os.path.exists(settings_path):
-                    with open(settings_path, 'r') as f:
-                        settings = json.load(f)
-                    self.main.properties_widget.set_properties(settings)
-                    print("DEBUG: Loaded and applied settings.json to UI.")
-
-                # 3. 解析結果をJSONから読み込む
-                analysis_path = os.path.join(temp_dir, 'analysis.json')
-                if os.path.exists(analysis_path):
-                    with open(analysis_path, 'r') as f:
-                        analysis_data = json.load(f)
-                    self.main.statistical_annotations = analysis_data.get('statistical_annotations', [])
-                    self.main.paired_annotations = analysis_data.get('paired_annotations', [])
-
-                    reg_params = analysis_data.get('regression_line_params')
-                    if reg_params:
-                        if 'x_line' in reg_params: # 単一フィットの場合
-                            reg_params['x_line'] = np.array(reg_params['x_line'])
-                            reg_params['y_line'] = np.array(reg_params['y_line'])
-                        else: # サブグループごとのフィットの場合
-                            for group in reg_params:
-                                reg_params[group]['x_line'] = np.array(reg_params[group]['x_line'])
-                                reg_params[group]['y_line'] = np.array(reg_params[group]['y_line'])
-                    self.main.regression_line_params = reg_params
-
-                    # fit_params の復元
-                    fit_params = analysis_data.get('fit_params')
-                    if fit_params:
-                        if 'params' in fit_params: # 単一フィットの場合
-                            fit_params['params'] = np.array(fit_params['params'])
-                            fit_params['log_x_data'] = np.array(fit_params['log_x_data'])
-                        else: # サブグループごとのフィットの場合
-                            for group in fit_params:
-                                fit_params[group]['params'] = np.array(fit_params[group]['params'])
-                                fit_params[group]['log_x_data'] = np.array(fit_params[group]['log_x_data'])
-                    self.main.fit_params = fit_params
+            # 設定と解析結果は小さいため先に読み込み、テーブルはバックグラウンドで列ごとに読み込む
+            settings, analysis_data = read_project_json(file_path)
+            reader = project_data_reader(file_path)
+        except Exception as e:
+            QMessageBox.critical(self.main, "Error", f"Failed to open project: {e}")
+            traceback.print_exc()
+            return
+
+        def on_loaded(df):
+            self._end_load_preview()
+            self._restore_project_state(file_path, df, settings, analysis_data)
+
+        if reader is None: # 古いプロジェクトなどでテーブルが含まれていない場合
+            self._restore_project_state(file_path, None, settings, analysis_data)
+            return
+
+        read_parts, combine_parts = reader
+        worker = DataLoadWorker(read_parts, combine_parts)
+        self._start_background_load(worker, f"Opening {os.path.basename(file_path)}...", on_loaded)
+
+
+    @profiled("restore_project", "import")
+    def _restore_project_state(self, file_path, df, settings, analysis_data):
+        """読み込んだプロジェクトのテーブル・グラフ設定・解析結果を画面に反映する"""
+        try:
+            if df is not None:
+                self.main.load_dataframe(df) # MainWindowの既存のメソッドを再利用
+                print("DEBUG: Loaded project data")
+
+            if settings is not None:
+                self.main.properties_widget.set_properties(settings)
+                print("DEBUG: Loaded and applied settings.json to UI.")
+
+            if analysis_data is not None:
+                self._apply_analysis_data(analysis_data)
 
             self.main.graph_manager.update_graph()
             self.main.statusBar().showMessage(f"Project opened: {os.path.basename(file_path)}")
@@ -251,14 +282,42 @@ class ActionHandler:
             traceback.print_exc()
 
 
+    def _apply_analysis_data(self, analysis_data):
+        """analysis.jsonの内容を復元する。JSONではリストになっている配列はndarrayに戻す。"""
+        self.main.statistical_annotations = analysis_data.get('statistical_annotations', [])
+        self.main.paired_annotations = analysis_data.get('paired_annotations', [])
+
+        reg_params = analysis_data.get('regression_line_params')
+        if reg_params:
+            if 'x_line' in reg_params: # 単一フィットの場合
+                reg_params['x_line'] = np.array(reg_params['x_line'])
+                reg_params['y_line'] = np.array(reg_params['y_line'])
+            else: # サブグループごとのフィットの場合
+                for group in reg_params:
+                    reg_params[group]['x_line'] = np.array(reg_params[group]['x_line'])
+                    reg_params[group]['y_line'] = np.array(reg_params[group]['y_line'])
+        self.main.regression_line_params = reg_params
+
+        # fit_params の復元
+        fit_params = analysis_data.get('fit_params')
+        if fit_params:
+            if 'params' in fit_params: # 単一フィットの場合
+                fit_params['params'] = np.array(fit_params['params'])
+                fit_params['log_x_data'] = np.array(fit_params['log_x_data'])
+            else: # サブグループごとのフィットの場合
+                for group in fit_params:
+                    fit_params[group]['params'] = np.array(fit_params[group]['params'])
+                    fit_params[group]['log_x_data'] = np.array(fit_params[group]['log_x_data'])
+        self.main.fit_params = fit_params
+
+
     def show_calculate_dialog(self):
         """新しい列を計算するためのダイアログを表示し、設定に基づいて計算を実行する。"""
         if not hasattr(self.main, 'model'):
             QMessageBox.warning(self.main, "Warning", "Please load data first.")
             return
         
-        df = self.main.model._data
-        dialog = CalculateDialog(df.columns, self.main)
+        dialog = CalculateDialog(self.main.model.columns(), self.main)
         
         if dialog.exec():
             settings = dialog.get_settings()
@@ -273,12 +332,12 @@ class ActionHandler:
         try:
             df = self.main.model._data
             new_col_name = settings['new_column_name']
-            formula = settings['formula']
+            # 計算式は一度だけコンパイルし、同じ計算式の再実行ではキャッシュを使う
+            formula = compile_formula(settings['formula'], df.columns)
             
-            df[new_col_name] = df.eval(formula, engine='python')
-            
-            self.main.model.refresh_model()
-            self.main.properties_widget.set_columns(df.columns)
+            # 計算した列の版数だけを更新する（他の列に依存する統計のキャッシュなどは破棄しない）
+            self.main.model.set_column(new_col_name, formula.evaluate(df))
+            self.main.data_widget.set_columns(self.main.model.columns())
             
         except Exception as e:
             QMessageBox.critical(self.main, "Error", f"Failed to calculate column: {e}")
@@ -291,8 +350,7 @@ class ActionHandler:
             QMessageBox.warning(self.main, "Warning", "Please load data first.")
             return
         
-        df = self.main.model._data
-        dialog = RestructureDialog(df.columns, self.main)
+        dialog = RestructureDialog(self.main.model.columns(), self.main)
         
         if dialog.exec():
             settings = dialog.get_settings()
@@ -305,7 +363,7 @@ class ActionHandler:
     def restructure_data(self, settings):
         """pd.meltを使用してデータをワイドからロングフォーマットに変換し、新しいウィンドウで結果を表示する。"""
         try:
-            df = self.main.model._data
+            df = self.main.model.column_data(dict.fromkeys(list(settings['id_vars']) + list(settings['value_vars'])))
             new_df = pd.melt(
                 df,
                 id_vars=settings['id_vars'],
@@ -314,22 +372,7 @@ class ActionHandler:
                 value_name=settings['value_name']
             )
             
-            # self.main.__class__() を使って新しいウィンドウを生成
-            new_window = self.main.__class__()
-            new_window.model = PandasModel(new_df)
-            new_window.table_view.setModel(new_window.model)
-            new_window.properties_widget.set_columns(new_df.columns)
-            new_window.setWindowTitle(self.main.windowTitle() + " [Restructured]")
-            new_window.show()
-            
-            new_window.table_view.selectionModel().selectionChanged.connect(new_window.graph_manager.update_graph)
-            new_window.model.dataChanged.connect(new_window.graph_manager.update_graph)
-            new_window.model.headerDataChanged.connect(new_window.graph_manager.update_graph)
-            
-            app = QApplication.instance()
-            if not hasattr(app, 'main_windows'):
-                app.main_windows = []
-            app.main_windows.append(new_window)
+            self._open_derived_window(" [Restructured]", data=new_df)
             
         except Exception as e:
             QMessageBox.critical(self.main, "Error", f"Failed to restructure data: {e}")
@@ -341,8 +384,7 @@ class ActionHandler:
             QMessageBox.warning(self.main, "Warning", "Please load data first.")
             return
         
-        df = self.main.model._data
-        dialog = PivotDialog(df.columns, self.main)
+        dialog = PivotDialog(self.main.model.columns(), self.main)
         
         if dialog.exec():
             settings = dialog.get_settings()
@@ -355,7 +397,9 @@ class ActionHandler:
     def pivot_data(self, settings):
         """pd.pivot_tableを使用してデータをロングからワイドフォーマットに変換し、新しいウィンドウで結果を表示する。"""
         try:
-            df = self.main.model._data
+            df = self.main.model.column_data(
+                dict.fromkeys((settings['id_vars'], settings['var_name'], settings['value_name']))
+            )
             new_df = pd.pivot_table(
                 df,
                 index=settings['id_vars'],
@@ -363,26 +407,30 @@ class ActionHandler:
                 values=settings['value_name']
             ).reset_index()
             
-            new_window = self.main.__class__()
-            new_window.model = PandasModel(new_df)
-            new_window.table_view.setModel(new_window.model)
-            new_window.properties_widget.set_columns(new_df.columns)
-            new_window.setWindowTitle(self.main.windowTitle() + " [Pivoted]")
-            new_window.show()
-            
-            new_window.table_view.selectionModel().selectionChanged.connect(new_window.graph_manager.update_graph)
-            new_window.model.dataChanged.connect(new_window.graph_manager.update_graph)
-            new_window.model.headerDataChanged.connect(new_window.graph_manager.update_graph)
-            
-            app = QApplication.instance()
-            if not hasattr(app, 'main_windows'):
-                app.main_windows = []
-            app.main_windows.append(new_window)
+            # ワイド形式の列名は値から作られるため、文字列にそろえる
+            new_df.columns = [str(column) for column in new_df.columns]
+            self._open_derived_window(" [Pivoted]", data=new_df)
             
         except Exception as e:
             QMessageBox.critical(self.main, "Error", f"Failed to pivot data: {e}")
 
 
+    def _open_derived_window(self, title_suffix, data=None, model=None):
+        """
+        派生テーブル（フィルター・抽出・変換の結果）を新しいウィンドウで表示し、
+        アプリケーションの管理リストに追加する。modelにはPandasModelのビューを渡せる。
+        """
+        new_window = self.main.__class__(data=data, model=model)
+        new_window.setWindowTitle(self.main.windowTitle() + title_suffix)
+        new_window.show()
+        
+        app = QApplication.instance()
+        if not hasattr(app, 'main_windows'):
+            app.main_windows = []
+        app.main_windows.append(new_window)
+        return new_window
+
+
 # --- フィルタリング ---
 
 
@@ -392,8 +440,8 @@ class ActionHandler:
             QMessageBox.warning(self.main, "Warning", "Please load data first.")
             return
         
-        df = self.main.model._data
-        dialog = AdvancedFilterDialog(df, self.main)
+        # ダイアログは列名と型だけを使うため、ビューを実体化しない
+        dialog = AdvancedFilterDialog(self.main.model.schema(), self.main)
         
         if dialog.exec():
             settings = dialog.get_settings()
@@ -405,55 +453,21 @@ class ActionHandler:
 
     def apply_advanced_filter(self, settings):
         """指定された複数条件に基づいてデータをフィルタリングする"""
-        query_parts = []
         try:
-            df = self.main.model._data.copy()
-            
-            # --- 翻訳担当のコアロジック ---
-            for i, condition in enumerate(settings):
-                col = condition['column']
-                op = condition['operator']
-                val = condition['value']
-                
-                # 値を安全にクエリ文字列用にフォーマット
-                query_val = f'"{val}"' if isinstance(val, str) else str(val)
-                
-                # 個々の条件式を作成
-                if op in ["contains", "not contains", "startswith", "endswith"]:
-                    if op == "not contains":
-                        part = f'~`{col}`.str.contains({query_val})'
-                    else:
-                        part = f'`{col}`.str.{op}({query_val})'
-                else:
-                    part = f'`{col}` {op} {query_val}'
-                    
-                # 最初の条件でなければ、AND/ORで連結する
-                if i > 0:
-                    connector = condition['connector']
-                    query_parts.append(f" {connector} ({part})")
-                else:
-                    query_parts.append(f"({part})")
-            
-            final_query = "".join(query_parts)
+            # 条件を行ごとの真偽値の配列に変換して抽出する（クエリ文字列は組み立てない）
+            columns = [condition['column'] for condition in settings if condition['column'] in self.main.model.columns()]
+            df = self.main.model.column_data(dict.fromkeys(columns))
+            mask = compile_filter(df, settings)
             
-            new_df = df.query(final_query, engine='python').reset_index(drop=True)
-            
-            if new_df.empty:
+            if not mask.any():
                 QMessageBox.information(self.main, "Info", "The filter returned no data.")
                 return
             
-            # 新しいウィンドウで結果を表示
-            new_window = self.main.__class__(data=new_df)
-            new_window.setWindowTitle(self.main.windowTitle() + " [Filtered]")
-            new_window.show()
-            
-            app = QApplication.instance()
-            if not hasattr(app, 'main_windows'): app.main_windows = []
-            app.main_windows.append(new_window)
+            # 抽出した行は元の表とメモリを共有するビューとして、新しいウィンドウで表示する
+            self._open_derived_window(" [Filtered]", model=self.main.model.derived_view(np.flatnonzero(mask)))
             
         except Exception as e:
-            final_query_str = "".join(query_parts)
-            QMessageBox.critical(self.main, "Error", f"Failed to apply filter: {e}\n\nAttempted Query: {final_query_str}")
+            QMessageBox.critical(self.main, "Error", f"Failed to apply filter: {e}\n\nConditions: {describe_filter(settings)}")
             traceback.print_exc()
 
 
@@ -475,21 +489,11 @@ class ActionHandler:
         try:
             # 選択された行のインデックス（番号）を取得し、重複をなくしてソートする
             row_indices = sorted(list(set(index.row() for index in selected_rows)))
+            # 並べ替え中は表示上の行番号とDataFrame上の行位置が異なるため変換する
+            row_indices = self.main.model.data_rows(row_indices)
             
-            # 元のデータフレームから、選択された行を番号で抽出する
-            original_df = self.main.model._data
-            new_df = original_df.iloc[row_indices].copy().reset_index(drop=True)
-            
-            # 既存のロジックを再利用して、新しいウィンドウを生成・表示
-            new_window = self.main.__class__(data=new_df)
-            new_window.setWindowTitle(self.main.windowTitle() + " [Subset]")
-            new_window.show()
-            
-            # 新しいウィンドウをアプリケーションの管理リストに追加
-            app = QApplication.instance()
-            if not hasattr(app, 'main_windows'):
-                app.main_windows = []
-            app.main_windows.append(new_window)
+            # 元のデータフレームの選択された行を参照するビューとして、新しいウィンドウで表示する
+            self._open_derived_window(" [Subset]", model=self.main.model.derived_view(row_indices))
             
         except Exception as e:
             QMessageBox.critical(self.main, "Error", f"Failed to create new table from selection: {e}")
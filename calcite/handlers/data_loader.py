@@ -0,0 +1,201 @@
+# handlers/data_loader.py
+
+import os
+import traceback
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+from PySide6.QtWidgets import QProgressDialog
+from PySide6.QtCore import Qt, QObject, QThread, Signal, Slot
+
+from ..profiling import profiled
+
+# CSVを分割して読み込む際の1チャンクあたりの行数
+CSV_CHUNK_ROWS = 100_000
+
+# ユニークな値の割合がこれ未満のテキスト列はcategory型に変換する
+CATEGORY_RATIO_THRESHOLD = 0.5
+
+
+def _is_text_dtype(dtype):
+    """object型またはpandasの文字列型かどうかを判定する"""
+    return pd.api.types.is_object_dtype(dtype) or isinstance(dtype, pd.StringDtype)
+
+
+def iter_csv_chunks(file_path, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    CSVファイルをチャンクごとに読み込み、(チャンク, 進捗率) を順に返す。
+    テキスト列はチャンクごとにcategory型へ変換しておき、結合時にカテゴリを統合する。
+    """
+    with open(file_path, 'rb') as f:
+        yield from iter_csv_stream(f, os.path.getsize(file_path), chunk_rows)
+
+
+def iter_csv_stream(f, total_size, chunk_rows=CSV_CHUNK_ROWS, categorize=True):
+    """
+    開いているバイナリストリームからCSVをチャンクごとに読み込み、(チャンク, 進捗率) を順に返す。
+    進捗率はストリームの読み込み位置とtotal_sizeから計算する。
+    """
+    total_size = total_size or 1
+    with pd.read_csv(f, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            if categorize:
+                for col in chunk.columns:
+                    if _is_text_dtype(chunk[col].dtype):
+                        chunk[col] = chunk[col].astype('category')
+            yield chunk, min(f.tell() / total_size, 1.0)
+
+
+def combine_csv_chunks(chunks):
+    """
+    iter_csv_chunksで読み込んだチャンクを1つのDataFrameに結合する。
+    ユニークな値の割合が閾値未満の列はcategory型のまま残し、それ以外は元のテキスト型に戻す。
+    """
+    if not chunks:
+        return pd.DataFrame()
+
+    columns = {}
+    for col in chunks[0].columns:
+        pieces = [chunk[col] for chunk in chunks]
+        if not all(isinstance(piece.dtype, pd.CategoricalDtype) for piece in pieces):
+            # チャンク間で型の推定が食い違った列は、pandasの結合規則に任せる
+            columns[col] = pd.concat(pieces, ignore_index=True)
+            continue
+
+        try:
+            merged = union_categoricals(pieces, sort_categories=True)
+        except TypeError:
+            columns[col] = pd.concat([piece.astype(object) for piece in pieces], ignore_index=True)
+            continue
+
+        if len(merged) and len(merged.categories) / len(merged) < CATEGORY_RATIO_THRESHOLD:
+            print(f"Converting column '{col}' to 'category' type.")
+            columns[col] = pd.Series(merged)
+        else:
+            columns[col] = pd.Series(merged).astype(merged.categories.dtype)
+
+    return pd.DataFrame(columns)
+
+
+class DataLoadWorker(QObject):
+    """
+    データの読み込みをワーカースレッドで実行するためのクラス。
+    read_partsが返す部分データを順に受け取り、最後にcombine_partsで1つのDataFrameにまとめる。
+    """
+    partialDataReady = Signal(object)
+    progressChanged = Signal(int)
+    loadFinished = Signal(object)
+    loadFailed = Signal(str)
+    loadCancelled = Signal()
+
+    def __init__(self, read_parts, combine_parts):
+        super().__init__()
+        self._read_parts = read_parts
+        self._combine_parts = combine_parts
+        self._cancel_requested = False
+
+    def cancel(self):
+        """読み込みの中止を要求する。GUIスレッドから直接呼び出される。"""
+        self._cancel_requested = True
+
+    @profiled("load_data", "import")
+    def run(self):
+        parts = []
+        try:
+            for part, fraction in self._read_parts():
+                if self._cancel_requested:
+                    self.loadCancelled.emit()
+                    return
+                parts.append(part)
+                if len(parts) == 1:
+                    self.partialDataReady.emit(part)
+                self.progressChanged.emit(int(fraction * 100))
+
+            if self._cancel_requested:
+                self.loadCancelled.emit()
+                return
+            self.loadFinished.emit(self._combine_parts(parts))
+
+        except Exception as e:
+            traceback.print_exc()
+            self.loadFailed.emit(str(e))
+
+
+class BackgroundLoadTask(QObject):
+    """
+    DataLoadWorkerを専用スレッドで動かし、進捗ダイアログを管理するクラス（GUIスレッド側）。
+    ワーカーからのシグナルをGUIスレッドで受け取り直してから再送出するため、
+    接続先は通常のメソッドやlambdaでよい。
+    """
+    partialDataReady = Signal(object)
+    loaded = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, worker, label_text, parent):
+        super().__init__(parent)
+        self._worker = worker
+        self._running = False
+
+        self._thread = QThread(self)
+        self._progress = QProgressDialog(label_text, "Cancel", 0, 100, parent)
+        self._progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self._progress.setAutoReset(False)
+        self._progress.setAutoClose(False)
+        self._progress.setMinimumDuration(0)
+
+        worker.moveToThread(self._thread)
+        self._thread.started.connect(worker.run)
+        worker.partialDataReady.connect(self._on_partial_data)
+        worker.progressChanged.connect(self._progress.setValue)
+        worker.loadFinished.connect(self._on_finished)
+        worker.loadFailed.connect(self._on_failed)
+        worker.loadCancelled.connect(self._on_cancelled)
+        self._progress.canceled.connect(self._request_cancel)
+
+    def start(self):
+        self._running = True
+        self._thread.start()
+        self._progress.show()
+
+    def is_running(self):
+        return self._running
+
+    @Slot()
+    def _request_cancel(self):
+        if self._running:
+            # ワーカースレッドはループ中でイベントを処理できないため、フラグを直接立てる
+            self._worker.cancel()
+            self._progress.setLabelText("Cancelling...")
+
+    @Slot(object)
+    def _on_partial_data(self, df):
+        self.partialDataReady.emit(df)
+
+    @Slot(object)
+    def _on_finished(self, df):
+        self._finish()
+        self.loaded.emit(df)
+
+    @Slot(str)
+    def _on_failed(self, message):
+        self._finish()
+        self.failed.emit(message)
+
+    @Slot()
+    def _on_cancelled(self):
+        self._finish()
+        self.cancelled.emit()
+
+    def _finish(self):
+        """スレッドを終了させ、進捗ダイアログを閉じる。このオブジェクトとスレッドも破棄する。"""
+        self._running = False
+        self._progress.canceled.disconnect(self._request_cancel)
+        self._progress.close()
+        self._progress.deleteLater()
+        self._thread.quit()
+        self._thread.wait()
+        self._worker = None
+        # 読み込みのたびにスレッドが残り続けないよう、再送出したシグナルの処理後に破棄する
+        self._thread.deleteLater()
+        self.deleteLater()
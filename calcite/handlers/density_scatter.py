@@ -0,0 +1,176 @@
+# handlers/density_scatter.py
+
+import numpy as np
+import pandas as pd
+from matplotlib.artist import Artist, allow_rasterization
+from matplotlib.collections import PathCollection
+from matplotlib.colors import to_rgba, to_rgba_array
+from matplotlib.markers import MarkerStyle
+from matplotlib.transforms import IdentityTransform
+
+# 'auto'モードで密度表示に切り替える行数
+DENSITY_SCATTER_THRESHOLD = 100_000
+
+# 表示範囲内の点がこの数以下なら、密度画像ではなく通常のマーカーで描く（拡大表示時など）
+DENSITY_EXACT_POINTS = 20_000
+
+# 最も疎な画素の不透明度（点が1つでもあれば見えるようにする）
+_MIN_PIXEL_ALPHA = 0.3
+
+
+def use_density_scatter(mode, df, x_col, y_col):
+    """
+    散布図を密度表示で描くかどうかを判定する。
+    modeは 'auto'（行数で自動判定）, 'density', 'markers' のいずれか。X・Yが数値列の場合のみ有効。
+    """
+    if mode == 'markers' or df.empty:
+        return False
+    if not (pd.api.types.is_numeric_dtype(df[x_col]) and pd.api.types.is_numeric_dtype(df[y_col])):
+        return False
+    if mode == 'density':
+        return True
+    return len(df) > DENSITY_SCATTER_THRESHOLD
+
+
+class DensityScatterArtist(Artist):
+    """
+    大量の点を、描画時の画素単位で集計した画像として描くArtist。
+    画素ごとの点の数を不透明度に、サブグループごとの点の数で重み付けした色を画素の色にする。
+    表示範囲内の点が少ない場合（拡大表示時など）は、通常のマーカーで正確に描く。
+    """
+    zorder = 1
+
+    def __init__(self, x, y, codes, colors, marker_kwargs, exact_points=DENSITY_EXACT_POINTS):
+        super().__init__()
+        self._xy = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+        self._codes = np.asarray(codes, dtype=np.intp)
+        self._colors = to_rgba_array(colors)
+        self._marker_kwargs = marker_kwargs
+        self._exact_points = exact_points
+        # (表示範囲, 描画領域, 解像度) -> 描画結果。再描画（ウィンドウの再表示など）で集計し直さないため
+        self._image_cache = None
+
+        finite = np.isfinite(self._xy).all(axis=1)
+        if not finite.all():
+            self._xy = self._xy[finite]
+            self._codes = self._codes[finite]
+
+    def data_limits(self):
+        """自動スケール用に、データの範囲を [[xmin, ymin], [xmax, ymax]] で返す"""
+        if len(self._xy) == 0:
+            return None
+        return np.array([self._xy.min(axis=0), self._xy.max(axis=0)])
+
+    @allow_rasterization
+    def draw(self, renderer):
+        if not self.get_visible() or len(self._xy) == 0:
+            return
+        ax = self.axes
+        bbox = ax.bbox
+        key = (tuple(ax.viewLim.bounds), tuple(bbox.bounds), renderer.points_to_pixels(1.0))
+
+        if self._image_cache is None or self._image_cache[0] != key:
+            pixels = ax.transData.transform(self._xy)
+            inside = (
+                (pixels[:, 0] >= bbox.x0) & (pixels[:, 0] < bbox.x1)
+                & (pixels[:, 1] >= bbox.y0) & (pixels[:, 1] < bbox.y1)
+            )
+            if inside.sum() <= self._exact_points:
+                self._image_cache = (key, 'markers', (pixels[inside], self._codes[inside]))
+            else:
+                self._image_cache = (key, 'image', self._rasterize(pixels[inside], self._codes[inside], bbox))
+
+        _, kind, payload = self._image_cache
+        if kind == 'markers':
+            self._draw_markers(renderer, *payload)
+        else:
+            gc = renderer.new_gc()
+            gc.set_clip_rectangle(bbox)
+            renderer.draw_image(gc, int(bbox.x0), int(bbox.y0), payload)
+            gc.restore()
+        self.stale = False
+
+    def _rasterize(self, pixels, codes, bbox):
+        """表示座標の点を、描画領域と同じ大きさのRGBA画像に集計する（draw_imageの規約に合わせ、下端の行が先頭）"""
+        width, height = max(int(np.ceil(bbox.width)), 1), max(int(np.ceil(bbox.height)), 1)
+        px = np.clip((pixels[:, 0] - int(bbox.x0)).astype(np.intp), 0, width - 1)
+        py = np.clip((pixels[:, 1] - int(bbox.y0)).astype(np.intp), 0, height - 1)
+        flat = py * width + px
+
+        total = np.zeros(width * height)
+        rgb = np.zeros((width * height, 3))
+        for code in np.unique(codes):
+            counts = np.bincount(flat[codes == code], minlength=width * height)
+            total += counts
+            rgb += counts[:, None] * self._colors[code, :3]
+
+        filled = total > 0
+        rgb[filled] /= total[filled, None]
+        alpha = np.zeros(width * height)
+        # 点の数の対数で濃淡をつけ、疎な画素も見えるように下限を設ける
+        alpha[filled] = _MIN_PIXEL_ALPHA + (1 - _MIN_PIXEL_ALPHA) * np.log1p(total[filled]) / np.log1p(total.max())
+        alpha *= self._marker_kwargs.get('alpha', 1.0)
+
+        image = np.empty((height, width, 4), dtype=np.uint8)
+        image[..., :3] = (rgb * 255).round().reshape(height, width, 3)
+        image[..., 3] = (alpha * 255).round().reshape(height, width)
+        return image
+
+    def _draw_markers(self, renderer, pixels, codes):
+        """表示範囲内の点を、seabornの散布図と同じ見た目のマーカーで描く"""
+        kwargs = self._marker_kwargs
+        marker = MarkerStyle(kwargs.get('marker', 'o'))
+        path = marker.get_path().transformed(marker.get_transform())
+        collection = PathCollection(
+            (path,),
+            sizes=[kwargs.get('s', 25.0)],
+            offsets=pixels,
+            offset_transform=IdentityTransform(),
+            facecolors=self._colors[codes],
+            edgecolors=kwargs.get('edgecolor', 'black'),
+            linewidths=kwargs.get('linewidth', 1.0),
+            alpha=kwargs.get('alpha', 1.0),
+        )
+        collection.set_transform(IdentityTransform())
+        collection.set_figure(self.figure)
+        collection.set_clip_box(self.axes.bbox)
+        collection.draw(renderer)
+
+
+def draw_density_scatter(ax, df, x_col, y_col, hue_col, palette, single_color, marker_kwargs):
+    """
+    DensityScatterArtistで散布図を描く。凡例用に、サブグループごとの空のマーカーを追加する。
+    サブグループの色はpalette（サブグループ名 -> 色）から取る。
+    """
+    if hue_col:
+        hue_values = df[hue_col].astype(str)
+        categories = list(pd.unique(hue_values))
+        codes = pd.Categorical(hue_values, categories=categories).codes
+        colors = [palette.get(category, 'black') for category in categories]
+    else:
+        categories = []
+        codes = np.zeros(len(df), dtype=np.intp)
+        colors = [single_color or 'C0']
+
+    artist = DensityScatterArtist(
+        df[x_col].to_numpy(dtype=float, na_value=np.nan),
+        df[y_col].to_numpy(dtype=float, na_value=np.nan),
+        codes, colors, marker_kwargs,
+    )
+    ax.add_artist(artist)
+    limits = artist.data_limits()
+    if limits is not None:
+        ax.update_datalim(limits)
+        ax.autoscale_view()
+
+    for category, color in zip(categories, colors):
+        ax.scatter(
+            [], [], color=to_rgba(color), label=category,
+            marker=marker_kwargs.get('marker', 'o'),
+            edgecolors=marker_kwargs.get('edgecolor', 'black'),
+            linewidths=marker_kwargs.get('linewidth', 1.0),
+            s=marker_kwargs.get('s', 25.0),
+        )
+    ax.set_xlabel(x_col)
+    ax.set_ylabel(y_col)
+    return artist
@@ -0,0 +1,150 @@
+# handlers/dose_response.py
+
+import warnings
+from concurrent.futures import as_completed
+
+import numpy as np
+from scipy.optimize import curve_fit, OptimizeWarning
+from scipy.special import expit
+
+from .facet_stats import _get_executor, _default_workers
+
+# サブグループの数がこれ以上なら、4PLのフィットをプロセスプールで並列に実行する
+FIT_PARALLEL_THRESHOLD = 256
+
+# 1ワーカーあたりに割り当てるチャンク数。チャンク内では前のフィットの結果を初期値に使う
+FIT_CHUNKS_PER_WORKER = 2
+
+# 1回のフィットで許す関数の評価回数の上限
+FIT_MAXFEV = 10000
+
+# 4PLのフィットに必要な最小のデータ点数（パラメータ数）
+MIN_FIT_POINTS = 4
+
+_LN10 = np.log(10.0)
+
+
+def sigmoid_4pl(x, bottom, top, hill_slope, log_ec50):
+    """4パラメータロジスティック（4PL）モデルの関数。xとlog_ec50はlog10スケール。"""
+    # bottom + (top - bottom) / (1 + 10**((log_ec50 - x) * hill_slope)) と同じ値を、オーバーフローせずに計算する
+    return bottom + (top - bottom) * expit(_LN10 * (x - log_ec50) * hill_slope)
+
+
+def jacobian_4pl(x, bottom, top, hill_slope, log_ec50):
+    """sigmoid_4plの各パラメータについての偏微分を (データ点数, 4) の配列で返す"""
+    s = expit(_LN10 * (x - log_ec50) * hill_slope)
+    slope = (top - bottom) * s * (1 - s) * _LN10
+    return np.column_stack([1 - s, s, slope * (x - log_ec50), -slope * hill_slope])
+
+
+def _initial_guess(x, y):
+    return [y.min(), y.max(), 1.0, np.median(x)]
+
+
+def fit_4pl(x, y, p0=None, maxfev=FIT_MAXFEV):
+    """
+    log10スケールのxとyに4PLモデルを当てはめる。解析的なヤコビアンを使う。
+    収束しない場合はRuntimeErrorを送出する。(パラメータ, 共分散, 関数の評価回数) を返す。
+    """
+    if p0 is None:
+        p0 = _initial_guess(x, y)
+    with warnings.catch_warnings():
+        # 共分散が求まらない場合の警告は、診断情報として結果に含める
+        warnings.simplefilter('ignore', OptimizeWarning)
+        params, pcov, info, _, _ = curve_fit(
+            sigmoid_4pl, x, y, p0=p0, jac=jacobian_4pl, maxfev=maxfev, full_output=True
+        )
+    return params, pcov, int(info['nfev'])
+
+
+def _fit_one(x, y, warm_params):
+    """
+    1つのデータセットをフィットし、結果と診断情報の辞書を返す。
+    直前のフィットの結果があれば、そのHill係数とEC50を初期値に使い（ウォームスタート）、
+    収束しなければデータから求めた初期値でやり直す。
+    """
+    if len(x) < MIN_FIT_POINTS:
+        return {"converged": False, "message": f"Not enough data points (n={len(x)})."}
+
+    attempts = []
+    if warm_params is not None:
+        attempts.append(("warm", [y.min(), y.max(), warm_params[2], warm_params[3]]))
+    attempts.append(("initial", _initial_guess(x, y)))
+
+    total_nfev = 0
+    message = ""
+    for start, p0 in attempts:
+        try:
+            params, pcov, nfev = fit_4pl(x, y, p0=p0)
+        except (RuntimeError, ValueError) as e:
+            message = str(e)
+            continue
+        total_nfev += nfev
+        y_pred = sigmoid_4pl(x, *params)
+        r_squared = 1 - (np.sum((y - y_pred)**2) / np.sum((y - np.mean(y))**2))
+        stderr = np.sqrt(np.diag(pcov))
+        return {
+            "converged": True, "params": params, "r_squared": r_squared, "log_x_data": x,
+            "nfev": total_nfev, "start": start, "stderr": stderr,
+            "well_determined": bool(np.all(np.isfinite(stderr))),
+        }
+    return {"converged": False, "message": message}
+
+
+def _fit_chain(datasets, progress=None):
+    """
+    データセットを順にフィットする。収束したフィットの結果を、次のフィットの初期値に使う。
+    progressには、1件ごとに (完了したデータセット数, 全データセット数) が渡される。
+    """
+    results = []
+    warm_params = None
+    for done, (x, y) in enumerate(datasets, start=1):
+        result = _fit_one(x, y, warm_params)
+        if result["converged"]:
+            warm_params = result["params"]
+        results.append(result)
+        if progress is not None:
+            progress(done, len(datasets))
+    return results
+
+
+def fit_4pl_batch(datasets, progress=None, max_workers=None):
+    """
+    (log10スケールのx, y) の配列の組のリストに、それぞれ4PLモデルを当てはめ、結果の辞書のリストを同じ順で返す。
+    隣り合うデータセット（サブグループ）の結果を初期値に使うため、近い条件のデータセットを隣に並べると収束が速い。
+    データセットが多い場合は、連続したチャンクに分けてプロセスプールで並列に実行する。
+    progressには (完了したデータセット数, 全データセット数) が渡される。
+    """
+    workers = max_workers if max_workers is not None else _default_workers()
+    if len(datasets) < FIT_PARALLEL_THRESHOLD or workers <= 1:
+        return _fit_chain(datasets, progress)
+
+    n_chunks = min(len(datasets), workers * FIT_CHUNKS_PER_WORKER)
+    bounds = np.linspace(0, len(datasets), n_chunks + 1).astype(int)
+    chunks = [datasets[bounds[i]:bounds[i + 1]] for i in range(n_chunks)]
+
+    executor = _get_executor(workers)
+    futures = {executor.submit(_fit_chain, chunk): i for i, chunk in enumerate(chunks)}
+    chunk_results = [None] * len(chunks)
+    done = 0
+    for future in as_completed(futures):
+        i = futures[future]
+        chunk_results[i] = future.result()
+        done += len(chunks[i])
+        if progress is not None:
+            progress(done, len(datasets))
+    return [result for results in chunk_results for result in results]
+
+
+def format_fit_diagnostics(result):
+    """フィットの収束に関する診断情報を1行の文字列にする"""
+    if not result["converged"]:
+        return f"Fit failed: {result['message']}"
+    start = "warm start" if result["start"] == "warm" else "initial guess"
+    text = f"Converged in {result['nfev']} evaluations ({start})"
+    if result["well_determined"]:
+        bottom_se, top_se, hill_se, log_ec50_se = result["stderr"]
+        text += f"; SE Bottom: {bottom_se:.4f}, Top: {top_se:.4f}, Hill Slope: {hill_se:.4f}, log EC50: {log_ec50_se:.4f}"
+    else:
+        text += "; parameters are not well determined (covariance could not be estimated)"
+    return text
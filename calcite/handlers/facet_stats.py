@@ -0,0 +1,191 @@
+# handlers/facet_stats.py
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from scipy.stats import ttest_ind, f_oneway
+
+from .posthoc import tukey_hsd, format_tukey_table, kruskal_dunn, dunn_matrix
+
+# ファセットの数がこれ以上なら、ファセットごとの検定をプロセスプールで並列に実行する
+FACET_PARALLEL_THRESHOLD = 64
+
+# 1ワーカーあたりに割り当てるチャンク数（進捗表示の細かさと、呼び出し回数の兼ね合い）
+FACET_CHUNKS_PER_WORKER = 4
+
+# プロセスプールのワーカー数の上限
+MAX_FACET_WORKERS = 8
+
+_executor = None
+
+
+# --- ファセットごとの検定（プロセスプールからも呼び出すため、Qtに依存しない関数にする） ---
+
+def ttest_facet(samples, selected, params):
+    """選択された2グループの独立t検定。どちらかにデータがなければNoneを返す。"""
+    group1 = samples.get(selected[0], np.empty(0))
+    group2 = samples.get(selected[1], np.empty(0))
+    if len(group1) == 0 or len(group2) == 0:
+        return None
+    t_stat, p_value = ttest_ind(group1, group2)
+    return {
+        "statistic": float(t_stat), "p_value": float(p_value),
+        "n": (len(group1), len(group2)), "mean": (float(group1.mean()), float(group2.mean())),
+    }
+
+
+def anova_facet(samples, selected, params):
+    """
+    選択されたグループの一元配置分散分析。有意な場合はTukeyのHSD検定（posthoc.tukey_hsd）も行う。
+    データのあるグループが2つ未満ならNoneを返す。
+    """
+    chosen = {name: samples[name] for name in selected if name in samples and len(samples[name]) > 0}
+    if len(chosen) < 2:
+        return None
+    f_stat, p_value = f_oneway(*chosen.values())
+    result = {"statistic": float(f_stat), "p_value": float(p_value), "posthoc_text": None, "posthoc_pairs": []}
+
+    if p_value < 0.05:
+        tukey_result = tukey_hsd(chosen, alpha=0.05)
+        result["posthoc_text"] = format_tukey_table(tukey_result, alpha=0.05)
+        significant = tukey_result[tukey_result['p_adj'] < 0.05]
+        result["posthoc_pairs"] = [
+            ((str(group1), str(group2)), float(p_adj))
+            for group1, group2, p_adj in zip(significant['group1'], significant['group2'], significant['p_adj'])
+        ]
+    return result
+
+
+def kruskal_facet(samples, selected, params):
+    """
+    選択されたグループのクラスカル・ウォリス検定。有意で3グループ以上ある場合は、
+    同じ順位付けを使ってダンの多重比較検定（posthoc.kruskal_dunn）の結果も返す。
+    データのあるグループが2つ未満ならNoneを返す。
+    """
+    chosen = {name: samples[name] for name in selected if name in samples and len(samples[name]) > 0}
+    if len(chosen) < 2:
+        return None
+    h_stat, p_value, dunn = kruskal_dunn(chosen)
+    result = {"statistic": h_stat, "p_value": p_value, "posthoc_text": None, "posthoc_pairs": []}
+
+    if p_value < 0.05 and len(chosen) > 2:
+        result["posthoc_text"] = dunn_matrix(dunn).to_string()
+        significant = dunn[dunn['p_value'] < 0.05]
+        result["posthoc_pairs"] = [
+            (tuple(sorted((str(group1), str(group2)))), float(p))
+            for group1, group2, p in zip(significant['group1'], significant['group2'], significant['p_value'])
+        ]
+    return result
+
+
+# --- 実行 ---
+
+def run_facets(func, groups, value_col, selected, params=None, progress=None, max_workers=None):
+    """
+    GroupIndexの各ファセットに対してfunc(samples, selected, params)を実行し、
+    (ファセットの位置, ファセットの値, 結果) のリストをファセットの順に返す。
+    samplesはそのファセットに存在するグループ名 -> 値の配列 の辞書。
+    ファセットが多い場合は、値の配列を共有メモリに置き、プロセスプールで並列に実行する。
+    progressには (完了したファセット数, 全ファセット数) が渡される。
+    """
+    params = params or {}
+    facets = groups.facets()
+    tasks = []
+    for facet_pos, _ in facets:
+        tasks.append((facet_pos, [
+            (name, *groups.value_range(value_col, name, facet_pos))
+            for name in groups.present_groups(facet_pos)
+        ]))
+
+    values, _ = groups.sorted_values(value_col)
+    workers = max_workers if max_workers is not None else _default_workers()
+    if len(facets) >= FACET_PARALLEL_THRESHOLD and workers > 1:
+        results = _run_parallel(func, values, tasks, selected, params, progress, workers)
+    else:
+        results = []
+        for done, task in enumerate(tasks, start=1):
+            results.extend(_run_tasks(func, values, [task], selected, params))
+            if progress is not None:
+                progress(done, len(tasks))
+
+    return [(facet_pos, category, result) for (facet_pos, category), result in zip(facets, results)]
+
+
+def _default_workers():
+    return max(1, min((os.cpu_count() or 1) - 1, MAX_FACET_WORKERS))
+
+
+def _run_tasks(func, values, tasks, selected, params):
+    results = []
+    for _, ranges in tasks:
+        samples = {name: values[start:end] for name, start, end in ranges}
+        results.append(func(samples, selected, params))
+    return results
+
+
+def _run_chunk(shm_name, size, func, tasks, selected, params):
+    """プロセスプールのワーカーで実行される。共有メモリ上の値の配列を参照して検定する。"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        values = np.ndarray((size,), dtype=np.float64, buffer=shm.buf)
+        return _run_tasks(func, values, tasks, selected, params)
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # 例外のトレースバックがバッファを参照する配列を保持している場合。プロセス終了時に解放される
+            pass
+
+
+def _run_parallel(func, values, tasks, selected, params, progress, workers):
+    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    try:
+        shared = np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)
+        shared[:] = values
+        del shared
+
+        n_chunks = min(len(tasks), workers * FACET_CHUNKS_PER_WORKER)
+        bounds = np.linspace(0, len(tasks), n_chunks + 1).astype(int)
+        chunks = [tasks[bounds[i]:bounds[i + 1]] for i in range(n_chunks)]
+
+        executor = _get_executor(workers)
+        futures = {
+            executor.submit(_run_chunk, shm.name, len(values), func, chunk, selected, params): i
+            for i, chunk in enumerate(chunks)
+        }
+        chunk_results = [None] * len(chunks)
+        done = 0
+        for future in as_completed(futures):
+            i = futures[future]
+            chunk_results[i] = future.result()
+            done += len(chunks[i])
+            if progress is not None:
+                progress(done, len(tasks))
+        return [result for results in chunk_results for result in results]
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _get_executor(workers):
+    """
+    プロセスプールを返す（初回のみ作成）。
+    GUIアプリのプロセスをforkしないよう、spawnで起動する。
+    """
+    global _executor
+    if _executor is None or _executor._max_workers != workers:
+        shutdown_executor()
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def shutdown_executor():
+    """プロセスプールを終了させる。アプリケーションの終了時に呼び出す。"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
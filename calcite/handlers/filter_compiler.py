@@ -0,0 +1,90 @@
+# handlers/filter_compiler.py
+
+import numpy as np
+import pandas as pd
+
+# 比較演算子 -> NumPyの比較関数
+COMPARISON_OPERATORS = {
+    "==": np.equal, "!=": np.not_equal,
+    ">": np.greater, "<": np.less, ">=": np.greater_equal, "<=": np.less_equal,
+}
+
+# 文字列の演算子（部分一致は正規表現ではなく、入力した文字列そのものとして扱う）
+STRING_OPERATORS = ("contains", "not contains", "startswith", "endswith")
+
+
+def _string_matches(labels, operator, value):
+    """文字列のラベルの配列に、文字列の演算子を適用した真偽値の配列を返す"""
+    labels = pd.Series(labels, dtype=object).astype(str)
+    if operator == "==":
+        return (labels == value).to_numpy()
+    if operator == "!=":
+        return (labels != value).to_numpy()
+    if operator in ("contains", "not contains"):
+        return labels.str.contains(value, regex=False).to_numpy(dtype=bool)
+    if operator == "startswith":
+        return labels.str.startswith(value).to_numpy(dtype=bool)
+    if operator == "endswith":
+        return labels.str.endswith(value).to_numpy(dtype=bool)
+    raise ValueError(f"Operator '{operator}' is not supported for text columns.")
+
+
+def _condition_mask(series, operator, value):
+    """1つの条件を、行ごとの真偽値の配列に変換する"""
+    if pd.api.types.is_numeric_dtype(series.dtype) and not isinstance(series.dtype, pd.CategoricalDtype):
+        compare = COMPARISON_OPERATORS.get(operator)
+        if compare is None:
+            raise ValueError(f"Operator '{operator}' is not supported for numeric columns.")
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        return compare(values, float(value))
+
+    # 文字列の列は、値の種類ごとに一度だけ判定し、コードで行に展開する
+    # （カテゴリ型の列はカテゴリのコードをそのまま使う）
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, labels = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, labels = pd.factorize(series)
+    matches = _string_matches(labels, operator, str(value))
+    if operator == "not contains":
+        matches = ~matches
+    # 欠損値は「等しくない」「含まない」にだけ当てはまる
+    mask = np.full(len(series), operator in ("!=", "not contains"))
+    present = codes >= 0
+    mask[present] = matches[codes[present]]
+    return mask
+
+
+def compile_filter(df, conditions):
+    """
+    AdvancedFilterDialog.get_settingsの条件のリストから、行を残すかどうかの真偽値の配列を作る。
+    条件の連結はPythonの論理演算と同じく、ANDをORより先に評価する。
+    欠損値は比較・文字列の一致のいずれにも当てはまらない（「等しくない」「含まない」には当てはまる）。
+    """
+    result = None
+    term = None
+    for i, condition in enumerate(conditions):
+        column = condition['column']
+        if column not in df.columns:
+            raise ValueError(f"Column '{column}' does not exist.")
+        mask = _condition_mask(df[column], condition['operator'], condition['value'])
+
+        if i > 0 and condition['connector'] == "or":
+            result = term if result is None else result | term
+            term = mask
+        else:
+            term = mask if term is None else term & mask
+
+    if term is None:
+        return np.ones(len(df), dtype=bool)
+    return term if result is None else result | term
+
+
+def describe_filter(conditions):
+    """条件のリストを、エラーメッセージなどに表示するための式の文字列にする"""
+    parts = []
+    for i, condition in enumerate(conditions):
+        value = condition['value']
+        value_text = repr(value) if isinstance(value, str) else str(value)
+        part = f"(`{condition['column']}` {condition['operator']} {value_text})"
+        parts.append(part if i == 0 else f"{condition['connector']} {part}")
+    return " ".join(parts)
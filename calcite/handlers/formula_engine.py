@@ -0,0 +1,218 @@
+# handlers/formula_engine.py
+
+import ast
+import os
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import numexpr
+except ImportError:
+    # numexprが無い場合は、NumPyのユニバーサル関数で評価する
+    numexpr = None
+
+# コンパイル済みの計算式を保持する件数（古いものから破棄する）
+FORMULA_CACHE_ENTRIES = 64
+
+# 行数がこれ以上なら、NumPyでの評価を行のチャンクに分けてスレッドで並列に実行する
+FORMULA_PARALLEL_ROWS = 1_000_000
+
+# 並列評価に使うスレッド数の上限
+MAX_FORMULA_THREADS = 8
+
+# 計算式で使える関数（pandasのeval・numexprと同じ名前）
+FUNCTIONS = {
+    "sin": np.sin, "cos": np.cos, "tan": np.tan,
+    "arcsin": np.arcsin, "arccos": np.arccos, "arctan": np.arctan, "arctan2": np.arctan2,
+    "sinh": np.sinh, "cosh": np.cosh, "tanh": np.tanh,
+    "arcsinh": np.arcsinh, "arccosh": np.arccosh, "arctanh": np.arctanh,
+    "exp": np.exp, "expm1": np.expm1, "log": np.log, "log10": np.log10, "log1p": np.log1p,
+    "sqrt": np.sqrt, "abs": np.abs,
+}
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.BitAnd, ast.BitOr)
+_UNARY_OPERATORS = (ast.UAdd, ast.USub, ast.Invert, ast.Not)
+_COMPARISON_OPERATORS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+# バッククォートで囲まれた列名
+_BACKTICK_PATTERN = re.compile(r"`([^`]*)`")
+_PLACEHOLDER = "__calcite_col_{}"
+
+_compiled_formulas = OrderedDict()
+
+
+class _FormulaTransformer(ast.NodeTransformer):
+    """
+    計算式の構文木を検査し、配列に対して要素ごとに評価できる形に書き換える。
+    列名は内部の変数名に置き換え、and/or/notはビット演算に、連続した比較はANDの連結に変換する。
+    """
+    def __init__(self, resolve_column):
+        self._resolve_column = resolve_column
+        self.placeholders = {}
+        self.uses_floor_division = False
+        self.uses_strings = False
+
+    def generic_visit(self, node):
+        allowed = (
+            ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.Call,
+            ast.Name, ast.Constant, ast.Load, ast.And, ast.Or,
+        ) + _BINARY_OPERATORS + _UNARY_OPERATORS + _COMPARISON_OPERATORS
+        if not isinstance(node, allowed):
+            raise ValueError(f"Unsupported expression in formula: {type(node).__name__}")
+        return super().generic_visit(node)
+
+    def visit_BinOp(self, node):
+        if isinstance(node.op, ast.FloorDiv):
+            self.uses_floor_division = True
+        return self.generic_visit(node)
+
+    def visit_UnaryOp(self, node):
+        node = self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            node.op = ast.Invert()
+        return node
+
+    def visit_BoolOp(self, node):
+        node = self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = ast.BinOp(left=result, op=op, right=value)
+        return result
+
+    def visit_Compare(self, node):
+        node = self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        # a < b < c -> (a < b) & (b < c)
+        operands = [node.left] + node.comparators
+        parts = [
+            ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]])
+            for i, op in enumerate(node.ops)
+        ]
+        result = parts[0]
+        for part in parts[1:]:
+            result = ast.BinOp(left=result, op=ast.BitAnd(), right=part)
+        return result
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            name = node.func.id if isinstance(node.func, ast.Name) else ast.unparse(node.func)
+            raise ValueError(f"Unknown function in formula: {name}")
+        if node.keywords:
+            raise ValueError(f"Keyword arguments are not supported: {node.func.id}")
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, str):
+            self.uses_strings = True
+        elif not isinstance(node.value, (bool, int, float)):
+            raise ValueError(f"Unsupported constant in formula: {node.value!r}")
+        return node
+
+    def visit_Name(self, node):
+        column = self._resolve_column(node.id)
+        if column is None:
+            raise ValueError(f"Unknown column in formula: {node.id}")
+        placeholder = self.placeholders.setdefault(column, _PLACEHOLDER.format(len(self.placeholders)))
+        return ast.copy_location(ast.Name(id=placeholder, ctx=ast.Load()), node)
+
+
+class CompiledFormula:
+    """
+    一度だけ解析・検査した計算式。evaluateでDataFrameの列に対してベクトル演算で評価する。
+    すべての列が数値の場合はnumexpr（利用可能な場合）、それ以外はNumPyで評価する。
+    """
+    def __init__(self, formula, columns):
+        self.formula = formula
+        by_name = {str(column): column for column in columns}
+
+        # バッククォートで囲まれた列名を、一時的な識別子に置き換えてから構文解析する
+        quoted = {}
+
+        def replace_backticks(match):
+            name = match.group(1)
+            if name not in by_name:
+                raise ValueError(f"Unknown column in formula: {name}")
+            return quoted.setdefault(name, f"__calcite_quoted_{len(quoted)}")
+
+        source = _BACKTICK_PATTERN.sub(replace_backticks, formula)
+        quoted_names = {identifier: name for name, identifier in quoted.items()}
+
+        try:
+            tree = ast.parse(source.strip(), mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"Invalid formula: {e.msg}") from None
+
+        def resolve_column(identifier):
+            name = quoted_names.get(identifier, identifier)
+            return by_name.get(name)
+
+        transformer = _FormulaTransformer(resolve_column)
+        tree = ast.fix_missing_locations(transformer.visit(tree))
+
+        # 列名 -> 評価時の変数名（計算式に現れる順）
+        self.placeholders = transformer.placeholders
+        self.columns = list(self.placeholders)
+        self._code = compile(tree, "<formula>", "eval")
+        # numexprは切り捨て除算と文字列を扱えない
+        self._numexpr_source = None
+        if numexpr is not None and not transformer.uses_floor_division and not transformer.uses_strings:
+            self._numexpr_source = ast.unparse(tree)
+
+    def evaluate(self, df):
+        """計算式をdfの列に対して評価し、行数分の配列（列を参照しない場合はスカラー）を返す"""
+        arrays = {placeholder: _column_array(df[column]) for column, placeholder in self.placeholders.items()}
+        if self._numexpr_source is not None and arrays and all(a.dtype.kind in 'biuf' for a in arrays.values()):
+            return numexpr.evaluate(self._numexpr_source, local_dict=arrays)
+
+        workers = min(os.cpu_count() or 1, MAX_FORMULA_THREADS)
+        if not arrays or len(df) < FORMULA_PARALLEL_ROWS or workers <= 1:
+            return self._evaluate_numpy(arrays)
+
+        # NumPyのユニバーサル関数はGILを解放するため、行のチャンクごとにスレッドで評価する
+        bounds = np.linspace(0, len(df), workers + 1).astype(int)
+        chunks = [
+            {name: array[bounds[i]:bounds[i + 1]] for name, array in arrays.items()}
+            for i in range(workers)
+        ]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(self._evaluate_numpy, chunks))
+        return np.concatenate(results)
+
+    def _evaluate_numpy(self, arrays):
+        namespace = dict(FUNCTIONS)
+        namespace.update(arrays)
+        return eval(self._code, {"__builtins__": {}}, namespace)
+
+
+def _column_array(series):
+    """列を評価用のNumPy配列にする。欠損値を含む拡張型の数値列はfloatに変換する。"""
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype):
+        return series.to_numpy()
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        return series.to_numpy(dtype=float, na_value=np.nan)
+    return series.to_numpy(dtype=object)
+
+
+def compile_formula(formula, columns):
+    """
+    計算式をコンパイルする。同じ計算式と列名の組み合わせは、キャッシュ済みのCompiledFormulaを返す。
+    不正な計算式や、存在しない列・関数を参照している場合はValueErrorを送出する。
+    """
+    key = (formula, tuple(str(column) for column in columns))
+    compiled = _compiled_formulas.get(key)
+    if compiled is not None:
+        _compiled_formulas.move_to_end(key)
+        return compiled
+    compiled = CompiledFormula(formula, columns)
+    _compiled_formulas[key] = compiled
+    while len(_compiled_formulas) > FORMULA_CACHE_ENTRIES:
+        _compiled_formulas.popitem(last=False)
+    return compiled
@@ -1,19 +1,173 @@
 # handlers/graph_manager.py
 
+import json
+import threading
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
 from PySide6.QtWidgets import QFileDialog, QMessageBox
-import seaborn as sns
-from statannotations.Annotator import Annotator
+from PySide6.QtCore import QTimer, QSettings
 import traceback
 from matplotlib.figure import Figure
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import Collection
+from matplotlib.lines import Line2D
 import matplotlib.patches as mpatches
 
+from ..graph_widget import ProfiledCanvas
+from ..lazy_imports import LazyModule
+from ..profiling import span, profiled
+from .graph_renderer import FigureRenderThread, RenderError, snapshot_frame, current_figure, annotator_class
+from .density_scatter import draw_density_scatter, use_density_scatter
+
+# seabornとstatannotationsは読み込みに時間がかかるため、初めて描画するときに読み込む
+# （statannotationsはgraph_renderer.annotator_classで読み込む）
+sns = LazyModule("seaborn")
+
+# seabornのテーマ。初めて描画を要求する前に、GUIスレッドで一度だけ設定する
+SEABORN_THEME = {'style': 'ticks'}
+_theme_applied = False
+
+# 再描画要求をまとめる待ち時間（ミリ秒）の既定値。
+# 0の場合は、同じイベントループの周回で発生した要求を1回の描画にまとめる。
+DEFAULT_REDRAW_DEBOUNCE_MS = 0
+
+# データの設定のうち、描画に使う列名を表すキー
+_DATA_COLUMN_KEYS = ('x_col', 'y_col', 'subgroup_col', 'facet_col', 'col1', 'col2')
+
+# 描画済みFigureのキャッシュの上限（件数・おおよそのメモリ量）の既定値
+DEFAULT_FIGURE_CACHE_ENTRIES = 16
+DEFAULT_FIGURE_CACHE_MB = 256
+
+
+def _apply_seaborn_theme():
+    """
+    seabornのテーマを設定する。テーマはmatplotlib全体の設定（rcParams）を変更するため、
+    seabornが読み込まれたスレッド（プリウォームなど）ではなく、GUIスレッドで最初の描画を要求する前に実行し、
+    組み立て中のFigureの見た目が途中で変わらないようにする。
+    """
+    global _theme_applied
+    if not _theme_applied:
+        sns.set_theme(**SEABORN_THEME)
+        _theme_applied = True
+
+
+def _signature_default(obj):
+    """描画条件をJSON化する際に、ndarrayなどJSONにできない値を変換する"""
+    if isinstance(obj, (np.ndarray, pd.Series)):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def _estimate_figure_bytes(fig):
+    """
+    Figureが保持するメモリ量のおおよその値を返す。
+    描画バッファ（RGBA）と、線や点などのデータ配列の大きさを合計する。
+    """
+    total = int(fig.bbox.width * fig.bbox.height * 4)
+    for ax in fig.axes:
+        for artist in ax.get_children():
+            if isinstance(artist, Line2D):
+                total += artist.get_xydata().nbytes
+            elif isinstance(artist, Collection):
+                total += np.asarray(artist.get_offsets()).nbytes
+                total += len(artist.get_paths()) * 64
+                total += np.asarray(artist.get_facecolor()).nbytes
+    return total
+
+
 class GraphManager:
     def __init__(self, main_window):
         self.main = main_window
+        # 最後に描画したときの入力（データの版数・グラフ設定など）
+        self._last_render_signature = None
+        
+        # 短時間に連続する再描画要求を1回にまとめるためのタイマー
+        self._redraw_timer = QTimer(main_window)
+        self._redraw_timer.setSingleShot(True)
+        self._redraw_timer.timeout.connect(self._run_scheduled_update)
+        debounce = QSettings().value("graph/redraw_debounce_ms", DEFAULT_REDRAW_DEBOUNCE_MS, type=int)
+        self.set_redraw_debounce(debounce)
+        
+        # 表示から外れたFigure。次の描画でレイアウトが同じなら、AxesごとFigureを使い回す
+        self._spare_figure = None
+        self._spare_lock = threading.Lock()
+        
+        # Figureの組み立ては描画用スレッドで行い、完成したFigureだけをGUIスレッドで表示する
+        self._renderer = FigureRenderThread(self._render_figure, main_window)
+        self._renderer.rendered.connect(self._on_figure_rendered)
+        self._renderer.failed.connect(self._on_render_failed)
+        self._renderer.discarded.connect(self._recycle_figure)
+        
+        # 描画条件 -> (Figure, おおよそのバイト数)。最近使ったものほど後ろに並ぶ
+        self._figure_cache = OrderedDict()
+        self._figure_cache_bytes = 0
+        # 描画用スレッドに依頼中の描画の条件
+        self._pending_signature = None
+        settings = QSettings()
+        self.set_figure_cache_limits(
+            settings.value("graph/figure_cache_entries", DEFAULT_FIGURE_CACHE_ENTRIES, type=int),
+            settings.value("graph/figure_cache_mb", DEFAULT_FIGURE_CACHE_MB, type=int) * 1024 * 1024,
+        )
+
+
+    def shutdown(self):
+        """描画用スレッドを終了させる。ウィンドウを閉じる際に呼び出す。"""
+        self._renderer.stop()
+
+
+    def set_figure_cache_limits(self, max_entries, max_bytes):
+        """描画済みFigureのキャッシュの上限（件数とバイト数）を設定する。0でキャッシュを無効にする。"""
+        self._figure_cache_max_entries = max(0, int(max_entries))
+        self._figure_cache_max_bytes = max(0, int(max_bytes))
+        self._trim_figure_cache()
+
+
+    def set_redraw_debounce(self, msec):
+        """再描画要求をまとめる待ち時間（ミリ秒）を設定する"""
+        self._redraw_timer.setInterval(max(0, int(msec)))
+
+
+    def schedule_update(self, *args):
+        """
+        グラフの再描画を予約する。モデルや選択範囲の変更シグナルに接続する（引数は無視する）。
+        待ち時間内に続けて呼ばれた場合は最後の1回にまとめ、
+        描画の入力が前回から変わっていなければ描画そのものを省略する。
+        """
+        self._redraw_timer.start()
+
+
+    def _run_scheduled_update(self):
+        if self._render_signature() == self._last_render_signature:
+            return
+        self.update_graph()
+
+
+    def _render_signature(self):
+        """
+        グラフの見た目を決める入力をまとめた値を返す。
+        モデルはデータの版数で、設定や解析結果はJSON文字列で比較する。
+        描画済みFigureのキャッシュのキーにもなる。
+        """
+        if not hasattr(self.main, 'model') or self.main.model is None:
+            return None
+        
+        properties = self.main.properties_widget.get_properties()
+        properties.update(self.main.data_widget.get_current_settings())
+        analysis = [
+            self.main.statistical_annotations,
+            self.main.paired_annotations,
+            self.main.regression_line_params,
+            self.main.fit_params,
+        ]
+        return (
+            self.main.model.data_version(),
+            self.main.current_graph_type,
+            json.dumps(properties, sort_keys=True, default=_signature_default),
+            json.dumps(analysis, sort_keys=True, default=_signature_default),
+        )
 
 
     def sigmoid_4pl(self, x, bottom, top, hill_slope, log_ec50):
@@ -21,30 +175,193 @@ class GraphManager:
         return bottom + (top - bottom) / (1 + 10**((log_ec50 - x) * hill_slope))
 
 
+    @profiled("update_graph", "graph")
     def update_graph(self):
+        """
+        グラフの描画を直ちに要求する。予約済みの再描画があれば、この描画で置き換える。
+        描画は描画用スレッドで行われ、描画中に新しい要求が来た場合は古い結果を破棄する。
+        """
+        self._redraw_timer.stop()
+        signature = self._render_signature()
+        self._last_render_signature = signature
         if not hasattr(self.main, 'model') or self.main.model is None:
             self.clear_canvas()
             return
         
-        df = self.main.model._data
+        cached = self._figure_cache.get(signature)
+        if cached is not None:
+            # 同じ条件で描画済みのFigureがあれば、描画せずにそのまま表示する
+            self._figure_cache.move_to_end(signature)
+            self._renderer.cancel()
+            self.replace_canvas(cached[0])
+            return
+        
+        self._pending_signature = signature
+        _apply_seaborn_theme()
+        self._renderer.request(self._capture_render_state())
+
+
+    def _capture_render_state(self):
+        """
+        描画に必要な入力をGUIスレッドで集め、描画用スレッドに渡せる辞書にまとめる。
+        データは描画に使う列だけのスナップショットにし、解析結果もコピーして、描画中の編集の影響を受けないようにする。
+        """
         properties = self.main.properties_widget.get_properties()
         data_settings = self.main.data_widget.get_current_settings()
         properties.update(data_settings)
+        columns = self.main.model.columns()
+        used_columns = list(dict.fromkeys(
+            data_settings[key] for key in _DATA_COLUMN_KEYS if data_settings.get(key) in columns
+        ))
+        with span("capture_render_state", "data"):
+            df = snapshot_frame(self.main.model.view_data(used_columns))
+        return {
+            'df': df,
+            'properties': properties,
+            'data_settings': data_settings,
+            'graph_type': self.main.current_graph_type,
+            'statistical_annotations': list(self.main.statistical_annotations),
+            'paired_annotations': list(self.main.paired_annotations),
+            'regression_line_params': self.main.regression_line_params,
+            'fit_params': self.main.fit_params,
+        }
+
+
+    @profiled("render_figure", "graph")
+    def _render_figure(self, state):
+        """
+        描画条件からFigureを組み立てる（描画用スレッドで実行される）。
+        GUIには触れず、エラーはRenderErrorとして呼び出し元に伝える。
+        """
+        df = state['df']
+        properties = state['properties']
+        data_settings = state['data_settings']
         
-        fig = None
-        if self.main.current_graph_type == 'paired_scatter':
-            fig = self.draw_paired_scatter(df, properties, data_settings)
-        elif self.main.current_graph_type == 'histogram':
+        if state['graph_type'] == 'paired_scatter':
+            fig = self.draw_paired_scatter(df, properties, data_settings, state)
+        elif state['graph_type'] == 'histogram':
             fig = self.draw_histogram(df, properties, data_settings)
         else:
-            # ★★★ 新しい描画関数を呼び出す ★★★
-            fig = self.draw_categorical_plot(df, properties, data_settings)
-            
+            fig = self.draw_categorical_plot(df, properties, data_settings, state)
+        
         if fig:
-            self.replace_canvas(fig)
             self.update_graph_properties(fig, properties)
+        return fig
+
 
+    def _on_figure_rendered(self, fig):
+        """描画用スレッドで完成したFigureを表示する（GUIスレッド）"""
+        if fig is None:
+            self.clear_canvas()
+            return
+        self.replace_canvas(fig)
+        self._store_figure(self._pending_signature, fig)
+
+
+    def _store_figure(self, signature, fig):
+        """描画済みのFigureをキャッシュに追加し、上限を超えた古いものを取り除く"""
+        if signature is None or self._figure_cache_max_entries == 0:
+            return
+        size = _estimate_figure_bytes(fig)
+        if size > self._figure_cache_max_bytes:
+            return
+        self._drop_cached_figure(signature)
+        self._figure_cache[signature] = (fig, size)
+        self._figure_cache_bytes += size
+        self._trim_figure_cache()
+
+
+    def _trim_figure_cache(self):
+        while self._figure_cache and (
+            len(self._figure_cache) > self._figure_cache_max_entries
+            or self._figure_cache_bytes > self._figure_cache_max_bytes
+        ):
+            signature = next(iter(self._figure_cache))
+            self._drop_cached_figure(signature)
+
+
+    def _drop_cached_figure(self, signature):
+        """
+        キャッシュからFigureを取り除く。表示中でなければ、使い回し用に回して解放する。
+        """
+        entry = self._figure_cache.pop(signature, None)
+        if entry is None:
+            return
+        fig, size = entry
+        self._figure_cache_bytes -= size
+        if fig is not getattr(self.main.graph_widget, 'fig', None):
+            self._recycle_figure(fig)
 
+
+    def _is_cached_figure(self, fig):
+        return any(entry[0] is fig for entry in self._figure_cache.values())
+
+
+    def clear_figure_cache(self):
+        """描画済みFigureのキャッシュをすべて破棄する"""
+        for signature in list(self._figure_cache):
+            self._drop_cached_figure(signature)
+
+
+    def _on_render_failed(self, title, message):
+        QMessageBox.critical(self.main, title, message)
+
+
+    def _new_figure(self, n_rows=1, n_cols=1, **kwargs):
+        """
+        pyplotを介さずにFigureとAxesを作成する。
+        直前に表示から外れたFigureのレイアウトが同じ場合は、Axesを空にして使い回す。
+        描画用スレッドで文字の大きさなどを計算できるよう、Aggのキャンバスを割り当てておく。
+        """
+        layout = kwargs.pop('layout', 'constrained')
+        figsize = kwargs.pop('figsize', None)
+        layout_key = (n_rows, n_cols, figsize, layout, tuple(sorted(kwargs.items())))
+        
+        with self._spare_lock:
+            fig, self._spare_figure = self._spare_figure, None
+        
+        reusable = getattr(fig, '_calcite_layout', None)
+        if reusable is not None and reusable[0] == layout_key:
+            axes = reusable[1]
+            for ax in np.ravel(axes):
+                self._reset_axes(ax)
+            fig.suptitle('')
+            FigureCanvasAgg(fig)
+            return fig, axes
+        
+        if fig is not None:
+            fig.clear()
+        fig = Figure(figsize=figsize, layout=layout)
+        FigureCanvasAgg(fig)
+        axes = fig.subplots(n_rows, n_cols, **kwargs)
+        fig._calcite_layout = (layout_key, axes)
+        return fig, axes
+
+
+    @staticmethod
+    def _reset_axes(ax):
+        """使い回すAxesを、新しく作成した直後と同じ状態に戻す"""
+        ax.cla()
+        for spine in ax.spines.values():
+            spine.set_visible(True)
+            # set_boundsで短くした軸線を元に戻す（公開APIでは解除できないため直接戻す）
+            spine._bounds = None
+
+
+    def _recycle_figure(self, fig):
+        """
+        表示から外れたFigureを、次の描画で使い回せるよう保持する。
+        保持しきれないFigureはclearして、描画要素をすぐに解放する。
+        """
+        if fig is None:
+            return
+        with self._spare_lock:
+            fig, self._spare_figure = self._spare_figure, fig
+        if fig is not None:
+            fig.clear()
+
+
+    @profiled("apply_annotations", "statannotations")
     def apply_annotations(self, ax, df, data_settings, hue_order, annotations_to_plot):
         if not annotations_to_plot:
             return
@@ -73,28 +390,30 @@ class GraphManager:
                 annotator_kwargs['hue'] = subgroup_col
                 annotator_kwargs['hue_order'] = hue_order
             
-            annotator = Annotator(**annotator_kwargs)
-            pvalue_thresholds = [[1e-4, "****"], [1e-3, "***"], [1e-2, "**"], [0.05, "*"], [1.0, "n.s."]]
-            annotator.configure(text_format='star', loc='inside', verbose=0, pvalue_thresholds=pvalue_thresholds)
-            annotator.set_pvalues(p_values)
-            annotator.annotate()
+            with current_figure(ax.figure):
+                annotator = annotator_class()(**annotator_kwargs)
+                pvalue_thresholds = [[1e-4, "****"], [1e-3, "***"], [1e-2, "**"], [0.05, "*"], [1.0, "n.s."]]
+                annotator.configure(text_format='star', loc='inside', verbose=0, pvalue_thresholds=pvalue_thresholds)
+                annotator.set_pvalues(p_values)
+                annotator.annotate()
             
         except Exception as e:
             print(f"Annotation Error during plotting: {e}")
             traceback.print_exc()
 
 
-    def draw_categorical_plot(self, df, properties, data_settings):
+    @profiled("draw_categorical_plot", "graph")
+    def draw_categorical_plot(self, df, properties, data_settings, state):
         """
         レイヤー化アーキテクチャに基づき、カテゴリカルなグラフを描画する。
+        X軸またはY軸が未選択の場合はNoneを返す（キャンバスはクリアされる）。
         """
         current_x = data_settings.get('x_col')
         current_y = data_settings.get('y_col')
         if not current_x or not current_y:
-            self.clear_canvas()
             return None
 
-        base_kind = self.main.current_graph_type
+        base_kind = state['graph_type']
         visual_hue_col = data_settings.get('subgroup_col')
         if not visual_hue_col:
             visual_hue_col = None
@@ -102,13 +421,15 @@ class GraphManager:
         # 分析上のhueは、X軸と異なる場合のみ意味を持つ
         analysis_hue_col = visual_hue_col if visual_hue_col != current_x else None
         facet_col = data_settings.get('facet_col')
+        fig = None
 
         try:
-            df_processed = df.copy()
-            if visual_hue_col:
-                df_processed[visual_hue_col] = df_processed[visual_hue_col].astype(str)
-            if base_kind not in ['scatter', 'summary_scatter', 'lineplot']:
-                df_processed[current_x] = df_processed[current_x].astype(str)
+            with span("copy_data", "data"):
+                df_processed = df.copy()
+                if visual_hue_col:
+                    df_processed[visual_hue_col] = df_processed[visual_hue_col].astype(str)
+                if base_kind not in ['scatter', 'summary_scatter', 'lineplot']:
+                    df_processed[current_x] = df_processed[current_x].astype(str)
             
             x_order = df_processed[current_x].unique()
             
@@ -116,11 +437,11 @@ class GraphManager:
             col_categories = df_processed[facet_col].unique() if facet_col else [None]
             n_rows, n_cols = 1, len(col_categories)
 
-            fig, axes = plt.subplots(
+            fig, axes = self._new_figure(
                 n_rows, n_cols, figsize=(n_cols * 5, n_rows * 4),
                 sharex=False, sharey=True, squeeze=False, layout='constrained'
             )
-            all_relevant_annotations = [ann for ann in self.main.statistical_annotations if ann.get('value_col') == current_y]
+            all_relevant_annotations = [ann for ann in state['statistical_annotations'] if ann.get('value_col') == current_y]
 
             for j, col_cat in enumerate(col_categories):
                 ax = axes[0, j]
@@ -166,7 +487,8 @@ class GraphManager:
                     if base_kind == 'lineplot' and 'order' in base_kwargs:
                         del base_kwargs['order']
                     
-                    base_plot_map[base_kind](**base_kwargs)
+                    with span("seaborn", "seaborn", plot=base_kind):
+                        base_plot_map[base_kind](**base_kwargs)
 
                 if base_kind in ['scatter', 'summary_scatter']:
                     scatter_kwargs = {
@@ -183,7 +505,13 @@ class GraphManager:
                         single_color = properties.get('single_color'); 
                         if single_color: scatter_kwargs['color'] = single_color
                     
-                    sns.scatterplot(**scatter_kwargs)
+                    if base_kind == 'scatter' and use_density_scatter(properties.get('scatter_mode', 'auto'), plot_df, current_x, current_y):
+                        # 点が多い場合は、画素単位で集計した密度画像として描く
+                        marker_kwargs = {key: scatter_kwargs[key] for key in ('marker', 'edgecolor', 'linewidth', 's', 'alpha')}
+                        draw_density_scatter(ax, plot_df, current_x, current_y, visual_hue_col, subgroup_palette, properties.get('single_color'), marker_kwargs)
+                    else:
+                        with span("seaborn", "seaborn", plot="scatterplot"):
+                            sns.scatterplot(**scatter_kwargs)
                     if base_kind == 'summary_scatter':
                         if visual_hue_col:
                             for hue_val, grp in plot_df.groupby(visual_hue_col):
@@ -195,20 +523,21 @@ class GraphManager:
                         
                         should_dodge = bool(analysis_hue_col) and base_kind != 'pointplot'
                         
-                        sns.stripplot(
-                            data=original_subset_df, x=current_x, y=current_y,
-                            hue=visual_hue_col,
-                            ax=ax,
-                            jitter=True,
-                            alpha=properties.get('marker_alpha', 0.6),
-                            palette=subgroup_palette,
-                            marker=properties.get('marker_style', 'o'),
-                            edgecolor=properties.get('marker_edgecolor', 'black'),
-                            linewidth=properties.get('marker_edgewidth', 1.0),
-                            s=properties.get('marker_size', 5.0),
-                            dodge=should_dodge,
-                            order=x_order
-                        )
+                        with span("seaborn", "seaborn", plot="stripplot"):
+                            sns.stripplot(
+                                data=original_subset_df, x=current_x, y=current_y,
+                                hue=visual_hue_col,
+                                ax=ax,
+                                jitter=True,
+                                alpha=properties.get('marker_alpha', 0.6),
+                                palette=subgroup_palette,
+                                marker=properties.get('marker_style', 'o'),
+                                edgecolor=properties.get('marker_edgecolor', 'black'),
+                                linewidth=properties.get('marker_edgewidth', 1.0),
+                                s=properties.get('marker_size', 5.0),
+                                dodge=should_dodge,
+                                order=x_order
+                            )
                 
                 title_parts = []; 
                 if facet_col: title_parts.append(f"{col_cat}")
@@ -229,7 +558,7 @@ class GraphManager:
                         ax.get_legend().remove()
 
                 # --- Step 2: グラフタイプに応じて凡例の「部品」を生成 ---
-                base_kind = self.main.current_graph_type
+                base_kind = state['graph_type']
                 
                 # Bar, Box, Violinの場合は、凡例の部品を手動で作成する
                 if base_kind in ['bar', 'boxplot', 'violin']:
@@ -276,8 +605,8 @@ class GraphManager:
             if base_kind in ['scatter', 'summary_scatter'] and not is_faceted:
                 ax = axes[0, 0]
 
-                if self.main.regression_line_params:
-                    params_dict = self.main.regression_line_params
+                if state['regression_line_params']:
+                    params_dict = state['regression_line_params']
                     # サブグループごとに描画するか、単一で描画するかを判断
                     if params_dict and 'x_line' not in params_dict: # サブグループごとのデータ
                         for group_name, params in params_dict.items():
@@ -295,8 +624,8 @@ class GraphManager:
                         ax.legend()
 
                 # ▼▼▼ 4PL非線形回帰の描画ロジックを修正 ▼▼▼
-                if self.main.fit_params:
-                    params_dict = self.main.fit_params
+                if state['fit_params']:
+                    params_dict = state['fit_params']
                     if params_dict and 'params' not in params_dict: # サブグループごとのデータ
                         for group_name, params_info in params_dict.items():
                             fit_params = params_info["params"]
@@ -324,70 +653,92 @@ class GraphManager:
             
             return fig
         except Exception as e:
-            QMessageBox.critical(self.main, "Graph Error", f"An unexpected error occurred: {e}")
             print(f"Graph drawing error: {e}"); traceback.print_exc()
-            return None
+            self._recycle_figure(fig)
+            raise RenderError("Graph Error", f"An unexpected error occurred: {e}") from e
 
 
-    def draw_paired_scatter(self, df, properties, data_settings):
+    @profiled("draw_paired_scatter", "graph")
+    def draw_paired_scatter(self, df, properties, data_settings, state):
         
         col1 = data_settings.get('col1')
         col2 = data_settings.get('col2')
         if not (col1 and col2 and col1 != col2): return None
-        fig, ax = plt.subplots(layout='constrained')
+        fig, ax = self._new_figure(layout='constrained')
         try:
             plot_df_long = self._draw_paired_plot_seaborn(ax, df, col1, col2, properties)
             
-            if plot_df_long is not None and self.main.paired_annotations:
+            if plot_df_long is not None and state['paired_annotations']:
                 # このプロットに関連するアノテーションのみを抽出
                 annotations_to_plot = [
-                    ann for ann in self.main.paired_annotations
+                    ann for ann in state['paired_annotations']
                     if set(ann['box_pair']) == {col1, col2}
                 ]
                 if annotations_to_plot:
                     pairs = [ann['box_pair'] for ann in annotations_to_plot]
                     p_values = [ann['p_value'] for ann in annotations_to_plot]
                     
-                    annotator = Annotator(
-                        ax, pairs, data=plot_df_long,
-                        x='Condition', y='Value'
-                    )
-                    pvalue_thresholds = [[1e-4, "****"], [1e-3, "***"], [1e-2, "**"], [0.05, "*"], [1.0, "n.s."]]
-                    annotator.configure(text_format='star', loc='outside', verbose=0, pvalue_thresholds=pvalue_thresholds)
-                    annotator.set_pvalues(p_values)
-                    annotator.annotate()
+                    with span("apply_annotations", "statannotations"), current_figure(fig):
+                        annotator = annotator_class()(
+                            ax, pairs, data=plot_df_long,
+                            x='Condition', y='Value'
+                        )
+                        pvalue_thresholds = [[1e-4, "****"], [1e-3, "***"], [1e-2, "**"], [0.05, "*"], [1.0, "n.s."]]
+                        annotator.configure(text_format='star', loc='outside', verbose=0, pvalue_thresholds=pvalue_thresholds)
+                        annotator.set_pvalues(p_values)
+                        annotator.annotate()
             
             self.update_graph_properties(fig, properties)
             
             return fig
         
         except Exception as e:
-            QMessageBox.critical(self.main, "Error", f"Failed to draw paired plot: {e}")
-            return None
+            self._recycle_figure(fig)
+            raise RenderError("Error", f"Failed to draw paired plot: {e}") from e
 
 
+    @profiled("replace_canvas", "qt")
     def replace_canvas(self, new_fig):
         """
-        古いFigureCanvasをウィジェットから削除し、新しいものに置き換える。
+        表示するFigureを差し替える。
+        キャンバス（Qtのウィジェット）はウィンドウごとに1つを使い続け、Figureだけを付け替える。
+        外れたFigureは次の描画で使い回すために保持する。
         """
+        canvas = getattr(self.main.graph_widget, 'canvas', None)
+        if canvas is None:
+            # キャンバスはQtのウィジェットなので、必ずGUIスレッドで作成する
+            canvas = ProfiledCanvas(new_fig)
+            self.main.graph_widget.layout().addWidget(canvas)
+            self.main.graph_widget.canvas = canvas
+        else:
+            old_fig = canvas.figure
+            if old_fig is not new_fig:
+                self._attach_figure(canvas, new_fig)
+                # Qtのキャンバスから切り離し、キャッシュしていなければ描画用スレッドで使い回す
+                FigureCanvasAgg(old_fig)
+                if not self._is_cached_figure(old_fig):
+                    self._recycle_figure(old_fig)
         
-        # 既存のキャンバスがあれば、レイアウトから削除して安全に破棄する
-        if hasattr(self.main.graph_widget, 'canvas') and self.main.graph_widget.canvas:
-            self.main.graph_widget.canvas.setParent(None)
-            self.main.graph_widget.canvas.deleteLater()
-        
-        # 新しいFigureから新しいキャンバスを作成
-        new_canvas = new_fig.canvas
-        # GraphWidgetのレイアウトに新しいキャンバスを追加
-        self.main.graph_widget.layout().addWidget(new_canvas)
-        
-        # 新しいキャンバスとFigureへの参照を保持
-        self.main.graph_widget.canvas = new_canvas
         self.main.graph_widget.fig = new_fig
         if hasattr(self.main.graph_widget.fig, 'axes') and self.main.graph_widget.fig.axes:
              self.main.graph_widget.ax = self.main.graph_widget.fig.axes[0]
 
 
+    @staticmethod
+    def _attach_figure(canvas, fig):
+        """
+        表示中のキャンバスにFigureを付け替え、キャンバスの大きさと解像度に合わせる。
+        """
+        fig.set_canvas(canvas)
+        canvas.figure = fig
+        ratio = canvas.device_pixel_ratio
+        fig.set_dpi(getattr(fig, '_original_dpi', fig.dpi) * ratio)
+        if canvas.width() > 0 and canvas.height() > 0:
+            fig.set_size_inches(canvas.width() * ratio / fig.dpi, canvas.height() * ratio / fig.dpi, forward=False)
+        canvas.draw_idle()
+
+
+    @profiled("update_graph_properties", "graph")
     def update_graph_properties(self, fig, properties):
         """
         UIパネルの設定に基づいて、FigureとAxesの見た目を更新する。
@@ -429,8 +780,18 @@ class GraphManager:
 
 
     def clear_canvas(self):
+        # 描画中の結果が、クリア後に表示されないようにする
+        self._renderer.cancel()
         if hasattr(self.main.graph_widget, 'canvas') and self.main.graph_widget.canvas:
-            self.main.graph_widget.canvas.figure.clear()
+            fig = self.main.graph_widget.canvas.figure
+            # 表示中のFigureを消去するため、キャッシュからも取り除く
+            for signature, entry in list(self._figure_cache.items()):
+                if entry[0] is fig:
+                    self._figure_cache.pop(signature)
+                    self._figure_cache_bytes -= entry[1]
+            fig.clear()
+            # Axesを削除したため、このFigureはレイアウトを使い回せない
+            fig._calcite_layout = None
             self.main.graph_widget.canvas.draw()
 
 
@@ -441,7 +802,8 @@ class GraphManager:
         file_path, _ = QFileDialog.getSaveFileName(self.main, "Save Graph", "", "PNG (*.png);;JPEG (*.jpg);;SVG (*.svg);;PDF (*.pdf)")
         if file_path:
             try:
-                self.main.graph_widget.fig.savefig(file_path, dpi=300, bbox_inches='tight')
+                with span("export_graph", "export", path=file_path):
+                    self.main.graph_widget.fig.savefig(file_path, dpi=300, bbox_inches='tight')
                 QMessageBox.information(self.main, "Success", f"Graph successfully saved to:\n{file_path}")
             except Exception as e:
                 QMessageBox.critical(self.main, "Error", f"Failed to save graph: {e}")
@@ -480,62 +842,60 @@ class GraphManager:
 
 
     def _draw_paired_plot_seaborn(self, ax, df, col1, col2, properties):
-        try:
-            plot_df = df[[col1, col2]].dropna().copy()
-            if plot_df.empty: return None
-            plot_df['ID'] = range(len(plot_df))
-            plot_df_long = pd.melt(plot_df, id_vars='ID', value_vars=[col1, col2], var_name='Condition', value_name='Value')
-            
-            # 1. 専用のラベルを取得（なければ元の列名を使用）
-            label1 = properties.get('paired_label1') or col1
-            label2 = properties.get('paired_label2') or col2
-            
-            # 2. 線のスタイルをプロパティから適用
-            sns.lineplot(data=plot_df_long, x='Condition', y='Value', units='ID', 
-                        estimator=None, color='gray', alpha=0.5, ax=ax,
-                        linestyle=properties.get('linestyle', '-'),
-                        linewidth=properties.get('linewidth', 1.5))
-            
-            # 3. マーカーのスタイルをプロパティから適用
-            sns.scatterplot(data=plot_df_long, x='Condition', y='Value', 
-                            color=properties.get('single_color', 'black'), 
-                            marker=properties.get('marker_style', 'o'), 
-                            edgecolor=properties.get('marker_edgecolor', 'black'), 
-                            linewidth=properties.get('marker_edgewidth', 1.0), 
-                            ax=ax, legend=False)
-            
-            mean_df = plot_df_long.groupby('Condition')['Value'].mean().reindex([col1, col2])
-            ax.plot(mean_df.index, mean_df.values, color='red', marker='_', markersize=20, mew=2.5, linestyle='None', label='Mean')
-            
-            # 4. X軸の目盛りラベルを設定
-            ax.set_xticks([0, 1])
-            ax.set_xticklabels([label1, label2])
-            
-            # 5. X軸のメインラベルは不要なので消去
-            ax.set_xlabel('')
-            
-            # 6. 凡例の位置をプロパティから適用
-            handles, labels = ax.get_legend_handles_labels()
-            if handles:
-                legend_pos = properties.get('legend_position', 'best')
-                # 'best'は枠外配置に対応していないため、手動で調整
-                if legend_pos == 'best':
-                    ax.legend(handles=handles, labels=labels, loc='upper left', bbox_to_anchor=(1.02, 1))
-                else:
-                    ax.legend(handles=handles, labels=labels, loc=legend_pos)
-                    
-            return plot_df_long
+        """対応のあるデータを描画する。エラーは呼び出し元のdraw_paired_scatterで扱う。"""
+        plot_df = df[[col1, col2]].dropna().copy()
+        if plot_df.empty: return None
+        plot_df['ID'] = range(len(plot_df))
+        plot_df_long = pd.melt(plot_df, id_vars='ID', value_vars=[col1, col2], var_name='Condition', value_name='Value')
         
-        except Exception as e:
-            QMessageBox.critical(self.main, "Error", f"Failed to draw paired plot: {e}")
+        # 1. 専用のラベルを取得（なければ元の列名を使用）
+        label1 = properties.get('paired_label1') or col1
+        label2 = properties.get('paired_label2') or col2
+        
+        # 2. 線のスタイルをプロパティから適用
+        sns.lineplot(data=plot_df_long, x='Condition', y='Value', units='ID', 
+                    estimator=None, color='gray', alpha=0.5, ax=ax,
+                    linestyle=properties.get('linestyle', '-'),
+                    linewidth=properties.get('linewidth', 1.5))
+        
+        # 3. マーカーのスタイルをプロパティから適用
+        sns.scatterplot(data=plot_df_long, x='Condition', y='Value', 
+                        color=properties.get('single_color', 'black'), 
+                        marker=properties.get('marker_style', 'o'), 
+                        edgecolor=properties.get('marker_edgecolor', 'black'), 
+                        linewidth=properties.get('marker_edgewidth', 1.0), 
+                        ax=ax, legend=False)
+        
+        mean_df = plot_df_long.groupby('Condition')['Value'].mean().reindex([col1, col2])
+        ax.plot(mean_df.index, mean_df.values, color='red', marker='_', markersize=20, mew=2.5, linestyle='None', label='Mean')
+        
+        # 4. X軸の目盛りラベルを設定
+        ax.set_xticks([0, 1])
+        ax.set_xticklabels([label1, label2])
+        
+        # 5. X軸のメインラベルは不要なので消去
+        ax.set_xlabel('')
+        
+        # 6. 凡例の位置をプロパティから適用
+        handles, labels = ax.get_legend_handles_labels()
+        legend_pos = properties.get('legend_position', 'best')
+        if handles and legend_pos != 'hide':
+            # 'best'は枠外配置に対応していないため、手動で調整
+            if legend_pos == 'best':
+                ax.legend(handles=handles, labels=labels, loc='upper left', bbox_to_anchor=(1.02, 1))
+            else:
+                ax.legend(handles=handles, labels=labels, loc=legend_pos)
+                
+        return plot_df_long
 
 
+    @profiled("draw_histogram", "graph")
     def draw_histogram(self, df, properties, data_settings):
         value_col = data_settings.get('y_col')
         if not value_col: return None
         hue_col = data_settings.get('subgroup_col')
         if not hue_col: hue_col = None
-        fig, ax = plt.subplots(layout='constrained')
+        fig, ax = self._new_figure(layout='constrained')
         plot_kwargs = {}
         
         if hue_col:
@@ -545,9 +905,11 @@ class GraphManager:
             plot_kwargs['color'] = properties.get('single_color')
         
         try:
-            sns.histplot(data=df, x=value_col, hue=hue_col, ax=ax, **plot_kwargs)
+            with span("seaborn", "seaborn", plot="histplot"):
+                sns.histplot(data=df, x=value_col, hue=hue_col, ax=ax, **plot_kwargs)
             return fig
         except Exception as e:
-            print(f"Graph drawing error: {e}")
-            traceback.print_exc()
-            return None
\ No newline at end of file
+            print(f"Graph drawing error: {e}"); traceback.print_exc()
+            # 表示されないFigureは、次の描画で使い回す
+            self._recycle_figure(fig)
+            raise RenderError("Graph Error", f"Failed to draw histogram: {e}") from e
\ No newline at end of file
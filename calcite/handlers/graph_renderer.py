@@ -0,0 +1,196 @@
+# handlers/graph_renderer.py
+
+import threading
+import traceback
+from contextlib import contextmanager
+
+import matplotlib.pyplot as plt
+from PySide6.QtCore import QCoreApplication, QObject, QThread, Signal, Slot
+
+from ..lazy_imports import register_import_hook, load_module
+
+# 描画用スレッドで組み立て中のFigure（スレッドごと）
+_render_local = threading.local()
+
+
+class RenderError(Exception):
+    """
+    描画中に発生した、ユーザーに知らせるべきエラー。
+    GUIスレッドでQMessageBoxに表示するため、タイトルとメッセージを保持する。
+    """
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
+        self.message = message
+
+
+def snapshot_frame(df):
+    """
+    描画スレッドに渡すためのDataFrameのスナップショットを返す。
+    pandas 3のCopy-on-Writeにより、浅いコピーで元データの変更から切り離される。
+    """
+    return df.copy(deep=False)
+
+
+@contextmanager
+def current_figure(fig):
+    """
+    pyplotの「現在のFigure」を前提にしたライブラリ（statannotations）を、
+    pyplotを介さずに作成したFigureで使うためのコンテキスト。
+    """
+    previous = getattr(_render_local, 'figure', None)
+    _render_local.figure = fig
+    try:
+        yield fig
+    finally:
+        _render_local.figure = previous
+
+
+class _PyplotProxy:
+    """
+    statannotationsが参照するpyplotの代わりとなるオブジェクト。
+    current_figureの中では、gcf()が組み立て中のFigureを返し、draw()は何もしない。
+    それ以外の属性はpyplotにそのまま委譲する。
+    """
+    def __init__(self, pyplot):
+        self._pyplot = pyplot
+
+    def gcf(self):
+        fig = getattr(_render_local, 'figure', None)
+        return fig if fig is not None else self._pyplot.gcf()
+
+    def draw(self):
+        # 描画用スレッドからQtのキャンバスに触れないよう、描画はGUIスレッドでの表示時に任せる
+        if getattr(_render_local, 'figure', None) is None:
+            self._pyplot.draw()
+
+    def __getattr__(self, name):
+        return getattr(self._pyplot, name)
+
+
+def _patch_statannotations(_module=None):
+    """
+    statannotationsが参照するpyplotを_PyplotProxyに差し替える。差し替えられた場合はTrueを返す。
+    statannotations 0.7系（setup.pyで固定）の構成を前提にしている:
+    Annotator.draw()がモジュールのplt.draw()を呼び、内部の_Plotterが作成時にplt.gcf()でFigureを取得する。
+    """
+    import statannotations.Annotator
+    try:
+        import statannotations._Plotter as plotter_module
+    except ImportError:
+        return False
+    for module in (statannotations.Annotator, plotter_module):
+        current = getattr(module, 'plt', None)
+        if current is plt:
+            module.plt = _PyplotProxy(plt)
+        elif not isinstance(current, _PyplotProxy):
+            return False
+    return True
+
+
+def annotator_class():
+    """
+    描画用スレッドで、current_figureのFigureに描画できるstatannotationsのAnnotatorクラスを返す。
+    statannotationsの構成が変わって差し替えられない場合は、pyplotのFigureをQtのGUIスレッド以外で
+    作成してしまうため、黙って描画せずにRuntimeErrorとする。
+    """
+    module = load_module("statannotations.Annotator")
+    if not _patch_statannotations():
+        raise RuntimeError(
+            "This version of statannotations is not supported for drawing annotations; "
+            "install statannotations 0.7.x."
+        )
+    return module.Annotator
+
+
+# statannotationsは初めて描画するとき（またはプリウォーム時）に読み込まれるため、その時点で差し替える
+register_import_hook("statannotations.Annotator", _patch_statannotations)
+
+
+class FigureRenderWorker(QObject):
+    """
+    描画用スレッドでFigureを組み立てるクラス。
+    render_funcはGUIに触れずに、描画条件の辞書からFigure（またはNone）を作成する関数。
+    """
+    rendered = Signal(int, object)
+    failed = Signal(int, str, str)
+
+    def __init__(self, render_func, is_current):
+        super().__init__()
+        self._render_func = render_func
+        self._is_current = is_current
+
+    @Slot(int, object)
+    def render(self, generation, state):
+        # 待っている間に新しい描画要求が来ていれば、古い要求は描画せずに捨てる
+        if not self._is_current(generation):
+            return
+        try:
+            fig = self._render_func(state)
+        except RenderError as e:
+            self.failed.emit(generation, e.title, e.message)
+            return
+        except Exception as e:
+            traceback.print_exc()
+            self.failed.emit(generation, "Graph Error", f"An unexpected error occurred: {e}")
+            return
+        self.rendered.emit(generation, fig)
+
+
+class FigureRenderThread(QObject):
+    """
+    FigureRenderWorkerを専用スレッドで動かすクラス（GUIスレッド側）。
+    要求ごとに世代番号を振り、最新の要求に対する結果だけをGUIスレッドで再送出する。
+    古い要求に対して作成されたFigureはdiscardedで通知する。
+    """
+    rendered = Signal(object)
+    failed = Signal(str, str)
+    discarded = Signal(object)
+    _renderRequested = Signal(int, object)
+
+    def __init__(self, render_func, parent):
+        super().__init__(parent)
+        self._generation = 0
+
+        self._thread = QThread(self)
+        self._worker = FigureRenderWorker(render_func, self.is_current)
+        self._worker.moveToThread(self._thread)
+        self._renderRequested.connect(self._worker.render)
+        self._worker.rendered.connect(self._on_rendered)
+        self._worker.failed.connect(self._on_failed)
+
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.stop)
+        self._thread.start()
+
+    def request(self, state):
+        """描画を要求する。それまでの要求は古いものとして扱われる。"""
+        self._generation += 1
+        self._renderRequested.emit(self._generation, state)
+
+    def cancel(self):
+        """未完了の描画要求をすべて無効にする"""
+        self._generation += 1
+
+    def is_current(self, generation):
+        return generation == self._generation
+
+    def stop(self):
+        """スレッドを終了させる。ウィンドウを閉じる際に呼び出す。"""
+        if self._thread.isRunning():
+            self.cancel()
+            self._thread.quit()
+            self._thread.wait()
+
+    @Slot(int, object)
+    def _on_rendered(self, generation, fig):
+        if self.is_current(generation):
+            self.rendered.emit(fig)
+        else:
+            self.discarded.emit(fig)
+
+    @Slot(int, str, str)
+    def _on_failed(self, generation, title, message):
+        if self.is_current(generation):
+            self.failed.emit(title, message)
@@ -0,0 +1,140 @@
+# handlers/grouping.py
+
+import numpy as np
+import pandas as pd
+
+# X軸とサブグループを組み合わせたグループ名の区切り文字（statannotations用のペア変換でも使う）
+UNIQUE_SEPARATOR = '_#%%%_'
+
+
+def _factorize_labels(series):
+    """
+    列を文字列としての値で整数コードに変換し、(コード, ラベルのリスト) を返す。
+    欠損値のコードは-1。ラベルは出現順に並ぶ。
+    """
+    codes, uniques = pd.factorize(series)
+    labels = pd.Index(uniques).astype(str)
+    if labels.has_duplicates:
+        # 1 と '1' のように、文字列にすると同じになる値を1つのラベルにまとめる
+        remap, labels = pd.factorize(labels)
+        codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], -1)
+    return np.asarray(codes, dtype=np.intp), [str(label) for label in labels]
+
+
+class GroupIndex:
+    """
+    X軸・サブグループ・ファセットの列を一度だけ整数コードに変換し、
+    (ファセット, グループ) ごとに行をまとめた並び順を保持するクラス。
+    値の列は、この並び順に並べ替えたNumPy配列として取り出せるため、
+    グループごとのデータはスライスするだけで得られる（グループ数に比例した走査が不要）。
+
+    グループ名は、サブグループがある場合 'X' + UNIQUE_SEPARATOR + 'hue'、ない場合は 'X'。
+    get_columnを指定した場合、値の列はdfではなくget_column(列名)で取り出す
+    （dfにはグループ分けに使う列だけを渡せる）。
+    """
+    def __init__(self, df, x_col, hue_col=None, facet_col=None, column_version=None, get_column=None):
+        self.x_col = x_col
+        self.hue_col = hue_col if hue_col and hue_col in df.columns and hue_col != x_col else None
+        self.facet_col = facet_col if facet_col and facet_col in df.columns else None
+
+        x_codes, self.x_labels = _factorize_labels(df[x_col])
+        if self.hue_col:
+            hue_codes, self.hue_labels = _factorize_labels(df[self.hue_col])
+            n_hue = max(len(self.hue_labels), 1)
+            group_codes = np.where((x_codes >= 0) & (hue_codes >= 0), x_codes * n_hue + hue_codes, -1)
+            self.group_names = [
+                f"{x}{UNIQUE_SEPARATOR}{hue}" for x in self.x_labels for hue in self.hue_labels
+            ]
+        else:
+            self.hue_labels = []
+            group_codes = x_codes
+            self.group_names = list(self.x_labels)
+        self._group_pos = {name: i for i, name in enumerate(self.group_names)}
+
+        if self.facet_col:
+            facet_codes, facet_uniques = pd.factorize(df[self.facet_col])
+            facet_codes = np.asarray(facet_codes, dtype=np.intp)
+            self.facet_values = list(facet_uniques)
+        else:
+            facet_codes = np.zeros(len(df), dtype=np.intp)
+            self.facet_values = [None]
+
+        n_groups = len(self.group_names)
+        valid = (group_codes >= 0) & (facet_codes >= 0)
+        keys = facet_codes * n_groups + group_codes
+        keys[~valid] = -1
+
+        # 有効な行を (ファセット, グループ) の順に安定ソートし、各区間の境界を求める
+        rows = np.flatnonzero(valid)
+        order = np.argsort(keys[rows], kind='stable')
+        self._rows = rows[order]
+        counts = np.bincount(keys[self._rows], minlength=len(self.facet_values) * n_groups)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._get_column = get_column if get_column is not None else df.__getitem__
+        # 列名 -> 列の版数 を返す関数。値の列が編集された場合に、並べ替え済みの値を作り直すために使う
+        self._column_version = column_version
+        # (値の列名, 列の版数) -> (欠損を除いた並べ替え済みの値, 区間の境界)
+        self._values = {}
+
+    def _slot(self, name, facet_pos):
+        if facet_pos is None:
+            if self.facet_col:
+                # 先頭のファセットの値を黙って返さないよう、ファセットの指定を必須にする
+                raise ValueError(f"facet_pos is required because the groups are split by '{self.facet_col}'.")
+            facet_pos = 0
+        pos = self._group_pos.get(str(name))
+        if pos is None:
+            return None
+        return facet_pos * len(self.group_names) + pos
+
+    def sorted_values(self, value_col):
+        """値の列を (ファセット, グループ) 順に並べ替え、欠損値を除いた配列と区間の境界を返す"""
+        version = self._column_version(value_col) if self._column_version is not None else None
+        cached = self._values.get((value_col, version))
+        if cached is None:
+            values = self._get_column(value_col).to_numpy(dtype=float, na_value=np.nan)[self._rows]
+            keep = ~np.isnan(values)
+            offsets = np.concatenate([[0], np.cumsum(keep)])[self._offsets]
+            cached = (values[keep], offsets)
+            # 古い版の値は再利用されないため破棄する
+            self._values = {key: item for key, item in self._values.items() if key[0] != value_col}
+            self._values[(value_col, version)] = cached
+        return cached
+
+    def value_range(self, value_col, name, facet_pos=None):
+        """
+        指定したグループ（とファセット）の値が、sorted_valuesの配列のどの区間にあるかを (開始, 終了) で返す。
+        グループが存在しない場合は空の区間を返す。ファセットで分けている場合、facet_posは省略できない（ValueError）。
+        """
+        slot = self._slot(name, facet_pos)
+        if slot is None:
+            return 0, 0
+        _, offsets = self.sorted_values(value_col)
+        return int(offsets[slot]), int(offsets[slot + 1])
+
+    def values(self, value_col, name, facet_pos=None):
+        """指定したグループ（とファセット）の値を、欠損値を除いた配列で返す"""
+        start, end = self.value_range(value_col, name, facet_pos)
+        return self.sorted_values(value_col)[0][start:end]
+
+    def group_values(self, value_col, facet_pos=None, names=None):
+        """
+        グループ名 -> 値の配列 の辞書を返す。namesを省略した場合は、
+        そのファセットに行が存在するすべてのグループをグループ名の順に返す。
+        """
+        if names is None:
+            names = self.present_groups(facet_pos)
+        return {name: self.values(value_col, name, facet_pos) for name in names}
+
+    def present_groups(self, facet_pos=None):
+        """
+        指定したファセットに1行以上存在するグループ名のリストを返す（値の欠損は問わない）。
+        facet_posを省略した場合は、いずれかのファセットに存在するグループを返す。
+        """
+        counts = np.diff(self._offsets).reshape(len(self.facet_values), len(self.group_names))
+        counts = counts.sum(axis=0) if facet_pos is None else counts[facet_pos]
+        return [name for name, count in zip(self.group_names, counts) if count > 0]
+
+    def facets(self):
+        """(ファセットの位置, ファセットの値) を順に返す。ファセットがない場合は (0, None) のみ。"""
+        return list(enumerate(self.facet_values))
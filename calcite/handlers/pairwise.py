@@ -0,0 +1,62 @@
+# handlers/pairwise.py
+
+from itertools import combinations
+
+import numpy as np
+from scipy.stats import mannwhitneyu, t as t_dist
+from statsmodels.stats.multitest import multipletests
+
+
+def pairwise_ttest(samples):
+    """
+    グループ名 -> 値の配列 の辞書から、すべてのペアの独立t検定（等分散）をまとめて計算する。
+    各グループの平均・分散を一度だけ求め、ペアごとの統計量は配列演算で求める。
+    (ペアのリスト, t統計量の配列, p値の配列) を返す。
+    """
+    names = list(samples.keys())
+    pairs = list(combinations(names, 2))
+    if not pairs:
+        return [], np.empty(0), np.empty(0)
+
+    n = np.array([len(samples[name]) for name in names], dtype=float)
+    mean = np.array([np.mean(samples[name]) if len(samples[name]) else np.nan for name in names])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = np.array([np.var(samples[name], ddof=1) if len(samples[name]) > 1 else 0.0 for name in names])
+
+        i, j = np.triu_indices(len(names), k=1)
+        dof = n[i] + n[j] - 2
+        pooled = ((n[i] - 1) * var[i] + (n[j] - 1) * var[j]) / dof
+        t_stat = (mean[i] - mean[j]) / np.sqrt(pooled * (1 / n[i] + 1 / n[j]))
+        p_values = 2 * t_dist.sf(np.abs(t_stat), dof)
+
+    invalid = dof <= 0
+    t_stat[invalid] = np.nan
+    p_values[invalid] = np.nan
+    return pairs, t_stat, p_values
+
+
+def pairwise_mannwhitney(samples):
+    """
+    グループ名 -> 値の配列 の辞書から、すべてのペアのマン・ホイットニーのU検定を計算する。
+    (ペアのリスト, U統計量の配列, p値の配列) を返す。
+    """
+    pairs = list(combinations(samples.keys(), 2))
+    u_stat = np.full(len(pairs), np.nan)
+    p_values = np.full(len(pairs), np.nan)
+    for k, (name1, name2) in enumerate(pairs):
+        if len(samples[name1]) and len(samples[name2]):
+            u_stat[k], p_values[k] = mannwhitneyu(samples[name1], samples[name2])
+    return pairs, u_stat, p_values
+
+
+def adjust_pvalues(p_values, method):
+    """
+    p値の配列を多重比較補正する。methodがNoneの場合はそのまま返す。
+    計算できなかったペア（NaN）は補正の対象から除く。
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = p_values.copy()
+    valid = ~np.isnan(p_values)
+    if method and valid.any():
+        adjusted[valid] = multipletests(p_values[valid], method=method)[1]
+    return adjusted
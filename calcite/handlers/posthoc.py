@@ -0,0 +1,144 @@
+# handlers/posthoc.py
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2, norm, rankdata, studentized_range
+
+# tukey_hsdが返す構造化配列の型
+TUKEY_DTYPE = np.dtype([
+    ('group1', object), ('group2', object), ('meandiff', float),
+    ('p_adj', float), ('lower', float), ('upper', float), ('reject', bool),
+])
+
+# kruskal_dunnが返すダンの検定の構造化配列の型
+DUNN_DTYPE = np.dtype([('group1', object), ('group2', object), ('z', float), ('p_value', float)])
+
+
+@lru_cache(maxsize=256)
+def _critical_q(alpha, k, df):
+    """
+    上側確率がalphaとなるスチューデント化された範囲の値を返す。
+    studentized_range.ppfは数値積分を繰り返すため、(alpha, k, df) ごとに結果を再利用する。
+    """
+    return float(studentized_range.ppf(1 - alpha, k, df))
+
+
+def tukey_hsd(samples, alpha=0.05):
+    """
+    グループ名 -> 値の配列 の辞書から、TukeyのHSD検定（Tukey-Kramer法）を行う。
+    各グループの件数・平均・分散を一度だけ求め、すべてのペアを配列演算で計算する。
+    p値と臨界値は、scipy.stats.studentized_rangeでペアのq統計量をまとめて計算する。
+    statsmodelsのpairwise_tukeyhsdと同じく、グループ名の昇順でペアを作り、meandiff = group2 - group1 とする。
+    データのないグループは除外する。結果はTUKEY_DTYPEの構造化配列で返す。
+    """
+    names = sorted(name for name, values in samples.items() if len(values) > 0)
+    k = len(names)
+    n = np.array([len(samples[name]) for name in names], dtype=float)
+    mean = np.array([np.mean(samples[name]) for name in names])
+    sum_sq = np.array([np.sum((samples[name] - m) ** 2) for name, m in zip(names, mean)])
+
+    i, j = np.triu_indices(k, k=1)
+    result = np.empty(len(i), dtype=TUKEY_DTYPE)
+    if len(i) == 0:
+        return result
+
+    df = n.sum() - k
+    mse = sum_sq.sum() / df if df > 0 else np.nan
+    meandiff = mean[j] - mean[i]
+    std_pair = np.sqrt(mse / 2 * (1 / n[i] + 1 / n[j]))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        q = np.abs(meandiff) / std_pair
+    if df > 0:
+        p_adj = np.clip(studentized_range.sf(q, k, df), 0, 1)
+        q_crit = _critical_q(float(alpha), k, float(df))
+    else:
+        p_adj = np.full(len(i), np.nan)
+        q_crit = np.nan
+
+    names = np.array(names, dtype=object)
+    result['group1'] = names[i]
+    result['group2'] = names[j]
+    result['meandiff'] = meandiff
+    result['p_adj'] = p_adj
+    result['lower'] = meandiff - q_crit * std_pair
+    result['upper'] = meandiff + q_crit * std_pair
+    result['reject'] = p_adj < alpha
+    return result
+
+
+def format_tukey_table(result, alpha=0.05):
+    """tukey_hsdの結果を、statsmodelsのTukeyHSDの要約と同じ体裁の表にする"""
+    headers = ['group1', 'group2', 'meandiff', 'p-adj', 'lower', 'upper', 'reject']
+    rows = [
+        [str(row['group1']), str(row['group2']), f"{row['meandiff']:.4f}", f"{row['p_adj']:.4f}",
+         f"{row['lower']:.4f}", f"{row['upper']:.4f}", str(bool(row['reject']))]
+        for row in result
+    ]
+    widths = [max([len(header)] + [len(row[c]) for row in rows]) for c, header in enumerate(headers)]
+
+    def format_row(cells):
+        return " ".join(cell.rjust(width) for cell, width in zip(cells, widths))
+
+    total_width = sum(widths) + len(widths) - 1
+    lines = [
+        f"Multiple Comparison of Means - Tukey HSD, FWER={alpha:.2f}".center(total_width),
+        "=" * total_width,
+        format_row(headers),
+        "-" * total_width,
+    ]
+    lines.extend(format_row(row) for row in rows)
+    lines.append("-" * total_width)
+    return "\n".join(lines)
+
+
+def kruskal_dunn(samples):
+    """
+    グループ名 -> 値の配列 の辞書から、クラスカル・ウォリス検定とダンの多重比較検定をまとめて行う。
+    全データの順位付けと同順位の補正は一度だけ行い、両方の検定で共有する。
+    ダンの検定はscikit-posthocsのposthoc_dunn（補正なし）と同じく、グループ名の昇順でペアを作る。
+    データのないグループは除外する。(H統計量, p値, DUNN_DTYPEの構造化配列) を返す。
+    """
+    names = sorted(name for name, values in samples.items() if len(values) > 0)
+    k = len(names)
+    n = np.array([len(samples[name]) for name in names], dtype=float)
+    pooled = np.concatenate([samples[name] for name in names]) if names else np.empty(0)
+    total = len(pooled)
+
+    ranks = rankdata(pooled)
+    bounds = np.concatenate([[0], np.cumsum(n).astype(int)])
+    rank_sums = np.add.reduceat(ranks, bounds[:-1]) if k else np.empty(0)
+    rank_means = rank_sums / n
+
+    _, tie_counts = np.unique(pooled, return_counts=True)
+    tie_sum = float(np.sum(tie_counts.astype(float) ** 3 - tie_counts))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        h_stat = 12.0 / (total * (total + 1)) * np.sum(rank_sums ** 2 / n) - 3 * (total + 1)
+        h_stat /= 1 - tie_sum / (total ** 3 - total)
+        p_value = chi2.sf(h_stat, k - 1) if k > 1 else np.nan
+
+        i, j = np.triu_indices(k, k=1)
+        variance = total * (total + 1) / 12.0 - tie_sum / (12.0 * (total - 1))
+        z = np.abs(rank_means[i] - rank_means[j]) / np.sqrt(variance * (1 / n[i] + 1 / n[j]))
+
+    dunn = np.empty(len(i), dtype=DUNN_DTYPE)
+    names = np.array(names, dtype=object)
+    dunn['group1'] = names[i]
+    dunn['group2'] = names[j]
+    dunn['z'] = z
+    dunn['p_value'] = 2 * norm.sf(z)
+    return float(h_stat), float(p_value), dunn
+
+
+def dunn_matrix(dunn):
+    """ダンの検定の結果を、posthoc_dunnと同じ形式のp値の正方行列（DataFrame）にする"""
+    names = list(dict.fromkeys(list(dunn['group1']) + list(dunn['group2'])))
+    position = {name: pos for pos, name in enumerate(names)}
+    matrix = np.ones((len(names), len(names)))
+    rows = [position[name] for name in dunn['group1']]
+    cols = [position[name] for name in dunn['group2']]
+    matrix[rows, cols] = dunn['p_value']
+    matrix[cols, rows] = dunn['p_value']
+    return pd.DataFrame(matrix, index=names, columns=names)
@@ -0,0 +1,157 @@
+# handlers/project_io.py
+
+import io
+import json
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from .data_loader import iter_csv_stream
+
+# プロジェクトファイル（zip）内のメンバー名
+DATA_PARQUET = 'data.parquet'
+DATA_CSV = 'data.csv'
+SETTINGS_JSON = 'settings.json'
+ANALYSIS_JSON = 'analysis.json'
+
+# Parquetの列を一度にデコードする数
+PROJECT_COLUMN_BATCH = 8
+
+
+class NumpyArrayEncoder(json.JSONEncoder):
+    """
+    NumPyのndarrayや数値型を、JSONが理解できるPythonの基本型に変換する。
+    """
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return obj.tolist() # ndarray -> list
+        if isinstance(obj, pd.Series):
+            return obj.tolist()
+        if isinstance(obj, (np.int_, np.intc, np.intp, np.int8,
+                            np.int16, np.int32, np.int64, np.uint8,
+                            np.uint16, np.uint32, np.uint64)):
+            return int(obj)     # numpy int -> python int
+        if isinstance(obj, (np.float64, np.float16, np.float32)):
+            return float(obj)  # numpy float -> python float
+        return json.JSONEncoder.default(self, obj)
+
+
+def _to_arrow_table(df):
+    """
+    DataFrameをArrowテーブルに変換する。
+    pyarrowが無い場合や、列名・値がParquetに対応していない場合はNoneを返す。
+    """
+    try:
+        import pyarrow as pa
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except Exception as e:
+        print(f"DEBUG: Could not convert data for Parquet ({e}). Falling back to CSV.")
+        return None
+
+
+def _write_json(zf, name, obj, encoder=None):
+    with zf.open(name, 'w') as member:
+        with io.TextIOWrapper(member, encoding='utf-8') as f:
+            json.dump(obj, f, indent=4, cls=encoder)
+
+
+def write_project(file_path, df, settings, analysis_data):
+    """
+    プロジェクトファイルを書き出す。一時ディレクトリは使わず、各メンバーをzipへ直接書き込む。
+    テーブルは型情報付きのParquet（書き出せない場合はCSV）で保存し、書き出したメンバー名を返す。
+    """
+    table = _to_arrow_table(df)
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        if table is not None:
+            import pyarrow.parquet as pq
+            # Parquetは圧縮済みのため無圧縮で格納し、読み込み時の展開を省く
+            info = zipfile.ZipInfo(DATA_PARQUET)
+            info.compress_type = zipfile.ZIP_STORED
+            with zf.open(info, 'w', force_zip64=True) as member:
+                pq.write_table(table, member)
+            data_name = DATA_PARQUET
+        else:
+            with zf.open(DATA_CSV, 'w', force_zip64=True) as member:
+                with io.TextIOWrapper(member, encoding='utf-8', newline='') as f:
+                    df.to_csv(f, index=False)
+            data_name = DATA_CSV
+
+        _write_json(zf, SETTINGS_JSON, settings)
+        _write_json(zf, ANALYSIS_JSON, analysis_data, NumpyArrayEncoder)
+    return data_name
+
+
+def read_project_json(file_path):
+    """
+    プロジェクトファイルから設定と解析結果を読み込み、(settings, analysis_data) を返す。
+    含まれていないメンバーはNoneになる。
+    """
+    results = []
+    with zipfile.ZipFile(file_path, 'r') as zf:
+        names = set(zf.namelist())
+        for name in (SETTINGS_JSON, ANALYSIS_JSON):
+            if name in names:
+                with zf.open(name) as member:
+                    results.append(json.load(member))
+            else:
+                results.append(None)
+    return tuple(results)
+
+
+def project_data_reader(file_path):
+    """
+    プロジェクトのテーブルを読み込むための (read_parts, combine_parts) の組を返す。
+    DataLoadWorkerにそのまま渡せる。テーブルが含まれていない場合はNoneを返す。
+    """
+    with zipfile.ZipFile(file_path, 'r') as zf:
+        names = set(zf.namelist())
+    if DATA_PARQUET in names:
+        return (lambda: _iter_parquet_columns(file_path), _combine_column_batches)
+    if DATA_CSV in names:
+        return (lambda: _iter_csv_rows(file_path), _combine_row_chunks)
+    return None
+
+
+def _iter_parquet_columns(file_path, column_batch=PROJECT_COLUMN_BATCH):
+    """
+    zip内のParquetを列単位でデコードし、(部分データ, 進捗率) を順に返す。
+    zip内のファイルを後方にシークすると（Python 3.12より前は）先頭から読み直しになるため、
+    ファイルの内容は一度だけ順に読み込み、メモリ上のバッファから列ごとに読み出す。
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    with zipfile.ZipFile(file_path, 'r') as zf:
+        with zf.open(DATA_PARQUET) as member:
+            buffer = pa.py_buffer(member.read())
+    parquet_file = pq.ParquetFile(pa.BufferReader(buffer))
+    columns = parquet_file.schema_arrow.names
+    if not columns:
+        yield pd.DataFrame(), 1.0
+        return
+    for start in range(0, len(columns), column_batch):
+        batch = columns[start:start + column_batch]
+        table = parquet_file.read(columns=batch, use_pandas_metadata=True)
+        yield table.to_pandas(), (start + len(batch)) / len(columns)
+
+
+def _iter_csv_rows(file_path):
+    """
+    古いプロジェクトのCSVをzipから展開せずに行単位で読み込み、(チャンク, 進捗率) を順に返す。
+    """
+    with zipfile.ZipFile(file_path, 'r') as zf:
+        total_size = zf.getinfo(DATA_CSV).file_size
+        with zf.open(DATA_CSV) as member:
+            yield from iter_csv_stream(member, total_size, categorize=False)
+
+
+def _combine_column_batches(parts):
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, axis=1)
+
+
+def _combine_row_chunks(parts):
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, ignore_index=True)
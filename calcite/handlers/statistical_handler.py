@@ -2,15 +2,21 @@
 
 import pandas as pd
 import numpy as np
-from PySide6.QtWidgets import QMessageBox
+from PySide6.QtWidgets import QMessageBox, QApplication
+from PySide6.QtCore import QEventLoop
 from scipy.stats import (
-    ttest_ind, ttest_rel, f_oneway, linregress, chi2_contingency,
-    shapiro, spearmanr, mannwhitneyu, wilcoxon, kruskal
+    ttest_ind, ttest_rel, linregress, chi2_contingency,
+    shapiro, spearmanr, mannwhitneyu, wilcoxon
 )
-from scipy.optimize import curve_fit
-from statsmodels.stats.multicomp import pairwise_tukeyhsd
-import scikit_posthocs as sp
 import traceback
+import hashlib
+from collections import OrderedDict
+
+from .grouping import GroupIndex, UNIQUE_SEPARATOR
+from .pairwise import pairwise_ttest, pairwise_mannwhitney, adjust_pvalues
+from .facet_stats import run_facets, ttest_facet, anova_facet, kruskal_facet, shutdown_executor
+from .dose_response import fit_4pl_batch, format_fit_diagnostics
+from ..profiling import span, profiled
 
 # --- Dialogs ---
 from ..dialogs.anova_dialog import AnovaDialog
@@ -22,26 +28,128 @@ from ..dialogs.wilcoxon_dialog import WilcoxonDialog
 from ..dialogs.correlation_dialog import CorrelationDialog
 from ..dialogs.regression_dialog import RegressionDialog
 from ..dialogs.contingency_dialog import ContingencyDialog
+from ..dialogs.all_pairs_widget import build_group_choices, CORRECTION_METHODS
+
+# 列の版数ごとに保持するGroupIndexの数
+GROUP_INDEX_CACHE_ENTRIES = 4
+
+# 検定結果のキャッシュに保持する件数（古いものから破棄する）
+STATS_RESULT_CACHE_ENTRIES = 32
+
+# 列の内容のフィンガープリントを保持する件数
+FINGERPRINT_CACHE_ENTRIES = 16
+
 
 class StatisticalHandler:
-    _UNIQUE_SEPARATOR = '_#%%%_'
+    _UNIQUE_SEPARATOR = UNIQUE_SEPARATOR
 
 
     def __init__(self, main_window):
         # main_windowへの参照を保持し、ウィンドウの各要素にアクセスできるようにする
         self.main = main_window
+        # (列の版数, X軸, サブグループ, ファセット) -> GroupIndex
+        self._group_indices = OrderedDict()
+        # (検定名, データのフィンガープリント, 列, グループの選択, パラメータ) -> ファセットごとの検定結果
+        self._result_cache = OrderedDict()
+        # (列, 列の版数) -> 列の内容のフィンガープリント
+        self._fingerprints = OrderedDict()
         
-    def _get_interaction_group_col(self, df, x_col, hue_col):
+    def _group_index(self, x_col, hue_col=None, facet_col=None):
         """
-        【生成】ヘルパー：X軸とサブグループ（hue）から検定用のグループ列を生成する。
+        現在のデータに対するGroupIndexを返す。
+        使用する列の版数と列の組み合わせが同じなら、作成済みのものを再利用する。
         """
-        if hue_col and hue_col in df.columns:
-            interaction_col_name = f"{x_col}_{hue_col}_interaction"
-            effective_groups = df[x_col].astype(str) + self._UNIQUE_SEPARATOR + df[hue_col].astype(str)
-            return effective_groups, interaction_col_name
+        model = self.main.model
+        versions = tuple(model.column_version(col) for col in (x_col, hue_col, facet_col) if col)
+        key = (versions, x_col, hue_col, facet_col)
+        index = self._group_indices.get(key)
+        if index is None:
+            # ビューを実体化しないよう、グループ分けの列と値の列はそれぞれ必要な分だけ取り出す
+            group_columns = [col for col in dict.fromkeys((x_col, hue_col, facet_col)) if col and col in model.columns()]
+            index = GroupIndex(
+                model.column_data(group_columns), x_col, hue_col, facet_col,
+                column_version=model.column_version, get_column=lambda col: model.column_data([col])[col]
+            )
+            self._group_indices[key] = index
+            while len(self._group_indices) > GROUP_INDEX_CACHE_ENTRIES:
+                self._group_indices.popitem(last=False)
         else:
-            return df[x_col].astype(str), x_col
+            self._group_indices.move_to_end(key)
+        return index
 
+    def _data_fingerprint(self, columns):
+        """
+        指定した列の内容のフィンガープリントを返す。
+        列の版数が変わらない間は計算済みの値を使い、版数が変わった場合（プロジェクトの再読み込みを含む）のみ
+        内容をハッシュし直す。内容が同じなら、別のモデルでも同じ値になる。
+        """
+        model = self.main.model
+        columns = tuple(col for col in columns if col)
+        key = (columns, tuple(model.column_version(col) for col in columns))
+        fingerprint = self._fingerprints.get(key)
+        if fingerprint is None:
+            data = model.column_data(columns)
+            row_hashes = pd.util.hash_pandas_object(data, index=False)
+            digest = hashlib.blake2b(row_hashes.to_numpy().tobytes(), digest_size=16)
+            digest.update(repr([str(dtype) for dtype in data.dtypes]).encode())
+            fingerprint = digest.hexdigest()
+            self._fingerprints[key] = fingerprint
+            while len(self._fingerprints) > FINGERPRINT_CACHE_ENTRIES:
+                self._fingerprints.popitem(last=False)
+        else:
+            self._fingerprints.move_to_end(key)
+        return fingerprint
+
+    def clear_result_cache(self):
+        """検定結果のキャッシュを破棄する"""
+        self._result_cache.clear()
+
+    def shutdown(self):
+        """ファセットごとの検定に使うプロセスプールを終了させる。ウィンドウを閉じる際に呼び出す。"""
+        shutdown_executor()
+
+    def _run_facets(self, func, label, groups, value_col, selected, params=None):
+        """
+        ファセットごとの検定をrun_facetsで実行し、ファセットが複数ある場合は進捗を結果パネルに表示する。
+        同じ内容のデータ・検定・グループの選択に対する結果はキャッシュから返す。
+        """
+        columns = (value_col, groups.x_col, groups.hue_col, groups.facet_col)
+        key = (
+            func.__name__, self._data_fingerprint(columns), columns,
+            tuple(selected), tuple(sorted((params or {}).items()))
+        )
+        cached = self._result_cache.get(key)
+        if cached is not None:
+            self._result_cache.move_to_end(key)
+            return cached
+        
+        progress = None
+        if len(groups.facet_values) > 1:
+            def progress(done, total):
+                self.main.results_widget.show_progress(label, done, total)
+                QApplication.processEvents(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents)
+        try:
+            with span("run_facets", "stats", test=label):
+                results = run_facets(func, groups, value_col, selected, params, progress)
+        finally:
+            self.main.results_widget.hide_progress()
+        
+        self._result_cache[key] = results
+        while len(self._result_cache) > STATS_RESULT_CACHE_ENTRIES:
+            self._result_cache.popitem(last=False)
+        return results
+
+    def _add_posthoc_annotations(self, result, value_col, group_col, hue_col, facet_col, facet_value):
+        """事後検定で有意となったペアのアノテーションを追加する"""
+        for simple_pair, p_adj in result['posthoc_pairs']:
+            formatted_pair = self._format_pair_for_annotation(simple_pair, hue_col)
+            annotation = {
+                "value_col": value_col, "group_col": group_col, "hue_col": hue_col,
+                "facet_col": facet_col, "facet_value": facet_value,
+                "box_pair": formatted_pair, "p_value": p_adj
+            }
+            if annotation not in self.main.statistical_annotations:
+                self.main.statistical_annotations.append(annotation)
 
     def _format_pair_for_annotation(self, pair, hue_col):
         """
@@ -69,7 +177,6 @@ class StatisticalHandler:
             QMessageBox.warning(self.main, "Data Not Found", "Please import data before performing an analysis.")
             return
         
-        df = self.main.model._data.copy()
         data_settings = self.main.data_widget.get_current_settings()
         value_col = data_settings.get('y_col')
         group_col = data_settings.get('x_col')
@@ -86,23 +193,23 @@ class StatisticalHandler:
             QMessageBox.warning(self.main, "Warning", "Please select Y-Axis and X-Axis in the 'Data' tab first.")
             return
         
-        
-        df[group_col] = df[group_col].astype(str)
-        if hue_col and hue_col in df.columns:
-            df[hue_col] = df[hue_col].astype(str)
-        
-        x_values = [str(v) for v in df[group_col].dropna().unique()]
-        hue_values = [str(v) for v in df[hue_col].dropna().unique()] if hue_col and hue_col in df.columns else []
+        groups = self._group_index(group_col, hue_col, facet_col)
+        hue_col = groups.hue_col
         
         dialog = TTestDialog(
-            x_values=x_values, hue_values=hue_values,
-            x_name=group_col, hue_name=hue_col, parent=self.main
+            x_values=groups.x_labels, hue_values=groups.hue_labels,
+            x_name=group_col, hue_name=hue_col, parent=self.main,
+            group_choices=build_group_choices(groups.present_groups(), group_col, hue_col, self._UNIQUE_SEPARATOR)
         )
         
         if dialog.exec():
             settings = dialog.get_settings()
             if not settings: return
             
+            if settings.get('all_pairs'):
+                self._perform_all_pairs('t-test', groups, settings, value_col, group_col, facet_col)
+                return
+            
             g1_cond = settings['group1']
             g2_cond = settings['group2']
             if g1_cond == g2_cond:
@@ -117,42 +224,32 @@ class StatisticalHandler:
                     g1_name = g1_cond['x']
                     g2_name = g2_cond['x']
                 
-                if facet_col and facet_col in df.columns:
-                    facet_categories = df[facet_col].dropna().unique()
-                    
-                    for category in facet_categories:
-                        subset_df = df[df[facet_col] == category].reset_index(drop=True)
-                        effective_groups, _ = self._get_interaction_group_col(subset_df, group_col, hue_col)
-                        
-                        group1_values = subset_df.loc[effective_groups == g1_name, value_col].dropna()
-                        group2_values = subset_df.loc[effective_groups == g2_name, value_col].dropna()
-                        
-                        if group1_values.empty or group2_values.empty:
+                if groups.facet_col:
+                    facet_results = self._run_facets(ttest_facet, "t-test", groups, value_col, [g1_name, g2_name])
+                    for _, category, result in facet_results:
+                        if result is None:
                             continue
                         
-                        _, p_value = ttest_ind(group1_values, group2_values, nan_policy='omit')
-                        
                         simple_pair = (g1_name, g2_name)
                         formatted_pair = self._format_pair_for_annotation(simple_pair, hue_col)
                         
                         annotation = {
                             "value_col": value_col, "group_col": group_col, "hue_col": hue_col,
                             "facet_col": facet_col, "facet_value": category,
-                            "box_pair": formatted_pair, "p_value": p_value
+                            "box_pair": formatted_pair, "p_value": result['p_value']
                         }
                         if annotation not in self.main.statistical_annotations:
                             self.main.statistical_annotations.append(annotation)
                 
                 else: # ファセットなし
-                    effective_groups, _ = self._get_interaction_group_col(df, group_col, hue_col)
-                    group1_values = df.loc[effective_groups == g1_name, value_col].dropna()
-                    group2_values = df.loc[effective_groups == g2_name, value_col].dropna()
+                    group1_values = groups.values(value_col, g1_name)
+                    group2_values = groups.values(value_col, g2_name)
                     
-                    if group1_values.empty or group2_values.empty:
+                    if len(group1_values) == 0 or len(group2_values) == 0:
                         QMessageBox.warning(self.main, "Warning", "One or both selected groups have no data.")
                         return
                     
-                    t_stat, p_value = ttest_ind(group1_values, group2_values, nan_policy='omit')
+                    t_stat, p_value = ttest_ind(group1_values, group2_values)
                     
                     simple_pair = (g1_name, g2_name)
                     formatted_pair = self._format_pair_for_annotation(simple_pair, hue_col)
@@ -196,7 +293,6 @@ class StatisticalHandler:
             QMessageBox.warning(self.main, "Data Not Found", "Please import data before performing an analysis.")
             return
         
-        df = self.main.model._data.copy()
         data_settings = self.main.data_widget.get_current_settings()
         value_col = data_settings.get('y_col')
         group_col = data_settings.get('x_col')
@@ -213,22 +309,23 @@ class StatisticalHandler:
             QMessageBox.warning(self.main, "Warning", "Please select Y-Axis and X-Axis in the 'Data' tab first.")
             return
         
-        df[group_col] = df[group_col].astype(str)
-        if hue_col and hue_col in df.columns:
-            df[hue_col] = df[hue_col].astype(str)
-            
-        x_values = [str(v) for v in df[group_col].dropna().unique()]
-        hue_values = [str(v) for v in df[hue_col].dropna().unique()] if hue_col and hue_col in df.columns else []
+        groups = self._group_index(group_col, hue_col, facet_col)
+        hue_col = groups.hue_col
         
         dialog = MannWhitneyDialog(
-            x_values=x_values, hue_values=hue_values,
-            x_name=group_col, hue_name=hue_col, parent=self.main
+            x_values=groups.x_labels, hue_values=groups.hue_labels,
+            x_name=group_col, hue_name=hue_col, parent=self.main,
+            group_choices=build_group_choices(groups.present_groups(), group_col, hue_col, self._UNIQUE_SEPARATOR)
         )
         
         if dialog.exec():
             settings = dialog.get_settings()
             if not settings: return
             
+            if settings.get('all_pairs'):
+                self._perform_all_pairs('mannwhitney', groups, settings, value_col, group_col, facet_col)
+                return
+            
             g1_cond = settings['group1']
             g2_cond = settings['group2']
             if g1_cond == g2_cond:
@@ -242,13 +339,10 @@ class StatisticalHandler:
                     g1_name = g1_cond['x']
                     g2_name = g2_cond['x']
                     
-                if facet_col and facet_col in df.columns:
-                    for category in df[facet_col].dropna().unique():
-                        subset_df = df[df[facet_col] == category].reset_index(drop=True)
-                        effective_groups, _ = self._get_interaction_group_col(subset_df, group_col, hue_col)
-                        
-                        group1_values = subset_df.loc[effective_groups == g1_name, value_col].dropna()
-                        group2_values = subset_df.loc[effective_groups == g2_name, value_col].dropna()
+                if groups.facet_col:
+                    for facet_pos, category in groups.facets():
+                        group1_values = groups.values(value_col, g1_name, facet_pos)
+                        group2_values = groups.values(value_col, g2_name, facet_pos)
                     
                         if len(group1_values) < 1 or len(group2_values) < 1: continue
                         
@@ -265,11 +359,10 @@ class StatisticalHandler:
                         if annotation not in self.main.statistical_annotations:
                             self.main.statistical_annotations.append(annotation)
                 else:
-                    effective_groups, _ = self._get_interaction_group_col(df, group_col, hue_col)
-                    group1_values = df.loc[effective_groups == g1_name, value_col].dropna()
-                    group2_values = df.loc[effective_groups == g2_name, value_col].dropna()
+                    group1_values = groups.values(value_col, g1_name)
+                    group2_values = groups.values(value_col, g2_name)
                     
-                    if group1_values.empty or group2_values.empty:
+                    if len(group1_values) == 0 or len(group2_values) == 0:
                         QMessageBox.warning(self.main, "Warning", "One or both selected groups have no data.")
                         return
                     
@@ -312,6 +405,84 @@ class StatisticalHandler:
                 traceback.print_exc()
 
 
+    def _perform_all_pairs(self, test, groups, settings, value_col, group_col, facet_col):
+        """
+        選択されたグループのすべてのペアについて、t検定またはマン・ホイットニーのU検定をまとめて実行する。
+        p値はファセットごとに多重比較補正し、有意なペアのアノテーションを一度に追加してから、グラフを一度だけ更新する。
+        """
+        hue_col = groups.hue_col
+        method = settings.get('correction')
+        method_label = next(label for label, value in CORRECTION_METHODS if value == method)
+        if test == 't-test':
+            title, stat_label, pairwise_test = "Independent t-test (all pairs)", "t", pairwise_ttest
+        else:
+            title, stat_label, pairwise_test = "Mann-Whitney U test (all pairs)", "U", pairwise_mannwhitney
+        
+        try:
+            results_summary = []
+            n_significant = 0
+            
+            for facet_pos, category in groups.facets():
+                samples = groups.group_values(value_col, facet_pos, settings['groups'])
+                samples = {name: values for name, values in samples.items() if len(values) > 0}
+                if len(samples) < 2:
+                    continue
+                
+                pairs, stats, p_values = pairwise_test(samples)
+                p_adjusted = adjust_pvalues(p_values, method)
+                
+                table = pd.DataFrame({
+                    "group1": [self._display_group_name(g1) for g1, _ in pairs],
+                    "group2": [self._display_group_name(g2) for _, g2 in pairs],
+                    "n1": [len(samples[g1]) for g1, _ in pairs],
+                    "n2": [len(samples[g2]) for _, g2 in pairs],
+                    stat_label: stats,
+                    "p-value": p_values,
+                    "p-adj": p_adjusted,
+                    "reject": p_adjusted < 0.05,
+                })
+                if groups.facet_col:
+                    results_summary.append(f"--- Facet: {facet_col} = {category} ---")
+                results_summary.append(table.to_string(index=False, float_format=lambda v: f"{v:.4f}") + "\n")
+                
+                for (g1_name, g2_name), p_adj in zip(pairs, p_adjusted):
+                    if not p_adj < 0.05:
+                        continue
+                    n_significant += 1
+                    annotation = {
+                        "value_col": value_col, "group_col": group_col, "hue_col": hue_col,
+                        "facet_col": facet_col if groups.facet_col else None,
+                        "facet_value": category,
+                        "box_pair": self._format_pair_for_annotation((g1_name, g2_name), hue_col),
+                        "p_value": p_adj
+                    }
+                    if annotation not in self.main.statistical_annotations:
+                        self.main.statistical_annotations.append(annotation)
+            
+            if not results_summary:
+                QMessageBox.warning(self.main, "Warning", "Not enough data for the selected groups.")
+                return
+            
+            header = (
+                f"{title} results:\n"
+                f"============================================\n\n"
+                f"Comparing '{value_col}' across {len(settings['groups'])} groups\n"
+                f"Multiple-testing correction: {method_label}\n"
+                f"Significant pairs (p-adj < 0.05): {n_significant}\n\n"
+            )
+            self.main.results_widget.set_results_text(header + "\n".join(results_summary))
+            self.main.graph_manager.update_graph()
+            
+        except Exception as e:
+            QMessageBox.critical(self.main, "Error", f"Failed to perform {title}: {e}")
+            traceback.print_exc()
+
+
+    def _display_group_name(self, name):
+        """内部のグループ名を結果表示用の文字列にする（'A_#%%%_c' -> 'A, c'）"""
+        return name.replace(self._UNIQUE_SEPARATOR, ", ")
+
+
     def perform_one_way_anova(self):
         """
         表示されているグラフのデータに基づいて一元配置分散分析を実行する。
@@ -322,7 +493,6 @@ class StatisticalHandler:
                 QMessageBox.warning(self.main, "Warning", "Please load data first.")
                 return
             
-            df = self.main.model._data.copy()
             data_settings = self.main.data_widget.get_current_settings()
             value_col = data_settings.get('y_col')
             group_col = data_settings.get('x_col')
@@ -335,19 +505,15 @@ class StatisticalHandler:
             if not hue_col or group_col == hue_col:
                 hue_col = None
                 
-            df[group_col] = df[group_col].astype(str)
-            if hue_col and hue_col in df.columns:
-                df[hue_col] = df[hue_col].astype(str)
-                
             facet_col = data_settings.get('facet_col')
             
-            x_values = [str(v) for v in df[group_col].dropna().unique()]
-            hue_values = [str(v) for v in df[hue_col].dropna().unique()] if hue_col and hue_col in df.columns else []
+            groups = self._group_index(group_col, hue_col, facet_col)
+            hue_col = groups.hue_col
             
-            if not x_values:
+            if not groups.x_labels:
                 QMessageBox.warning(self.main, "Warning", "The selected X-Axis column has no data.")
                 return
-            dialog = AnovaDialog(x_values, hue_values, group_col, hue_col, self.main)
+            dialog = AnovaDialog(groups.x_labels, groups.hue_labels, group_col, hue_col, self.main)
             
             if dialog.exec():
                 selected_groups = dialog.get_settings()
@@ -356,82 +522,32 @@ class StatisticalHandler:
                     QMessageBox.warning(self.main, "Warning", "Please build a list of at least 2 groups to compare.")
                     return
                 
-                effective_groups, _ = self._get_interaction_group_col(df, group_col, hue_col)
-                
                 results_summary = []
+                facet_results = self._run_facets(anova_facet, "One-way ANOVA", groups, value_col, selected_groups)
                 
-                if facet_col and facet_col in df.columns:
-                    facet_categories = df[facet_col].dropna().unique()
-                    
-                    for category in facet_categories:
-                        subset_df = df[df[facet_col] == category].copy()
-                        current_facet_groups, _ = self._get_interaction_group_col(subset_df, group_col, hue_col)
-                        
-                        samples = [subset_df.loc[current_facet_groups == g, value_col].dropna() for g in selected_groups]
-                        samples = [s for s in samples if not s.empty]
-                        
-                        if len(samples) < 2: continue
-                        
-                        _, p_value = f_oneway(*samples)
+                if groups.facet_col:
+                    for _, category, result in facet_results:
+                        if result is None: continue
                         
                         results_summary.append(f"--- Facet: {facet_col} = {category} ---\n" \
-                                            f"F-statistic: _, p-value: {p_value:.4f}\n")
+                                            f"F-statistic: _, p-value: {result['p_value']:.4f}\n")
                         
-                        if p_value < 0.05 and len(samples) >= 2:
-                            selected_data_indices = current_facet_groups.isin(selected_groups)
-                            all_data = subset_df.loc[selected_data_indices, value_col].dropna()
-                            group_labels = current_facet_groups[selected_data_indices].dropna()
-                            
-                            tukey_result = pairwise_tukeyhsd(endog=all_data, groups=group_labels, alpha=0.05)
-                            df_tukey = pd.DataFrame(data=tukey_result._results_table.data[1:], columns=tukey_result._results_table.data[0])
-                            
-                            results_summary.append(str(tukey_result) + "\n")
-                            
-                            for _, row in df_tukey.iterrows():
-                                if row['p-adj'] < 0.05:
-                                    simple_pair = (str(row['group1']), str(row['group2']))
-                                    formatted_pair = self._format_pair_for_annotation(simple_pair, hue_col)
-                                    
-                                    annotation = {
-                                        "value_col": value_col, "group_col": group_col, "hue_col": hue_col,
-                                        "facet_col": facet_col, "facet_value": category,
-                                        "box_pair": formatted_pair, "p_value": row['p-adj']
-                                    }
-                                    if annotation not in self.main.statistical_annotations:
-                                        self.main.statistical_annotations.append(annotation)
+                        if result['posthoc_text'] is not None:
+                            results_summary.append(result['posthoc_text'] + "\n")
+                            self._add_posthoc_annotations(result, value_col, group_col, hue_col, facet_col, category)
                 
                 else: # ファセットなし
-                    samples = [df.loc[effective_groups == g, value_col].dropna() for g in selected_groups]
-                    samples = [s for s in samples if not s.empty]
+                    result = facet_results[0][2]
                     
-                    if len(samples) < 2:
+                    if result is None:
                         QMessageBox.warning(self.main, "Warning", "Not enough data for the selected groups.")
                         return
                     
-                    f_stat, p_value = f_oneway(*samples)
-                    results_summary.append(f"F-statistic: {f_stat:.4f}\np-value: {p_value:.4f}\n")
+                    results_summary.append(f"F-statistic: {result['statistic']:.4f}\np-value: {result['p_value']:.4f}\n")
                     
-                    if p_value < 0.05 and len(samples) >= 2:
-                        selected_data_indices = effective_groups.isin(selected_groups)
-                        all_data = df.loc[selected_data_indices, value_col].dropna()
-                        group_labels = effective_groups[selected_data_indices].dropna()
-                        
-                        tukey_result = pairwise_tukeyhsd(endog=all_data, groups=group_labels, alpha=0.05)
-                        df_tukey = pd.DataFrame(data=tukey_result._results_table.data[1:], columns=tukey_result._results_table.data[0])
-                        results_summary.append("\nPost-hoc test (Tukey's HSD):\n" + str(tukey_result))
-                        
-                        for _, row in df_tukey.iterrows():
-                            if row['p-adj'] < 0.05:
-                                simple_pair = (str(row['group1']), str(row['group2']))
-                                formatted_pair = self._format_pair_for_annotation(simple_pair, hue_col)
-                                
-                                annotation = {
-                                    "value_col": value_col, "group_col": group_col, "hue_col": hue_col,
-                                    "facet_col": None, "facet_value": None,
-                                    "box_pair": formatted_pair, "p_value": row['p-adj']
-                                }
-                                if annotation not in self.main.statistical_annotations:
-                                    self.main.statistical_annotations.append(annotation)
+                    if result['posthoc_text'] is not None:
+                        results_summary.append("\nPost-hoc test (Tukey's HSD):\n" + result['posthoc_text'])
+                        self._add_posthoc_annotations(result, value_col, group_col, hue_col, None, None)
                 
                 if results_summary:
                     final_summary = "One-way ANOVA Results\n======================\n\n" + "\n".join(results_summary)
@@ -451,7 +567,6 @@ class StatisticalHandler:
             if not hasattr(self.main, 'model'):
                 return
             
-            df = self.main.model._data.copy()
             data_settings = self.main.data_widget.get_current_settings()
             value_col = data_settings.get('y_col')
             group_col = data_settings.get('x_col')
@@ -464,15 +579,11 @@ class StatisticalHandler:
             if not hue_col or group_col == hue_col:
                 hue_col = None
                 
-            df[group_col] = df[group_col].astype(str)
-            if hue_col and hue_col in df.columns:
-                df[hue_col] = df[hue_col].astype(str)
-                
             facet_col = data_settings.get('facet_col')
-            x_values = [str(v) for v in df[group_col].dropna().unique()]
-            hue_values = [str(v) for v in df[hue_col].dropna().unique()] if hue_col else []
+            groups = self._group_index(group_col, hue_col, facet_col)
+            hue_col = groups.hue_col
             
-            dialog = KruskalDialog(x_values, hue_values, group_col, hue_col, self.main)
+            dialog = KruskalDialog(groups.x_labels, groups.hue_labels, group_col, hue_col, self.main)
             
             if dialog.exec():
                 selected_groups = dialog.get_settings()
@@ -481,66 +592,30 @@ class StatisticalHandler:
                     QMessageBox.warning(self.main, "Warning", "Please select at least 2 groups.")
                     return
                 
-                effective_groups, interaction_col_name = self._get_interaction_group_col(df, group_col, hue_col)
-                df[interaction_col_name] = effective_groups
-                
                 results_summary = []
+                facet_results = self._run_facets(kruskal_facet, "Kruskal-Wallis", groups, value_col, selected_groups)
                 
-                if facet_col and facet_col in df.columns:
-                    for category in df[facet_col].dropna().unique():
-                        subset_df = df[df[facet_col] == category].copy()
-                        
-                        samples = [subset_df.loc[subset_df[interaction_col_name] == g, value_col].dropna() for g in selected_groups]
-                        samples = [s for s in samples if not s.empty]
+                if groups.facet_col:
+                    for _, category, result in facet_results:
+                        if result is None: continue
                         
-                        if len(samples) < 2: continue
-                        
-                        h_stat, p_value = kruskal(*samples)
                         results_summary.append(f"--- Facet: {facet_col} = {category} ---")
-                        results_summary.append(f"Kruskal-Wallis H-statistic: {h_stat:.4f}, p-value: {p_value:.4f}")
+                        results_summary.append(f"Kruskal-Wallis H-statistic: {result['statistic']:.4f}, p-value: {result['p_value']:.4f}")
                         
-                        if p_value < 0.05 and len(samples) > 2:
-                            posthoc_df = sp.posthoc_dunn(subset_df, val_col=value_col, group_col=interaction_col_name)
-                            results_summary.append("\nDunn's Post-hoc Test (p-values):\n" + posthoc_df.to_string())
-                            
-                            for group1 in posthoc_df.columns:
-                                for group2, p_adj in posthoc_df.loc[group1].items():
-                                    if group1 != group2 and pd.notna(p_adj) and p_adj < 0.05:
-                                        simple_pair = tuple(sorted((group1, group2)))
-                                        formatted_pair = self._format_pair_for_annotation(simple_pair, hue_col)
-                                        annotation = {
-                                            "value_col": value_col, "group_col": group_col, "hue_col": hue_col,
-                                            "facet_col": facet_col, "facet_value": category,
-                                            "box_pair": formatted_pair, "p_value": p_adj
-                                        }
-                                        if annotation not in self.main.statistical_annotations:
-                                            self.main.statistical_annotations.append(annotation)
+                        if result['posthoc_text'] is not None:
+                            results_summary.append("\nDunn's Post-hoc Test (p-values):\n" + result['posthoc_text'])
+                            self._add_posthoc_annotations(result, value_col, group_col, hue_col, facet_col, category)
                         results_summary.append("-" * 20)
                 else:
-                    samples = [df.loc[df[interaction_col_name] == g, value_col].dropna() for g in selected_groups]
-                    samples = [s for s in samples if not s.empty]
+                    result = facet_results[0][2]
                     
-                    if len(samples) < 2: return
+                    if result is None: return
                     
-                    h_stat, p_value = kruskal(*samples)
-                    results_summary.append(f"Kruskal-Wallis H-statistic: {h_stat:.4f}, p-value: {p_value:.4f}")
+                    results_summary.append(f"Kruskal-Wallis H-statistic: {result['statistic']:.4f}, p-value: {result['p_value']:.4f}")
                     
-                    if p_value < 0.05 and len(samples) > 2:
-                        posthoc_df = sp.posthoc_dunn(df, val_col=value_col, group_col=interaction_col_name)
-                        results_summary.append("\nDunn's Post-hoc Test (p-values):\n" + posthoc_df.to_string())
-                        
-                        for group1 in posthoc_df.columns:
-                            for group2, p_adj in posthoc_df.loc[group1].items():
-                                if group1 != group2 and pd.notna(p_adj) and p_adj < 0.05:
-                                    simple_pair = tuple(sorted((str(group1), str(group2))))
-                                    formatted_pair = self._format_pair_for_annotation(simple_pair, hue_col)
-                                    annotation = {
-                                        "value_col": value_col, "group_col": group_col, "hue_col": hue_col,
-                                        "facet_col": None, "facet_value": None,
-                                        "box_pair": formatted_pair, "p_value": p_adj
-                                    }
-                                    if annotation not in self.main.statistical_annotations:
-                                        self.main.statistical_annotations.append(annotation)
+                    if result['posthoc_text'] is not None:
+                        results_summary.append("\nDunn's Post-hoc Test (p-values):\n" + result['posthoc_text'])
+                        self._add_posthoc_annotations(result, value_col, group_col, hue_col, None, None)
                                         
                 if results_summary:
                     final_summary = "Kruskal-Wallis Test Results\n======================\n\n" + "\n".join(results_summary)
@@ -559,8 +634,7 @@ class StatisticalHandler:
         if not hasattr(self.main, 'model') or self.main.model is None:
             QMessageBox.warning(self.main, "Data Not Found", "Please import data before performing an analysis.")
             return
-        df = self.main.model._data
-        dialog = PairedTTestDialog(df.columns, self.main)
+        dialog = PairedTTestDialog(self.main.model.columns(), self.main)
         
         if dialog.exec():
             settings = dialog.get_settings()
@@ -569,6 +643,7 @@ class StatisticalHandler:
                 QMessageBox.warning(self.main, "Warning", "Please select two different columns.")
                 return
             try:
+                df = self.main.model.column_data([col1, col2])
                 data1 = df[col1].dropna()
                 data2 = df[col2].dropna()
                 min_len = min(len(data1), len(data2))
@@ -612,8 +687,7 @@ class StatisticalHandler:
         if not hasattr(self.main, 'model') or self.main.model is None:
             QMessageBox.warning(self.main, "Data Not Found", "Please import data before performing an analysis.")
             return
-        df = self.main.model._data
-        dialog = WilcoxonDialog(df.columns, self.main)
+        dialog = WilcoxonDialog(self.main.model.columns(), self.main)
         
         if dialog.exec():
             settings = dialog.get_settings()
@@ -622,6 +696,7 @@ class StatisticalHandler:
                 QMessageBox.warning(self.main, "Warning", "Please select two different columns.")
                 return
             try:
+                df = self.main.model.column_data([col1, col2])
                 data1 = df[col1].dropna()
                 data2 = df[col2].dropna()
                 min_len = min(len(data1), len(data2))
@@ -669,13 +744,13 @@ class StatisticalHandler:
         if not hasattr(self.main, 'model') or self.main.model is None:
             QMessageBox.warning(self.main, "Data Not Found", "Please import data before performing an analysis.")
             return
-        df = self.main.model._data
-        dialog = ContingencyDialog(df.columns, self.main)
+        dialog = ContingencyDialog(self.main.model.columns(), self.main)
         if dialog.exec():
             settings = dialog.get_settings()
             rows_col, cols_col = settings['rows_col'], settings['cols_col']
             if not rows_col or not cols_col or rows_col == cols_col: return
             try:
+                df = self.main.model.column_data([rows_col, cols_col])
                 contingency_table = pd.crosstab(df[rows_col], df[cols_col])
                 chi2, p, dof, expected = chi2_contingency(contingency_table)
                 expected_table = pd.DataFrame(expected, index=contingency_table.index, columns=contingency_table.columns)
@@ -702,8 +777,7 @@ class StatisticalHandler:
             QMessageBox.warning(self.main, "Data Not Found", "Please import data before performing an analysis.")
             return
         
-        df = self.main.model._data
-        dialog = CorrelationDialog(df.columns, self.main)
+        dialog = CorrelationDialog(self.main.model.columns(), self.main)
         
         if dialog.exec():
             settings = dialog.get_settings()
@@ -714,6 +788,7 @@ class StatisticalHandler:
                 return
             
             try:
+                df = self.main.model.column_data([col1, col2])
                 data1 = df[col1].dropna()
                 data2 = df[col2].dropna()
                 
@@ -757,7 +832,6 @@ class StatisticalHandler:
             QMessageBox.warning(self.main, "Data Not Found", "Please import data before performing an analysis.")
             return
         
-        df = self.main.model._data.copy()
         data_settings = self.main.data_widget.get_current_settings()
         value_col = data_settings.get('y_col')
         group_col = data_settings.get('x_col')
@@ -772,8 +846,9 @@ class StatisticalHandler:
             hue_col = None
             
         try:
-            effective_groups, group_name = self._get_interaction_group_col(df, group_col, hue_col)
-            unique_groups = sorted(effective_groups.dropna().unique())
+            groups = self._group_index(group_col, hue_col)
+            group_name = f"{group_col}_{groups.hue_col}_interaction" if groups.hue_col else group_col
+            unique_groups = sorted(groups.present_groups())
             
             if not unique_groups:
                 QMessageBox.warning(self.main, "Warning", "No groups found to test.")
@@ -789,7 +864,7 @@ class StatisticalHandler:
             
             # 各グループに対してループ処理
             for group in unique_groups:
-                data = df[value_col][effective_groups == group].dropna()
+                data = groups.values(value_col, group)
                 
                 result_text += f"\nGroup: {group} (n={len(data)})\n"
                 
@@ -815,9 +890,55 @@ class StatisticalHandler:
 
 # --- 回帰分析 ---
 
-    def sigmoid_4pl(self, x, bottom, top, hill_slope, log_ec50):
-        """4パラメータロジスティック（4PL）モデルの関数。xとlog_ec50はlog10スケール。"""
-        return bottom + (top - bottom) / (1 + 10**((log_ec50 - x) * hill_slope))
+    @profiled("fit_4pl", "stats")
+    def _fit_4pl_groups(self, df, x_col, y_col, subgroup_col, groups_to_fit):
+        """
+        各サブグループに4PLモデルをまとめて当てはめ（dose_response.fit_4pl_batch）、
+        結果をself.main.fit_paramsに格納する。結果の表示用の文字列のリストを返す。
+        """
+        if groups_to_fit == [None]:
+            fit_df = df[[x_col, y_col]].dropna()
+            subsets = {None: fit_df}
+        else:
+            fit_df = df[[x_col, y_col, subgroup_col]].dropna()
+            subsets = dict(tuple(fit_df.groupby(subgroup_col, sort=False)))
+
+        datasets, fitted_groups, skipped = [], [], {}
+        for group in groups_to_fit:
+            subset = subsets.get(group, fit_df.iloc[:0])
+            x_data = subset[x_col].to_numpy(dtype=float)
+            if (x_data <= 0).any():
+                skipped[group] = "Skipped: X contains zero or negative values (log scale)."
+                continue
+            datasets.append((np.log10(x_data), subset[y_col].to_numpy(dtype=float)))
+            fitted_groups.append(group)
+
+        def progress(done, total):
+            self.main.results_widget.show_progress("4PL fit", done, total)
+            QApplication.processEvents(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents)
+
+        try:
+            fit_results = dict(zip(fitted_groups, fit_4pl_batch(datasets, progress=progress)))
+        finally:
+            self.main.results_widget.hide_progress()
+
+        results_text_parts = []
+        for group in groups_to_fit:
+            if group is not None:
+                results_text_parts.append(f"\n--- Sub-group: {group} ---")
+            if group in skipped:
+                results_text_parts.append(skipped[group])
+                continue
+
+            result = fit_results[group]
+            if result["converged"]:
+                params, r_squared = result["params"], result["r_squared"]
+                fit = {"params": params, "r_squared": r_squared, "log_x_data": result["log_x_data"]}
+                if group is not None: self.main.fit_params[group] = fit
+                else: self.main.fit_params = fit
+                results_text_parts.append(f"Top: {params[1]:.4f}, Bottom: {params[0]:.4f}, Hill Slope: {params[2]:.4f}, EC50: {10**params[3]:.4f}\nR-squared: {r_squared:.4f}")
+            results_text_parts.append(format_fit_diagnostics(result))
+        return results_text_parts
 
 
     def perform_regression(self):
@@ -825,9 +946,8 @@ class StatisticalHandler:
         if not hasattr(self.main, 'model') or self.main.model is None:
             QMessageBox.warning(self.main, "Data Not Found", "Please import data before performing an analysis.")
             return
-        df = self.main.model._data
-        
-        dialog = RegressionDialog(df.columns, self.main)
+        columns = self.main.model.columns()
+        dialog = RegressionDialog(columns, self.main)
         
         if dialog.exec():
             settings = dialog.get_settings()
@@ -842,6 +962,9 @@ class StatisticalHandler:
 
             if subgroup_col == x_col: # X軸と同じなら分析上は無視
                 subgroup_col = None
+            df = self.main.model.column_data(
+                col for col in dict.fromkeys((x_col, y_col, subgroup_col)) if col and col in columns
+            )
 
             try:
                 # 毎回パラメータを初期化
@@ -854,19 +977,21 @@ class StatisticalHandler:
                 if subgroup_col and subgroup_col in df.columns:
                     groups_to_fit = sorted(df[subgroup_col].dropna().unique())
 
-                for group in groups_to_fit:
-                    subset_df = df
-                    if group is not None:
-                        subset_df = df[df[subgroup_col] == group]
-                        results_text_parts.append(f"\n--- Sub-group: {group} ---")
+                if model == '4pl':
+                    results_text_parts = self._fit_4pl_groups(df, x_col, y_col, subgroup_col, groups_to_fit)
+                else:
+                    for group in groups_to_fit:
+                        subset_df = df
+                        if group is not None:
+                            subset_df = df[df[subgroup_col] == group]
+                            results_text_parts.append(f"\n--- Sub-group: {group} ---")
 
-                    if model == 'linear':
                         x_data = subset_df[x_col].dropna(); y_data = subset_df[y_col].dropna()
                         common_indices = x_data.index.intersection(y_data.index)
                         x_data = x_data.loc[common_indices]; y_data = y_data.loc[common_indices]
-                        
+                    
                         if len(x_data) < 2: continue
-                        
+                    
                         slope, intercept, r_value, p_value, _ = linregress(x_data, y_data)
                         result = {
                             "x_line": np.array([x_data.min(), x_data.max()]),
@@ -875,27 +1000,9 @@ class StatisticalHandler:
                         }
                         if group is not None: self.main.regression_line_params[group] = result
                         else: self.main.regression_line_params = result
-                        
+                    
                         results_text_parts.append(f"Y = {slope:.4f} * X + {intercept:.4f}\nR-squared: {r_value**2:.4f}, p-value: {p_value:.4f}")
 
-                    elif model == '4pl':
-                        fit_df = subset_df[[x_col, y_col]].dropna().copy()
-                        if (fit_df[x_col] <= 0).any(): continue
-                        
-                        fit_df['log_x'] = np.log10(fit_df[x_col])
-                        x_data, y_data = fit_df['log_x'], fit_df[y_col]
-                        
-                        p0 = [y_data.min(), y_data.max(), 1.0, np.median(x_data)]
-                        params, _ = curve_fit(self.sigmoid_4pl, x_data, y_data, p0=p0, maxfev=10000)
-                        y_pred = self.sigmoid_4pl(x_data, *params)
-                        r_squared = 1 - (np.sum((y_data - y_pred)**2) / np.sum((y_data - np.mean(y_data))**2))
-                        
-                        result = {"params": params, "r_squared": r_squared, "log_x_data": x_data}
-                        if group is not None: self.main.fit_params[group] = result
-                        else: self.main.fit_params = result
-                        
-                        results_text_parts.append(f"Top: {params[1]:.4f}, Bottom: {params[0]:.4f}, Hill Slope: {params[2]:.4f}, EC50: {10**params[3]:.4f}\nR-squared: {r_squared:.4f}")
-
                 self.main.graph_manager.update_graph()
                 
                 header = "Linear Regression Results" if model == 'linear' else "Non-linear Regression (4PL) Results"
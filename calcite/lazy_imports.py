@@ -0,0 +1,95 @@
+# lazy_imports.py
+
+import importlib
+import sys
+import threading
+import time
+
+from .profiling import span
+
+# 起動後にバックグラウンドで読み込んでおくモジュール（初回の描画・統計処理の待ち時間を減らす）
+PREWARM_MODULES = (
+    "seaborn",
+    "statannotations.Annotator",
+    "scipy.stats",
+    "scipy.optimize",
+    "statsmodels.stats.multitest",
+    "calcite.handlers.statistical_handler",
+)
+
+# calciteコマンドの起動（ウィンドウが表示されるまで）にかける時間の目安（秒）
+STARTUP_BUDGET_SECONDS = 2.0
+
+# モジュール名 -> 読み込み後に一度だけ呼び出す関数のリスト
+_import_hooks = {}
+_hooks_lock = threading.Lock()
+
+
+class LazyModule:
+    """
+    属性に初めてアクセスしたときにモジュールを読み込む代理オブジェクト。
+    `sns = LazyModule("seaborn")` のように、モジュールレベルのimportの代わりに使う。
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = load_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        # _nameと_module以外の属性は、読み込んだモジュールから取得する
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def load_module(name):
+    """モジュールを読み込み、読み込まれたモジュールに登録されているフックを実行する"""
+    with span(f"import {name}", "import"):
+        module = importlib.import_module(name)
+    _run_import_hooks()
+    return module
+
+
+def register_import_hook(name, callback):
+    """
+    モジュールが読み込まれた後に一度だけcallback(module)を呼び出す。
+    すでに読み込まれている場合はすぐに呼び出す。他のモジュール経由で読み込まれた場合も、
+    次にload_moduleが呼ばれたときに実行される。
+    """
+    with _hooks_lock:
+        _import_hooks.setdefault(name, []).append(callback)
+    _run_import_hooks()
+
+
+def _run_import_hooks():
+    with _hooks_lock:
+        ready = [name for name in _import_hooks if name in sys.modules]
+        callbacks = [(name, _import_hooks.pop(name)) for name in ready]
+    for name, hooks in callbacks:
+        for callback in hooks:
+            callback(sys.modules[name])
+
+
+def prewarm(modules=PREWARM_MODULES):
+    """
+    バックグラウンドのスレッドでモジュールを読み込んでおく。
+    ウィンドウの表示後に呼び出し、初回の描画や統計処理でのimportの待ち時間をなくす。
+    """
+    def run():
+        start = time.perf_counter()
+        for name in modules:
+            try:
+                load_module(name)
+            except Exception as e:
+                print(f"DEBUG: Prewarm of {name} failed: {e}")
+        print(f"DEBUG: Prewarmed {len(modules)} modules in {time.perf_counter() - start:.2f} s")
+
+    thread = threading.Thread(target=run, name="calcite-prewarm", daemon=True)
+    thread.start()
+    return thread
@@ -2,7 +2,7 @@
 
 from PySide6.QtWidgets import (
     QMainWindow, QSplitter, QTableView, QMessageBox, QToolBar,
-    QMenu, QLineEdit, QApplication, QTabWidget, QScrollArea
+    QMenu, QLineEdit, QApplication, QTabWidget, QScrollArea, QDockWidget
 )
 from PySide6.QtGui import QAction, QActionGroup, QKeySequence
 from PySide6.QtCore import Qt, QEvent, QSettings
@@ -13,6 +13,8 @@ from .properties_widget import PropertiesWidget
 from .results_widget import ResultsWidget
 from .pandas_model import PandasModel
 from .data_widget import DataWidget
+from .profiling_widget import ProfilingWidget
+from . import profiling
 
 # --- Handlers ---
 from .handlers.action_handler import ActionHandler
@@ -25,7 +27,7 @@ class MainWindow(QMainWindow):
     アプリケーションのメインウィンドウ。
     UIの配置と、各ハンドラーへの処理の委譲を担当する。
     """
-    def __init__(self, data=None):
+    def __init__(self, data=None, model=None):
         super().__init__()
         self.setWindowTitle("Calcite")
         
@@ -37,6 +39,7 @@ class MainWindow(QMainWindow):
         self.fit_params = None
         self.statistical_annotations = []
         self.paired_annotations = []
+        self.profiling_dock = None
         
         self.action_handler = ActionHandler(self)
         self.graph_manager = GraphManager(self)
@@ -48,10 +51,16 @@ class MainWindow(QMainWindow):
         
         self.table_view.installEventFilter(self)
         
-        if data is not None:
+        if model is not None:
+            self.load_model(model)
+        elif data is not None:
             self.load_dataframe(data)
 
         self.restore_settings()
+        
+        # CALCITE_PROFILEで計測が有効になっている場合は、最初からパネルを表示する
+        if profiling.is_enabled():
+            self.profiling_action.setChecked(True)
 
     def restore_settings(self):
         """起動時にウィンドウのサイズと位置を復元する"""
@@ -69,6 +78,10 @@ class MainWindow(QMainWindow):
         settings = QSettings()
         # "geometry" というキーで現在のウィンドウ情報を保存
         settings.setValue("geometry", self.saveGeometry())
+        # 描画用スレッドを終了させる
+        self.graph_manager.shutdown()
+        # 統計処理用のプロセスプールを終了させる
+        self.action_handler.shutdown()
         super().closeEvent(event)
 
     def load_dataframe(self, df):
@@ -80,10 +93,7 @@ class MainWindow(QMainWindow):
             return
         
         try:
-            self.model = PandasModel(df)
-            self.table_view.setModel(self.model)
-            self.data_widget.set_columns(df.columns)
-            self.results_widget.clear_results()
+            self.load_model(PandasModel(df))
             
             # グラフ更新のためのシグナルを接続しないように変更
             # self.table_view.selectionModel().selectionChanged.connect(self.graph_manager.update_graph)
@@ -97,6 +107,16 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "Error", f"Error loading DataFrame: {e}")
 
 
+    def load_model(self, model):
+        """
+        作成済みのPandasModel（派生テーブルのビューなど）をアプリケーションに読み込む
+        """
+        self.model = model
+        self.table_view.setModel(self.model)
+        self.data_widget.set_columns(model.columns())
+        self.results_widget.clear_results()
+
+
     def _setup_ui(self):
         # メインの分割を水平（左右）にする
         main_splitter = QSplitter(Qt.Orientation.Horizontal)
@@ -233,55 +253,84 @@ class MainWindow(QMainWindow):
         
         analysis_menu.addSection("Compare Means / Medians")
         ttest_action = QAction("Independent t-test...", self)
-        ttest_action.triggered.connect(self.action_handler.statistical_handler.perform_t_test)
+        ttest_action.triggered.connect(self.action_handler.statistical_action("perform_t_test"))
         analysis_menu.addAction(ttest_action)
         
         paired_ttest_action = QAction("Paired t-test...", self)
-        paired_ttest_action.triggered.connect(self.action_handler.statistical_handler.perform_paired_t_test)
+        paired_ttest_action.triggered.connect(self.action_handler.statistical_action("perform_paired_t_test"))
         analysis_menu.addAction(paired_ttest_action)
         
         anova_action = QAction("One-way ANOVA...", self)
-        anova_action.triggered.connect(self.action_handler.statistical_handler.perform_one_way_anova)
+        anova_action.triggered.connect(self.action_handler.statistical_action("perform_one_way_anova"))
         analysis_menu.addAction(anova_action)
         
         analysis_menu.addSeparator()
         analysis_menu.addSection("Non-parametric Tests")
         mannwhitney_action = QAction("Mann-Whitney U test...", self)
-        mannwhitney_action.triggered.connect(self.action_handler.statistical_handler.perform_mannwhitney_test)
+        mannwhitney_action.triggered.connect(self.action_handler.statistical_action("perform_mannwhitney_test"))
         analysis_menu.addAction(mannwhitney_action)
         
         wilcoxon_action = QAction("Wilcoxon signed-rank test...", self)
-        wilcoxon_action.triggered.connect(self.action_handler.statistical_handler.perform_wilcoxon_test)
+        wilcoxon_action.triggered.connect(self.action_handler.statistical_action("perform_wilcoxon_test"))
         analysis_menu.addAction(wilcoxon_action)
         
         kruskal_action = QAction("Kruskal-Wallis test...", self)
-        kruskal_action.triggered.connect(self.action_handler.statistical_handler.perform_kruskal_test)
+        kruskal_action.triggered.connect(self.action_handler.statistical_action("perform_kruskal_test"))
         analysis_menu.addAction(kruskal_action)
         
         analysis_menu.addSeparator()
         analysis_menu.addSection("Assess Associations & Relationships")
         spearman_action = QAction("Correlation (Spearman)...", self)
-        spearman_action.triggered.connect(self.action_handler.statistical_handler.perform_spearman_correlation)
+        spearman_action.triggered.connect(self.action_handler.statistical_action("perform_spearman_correlation"))
         analysis_menu.addAction(spearman_action)
 
         chi_squared_action = QAction("Chi-squared Test...", self)
-        chi_squared_action.triggered.connect(self.action_handler.statistical_handler.perform_chi_squared_test)
+        chi_squared_action.triggered.connect(self.action_handler.statistical_action("perform_chi_squared_test"))
         analysis_menu.addAction(chi_squared_action)
 
         regression_action = QAction("Regression...", self)
-        regression_action.triggered.connect(self.action_handler.statistical_handler.perform_regression)
+        regression_action.triggered.connect(self.action_handler.statistical_action("perform_regression"))
         analysis_menu.addAction(regression_action)
 
         analysis_menu.addSeparator()
         analysis_menu.addSection("Distribution Tests")
         shapiro_test_action = QAction("Shapiro-Wilk Normality Test...", self)
-        shapiro_test_action.triggered.connect(self.action_handler.statistical_handler.perform_shapiro_test)
+        shapiro_test_action.triggered.connect(self.action_handler.statistical_action("perform_shapiro_test"))
         analysis_menu.addAction(shapiro_test_action)
 
         help_menu = menu_bar.addMenu("Help")
         license_action = QAction("Licenses...", self)
         license_action.triggered.connect(self.action_handler.show_license_dialog)
         help_menu.addAction(license_action)
+        
+        help_menu.addSeparator()
+        self.profiling_action = QAction("Show Profiling Panel", self)
+        self.profiling_action.setCheckable(True)
+        self.profiling_action.toggled.connect(self.set_profiling_visible)
+        help_menu.addAction(self.profiling_action)
+
+    def set_profiling_visible(self, visible):
+        """
+        処理時間の計測パネルとステータスバーの内訳を表示し、計測を有効にする（非表示にすると無効にする）。
+        計測はアプリケーション全体で共通。
+        """
+        if self.profiling_dock is None:
+            self.profiling_widget = ProfilingWidget()
+            self.profiling_dock = QDockWidget("Profiling", self)
+            self.profiling_dock.setWidget(self.profiling_widget)
+            # 閉じる操作はメニューに一本化する
+            self.profiling_dock.setFeatures(
+                QDockWidget.DockWidgetFeature.DockWidgetMovable | QDockWidget.DockWidgetFeature.DockWidgetFloatable
+            )
+            self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.profiling_dock)
+            self.statusBar().addPermanentWidget(self.profiling_widget.status_label)
+        
+        self.profiling_dock.setVisible(visible)
+        self.profiling_widget.status_label.setVisible(visible)
+        if visible:
+            self.profiling_widget.start()
+        else:
+            self.profiling_widget.stop()
 
     def _create_toolbar(self):
         toolbar = QToolBar("Graph Type")
@@ -376,7 +425,7 @@ class MainWindow(QMainWindow):
             new_text = self.header_editor.text()
             model = self.table_view.model()
             model.setHeaderData(logicalIndex, Qt.Orientation.Horizontal, new_text, Qt.ItemDataRole.EditRole)
-            self.data_widget.set_columns(model._data.columns)
+            self.data_widget.set_columns(model.columns())
             self.header_editor.close(); self.header_editor = None
 
 
@@ -501,7 +550,7 @@ class MainWindow(QMainWindow):
 
 
     def show_table_context_menu(self, position):
-        if not hasattr(self, 'model'): return
+        if self.model is None: return
         menu = QMenu()
         copy_action = QAction("Copy", self)
         copy_action.triggered.connect(self.copy_selection)
@@ -517,6 +566,10 @@ class MainWindow(QMainWindow):
         insert_col_right_action.triggered.connect(lambda: self.insert_col(left=False))
         remove_col_action = QAction("Remove Selected Column(s)", self); remove_col_action.triggered.connect(self.remove_col)
         
+        restore_order_action = QAction("Restore Original Order", self)
+        restore_order_action.triggered.connect(self.model.reset_sort)
+        restore_order_action.setEnabled(self.model.is_sorted())
+        
         fill_down_action = QAction("Fill Down", self)
         fill_down_action.triggered.connect(self.fill_down)
         # 選択されているセルが2つ未満の場合は無効化する
@@ -527,6 +580,7 @@ class MainWindow(QMainWindow):
         menu.addAction(paste_action)
         menu.addSeparator()
         menu.addAction(create_table_action)
+        menu.addAction(restore_order_action)
         menu.addSeparator()
         menu.addAction(fill_down_action)
         menu.addSeparator()
@@ -543,7 +597,7 @@ class MainWindow(QMainWindow):
             self.properties_widget.format_tab.update_subgroup_color_ui([])
             return
         try:
-            unique_categories = self.model._data[column_name].unique()
+            unique_categories = self.model.column_data([column_name])[column_name].unique()
             self.properties_widget.format_tab.update_subgroup_color_ui(sorted(unique_categories))
         except KeyError:
             self.properties_widget.format_tab.update_subgroup_color_ui([])
@@ -1,40 +1,214 @@
 # pandas_model.py
 
+import itertools
+
+import numpy as np
 import pandas as pd
 from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
 
+# 表示用文字列をまとめて生成する単位（おおよそ1画面分の行数）
+_DISPLAY_BLOCK_SIZE = 256
+
+# データの版数。すべてのモデルで共通のカウンタから採番するため、異なるモデル間でも重複しない
+_DATA_VERSIONS = itertools.count(1)
+
+
 class PandasModel(QAbstractTableModel):
     """
     pandasのDataFrameをQTableViewで表示・編集するためのモデルクラス。
     QAbstractTableModelを継承し、必要なメソッドをオーバーライドしている。
+
+    rowsを指定した場合は、dataのそれらの行だけを表す派生テーブル（ビュー）になる。
+    ビューは元のDataFrameの浅いコピーを保持してメモリを共有し（pandas 3のCopy-on-Writeにより元の表の編集は反映されない）、
+    表示・統計・グラフに必要な列だけをその都度取り出し（column_data）、_dataに初めてアクセスしたとき（編集など）に行を実体化する。
     """
-    def __init__(self, data):
+    def __init__(self, data, rows=None):
         super().__init__()
-        self._data = data
+        if rows is None:
+            self._data = data
+        else:
+            self._frame = None
+            self._source = data.copy(deep=False)
+            self._rows = np.asarray(rows, dtype=np.intp)
         self._sort_column = -1
         self._sort_order = Qt.SortOrder.AscendingOrder
+        # 表示行 -> 実データ行の対応（Noneなら元の並び順）
+        self._row_order = None
+        # (列番号, 昇順かどうか) -> 並べ替え後の実データ行の配列
+        self._sort_cache = {}
+        # 列番号 -> (値の配列, 表示文字列の配列, 整形済みフラグの配列)
+        self._display_cache = {}
+        # データ・列名・表示順が変更されるたびに更新される版数
+        self._data_version = next(_DATA_VERSIONS)
+        # 行や列の構成・列名が変更されるたびに更新される版数
+        self._structure_version = self._data_version
+        # 列名 -> セルの編集後の版数（構成の変更後に編集されていない列は_structure_versionを使う）
+        self._column_versions = {}
+
+    @property
+    def _data(self):
+        """モデルのDataFrame。ビューの場合は、初めてのアクセス時に行を取り出して実体化する。"""
+        if self._frame is None:
+            self._frame = self._source.iloc[self._rows].reset_index(drop=True)
+            self._source = None
+            self._rows = None
+        return self._frame
+
+    @_data.setter
+    def _data(self, data):
+        self._frame = data
+        self._source = None
+        self._rows = None
+
+    def is_view(self):
+        """元の表の行を参照したまま、まだ実体化していないビューかどうかを返す"""
+        return self._frame is None
+
+    def columns(self):
+        """列名を返す（ビューを実体化しない）"""
+        return self._source.columns if self.is_view() else self._frame.columns
+
+    def schema(self):
+        """列名と型だけを持つ、0行のDataFrameを返す（ビューを実体化しない）。ダイアログの列の選択肢などに使う。"""
+        return self._source.iloc[:0] if self.is_view() else self._frame.iloc[:0]
+
+    def column_data(self, columns):
+        """
+        指定した列だけのDataFrameを、DataFrame上の行の順で返す。
+        ビューの場合も実体化せず、指定した列の対象の行だけを取り出す。統計や描画など、読み取りだけの処理に使う。
+        """
+        columns = list(columns)
+        if self.is_view():
+            return self._source[columns].iloc[self._rows].reset_index(drop=True)
+        return self._frame[columns]
+
+    def derived_view(self, rows):
+        """
+        このモデルのDataFrame上の行位置rowsを参照するビューを作成する。
+        このモデル自体がビューの場合も実体化せず、元の表の行を直接参照する。
+        """
+        if self.is_view():
+            return PandasModel(self._source, rows=self._rows[np.asarray(rows, dtype=np.intp)])
+        return PandasModel(self._frame, rows=rows)
+
+    def _column(self, col):
+        """列番号の列をSeriesで返す。ビューの場合は、その列の対象の行だけを取り出す。"""
+        if self.is_view():
+            return self._source.iloc[self._rows, col].reset_index(drop=True)
+        return self._frame.iloc[:, col]
+
+    def data_version(self):
+        """
+        データの版数を返す。値・列名・行や列の構成・並び順のいずれかが変わると更新される。
+        版数はモデル間でも重複しないため、グラフの再描画やキャッシュの判定にそのまま使える。
+        """
+        return self._data_version
+
+    def column_version(self, column):
+        """
+        列の版数を返す。その列の値、または行や列の構成・列名が変わると更新される。
+        表示上の並べ替えや他の列の編集では変わらないため、列単位のキャッシュの判定に使える。
+        """
+        return self._column_versions.get(column, self._structure_version)
+
+    def _mark_structure_changed(self):
+        """行や列の構成・列名の変更を記録し、すべての列の版数を更新する"""
+        self._data_version = next(_DATA_VERSIONS)
+        self._structure_version = self._data_version
+        self._column_versions.clear()
 
     def rowCount(self, parent=None):
         """行数を返す"""
-        return self._data.shape[0]
+        return len(self._rows) if self.is_view() else self._frame.shape[0]
 
     def columnCount(self, parent=None):
         """列数を返す"""
-        return self._data.shape[1]
+        return len(self.columns())
 
     def data(self, index, role=Qt.ItemDataRole.DisplayRole):
         """指定されたインデックスとロールに対応するデータを返す"""
         if index.isValid() and role == Qt.ItemDataRole.DisplayRole:
-            return str(self._data.iloc[index.row(), index.column()])
+            return self._display_text(index.row(), index.column())
         return None
 
+    def _display_text(self, row, col):
+        """
+        セルの表示文字列を返す。
+        未整形の場合は、そのセルを含むブロック単位でまとめて文字列化してキャッシュする。
+        """
+        values, strings, formatted = self._display_column(col)
+        data_row = self._data_row(row)
+        if not formatted[data_row]:
+            start = row - row % _DISPLAY_BLOCK_SIZE
+            rows = np.arange(start, min(start + _DISPLAY_BLOCK_SIZE, len(values)))
+            if self._row_order is not None:
+                rows = self._row_order[rows]
+            rows = rows[~formatted[rows]]
+            strings[rows] = [str(value) for value in values[rows]]
+            formatted[rows] = True
+        return strings[data_row]
+
+    def _data_row(self, row):
+        """表示上の行番号を、DataFrame上の行位置に変換する"""
+        if self._row_order is None:
+            return row
+        return int(self._row_order[row])
+
+    def data_rows(self, rows):
+        """表示上の行番号のリストを、DataFrame上の行位置のリストに変換する"""
+        if self._row_order is None:
+            return list(rows)
+        return [int(self._row_order[row]) for row in rows]
+
+    def view_data(self, columns=None):
+        """
+        表示されている並び順のDataFrameを返す。columnsを指定した場合は、それらの列だけを返す（ビューを実体化しない）。
+        並べ替えておらず列も指定しない場合は、コピーせずに元のDataFrameをそのまま返す。
+        """
+        data = self._data if columns is None else self.column_data(columns)
+        if self._row_order is None:
+            return data
+        return data.iloc[self._row_order].reset_index(drop=True)
+
+    def _display_column(self, col):
+        """列ごとの表示キャッシュを取得する（なければ作成する）"""
+        cache = self._display_cache.get(col)
+        if cache is None:
+            values = self._column_values(self._column(col))
+            strings = np.empty(len(values), dtype=object)
+            formatted = np.zeros(len(values), dtype=bool)
+            cache = (values, strings, formatted)
+            self._display_cache[col] = cache
+        return cache
+
+    @staticmethod
+    def _column_values(series):
+        """
+        列の値をNumPy配列として取り出す。
+        日時やカテゴリなどはilocと同じ表示になるようPythonオブジェクトに変換する。
+        """
+        dtype = series.dtype
+        if isinstance(dtype, np.dtype) and dtype.kind not in 'mM':
+            return series.to_numpy()
+        return series.astype(object).to_numpy()
+
+    def invalidate_display_cache(self, column=None):
+        """表示キャッシュを破棄する。columnを省略した場合は全列を破棄する。"""
+        if column is None:
+            self._display_cache.clear()
+        else:
+            self._display_cache.pop(column, None)
+
     def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
         """ヘッダーのデータを返す"""
         if role == Qt.ItemDataRole.DisplayRole:
             if orientation == Qt.Orientation.Horizontal:
-                return str(self._data.columns[section])
+                return str(self.columns()[section])
             if orientation == Qt.Orientation.Vertical:
-                return str(self._data.index[section])
+                if self.is_view():
+                    # ビューの行番号は、実体化したとき（reset_index後）の行番号と同じ
+                    return str(self._data_row(section))
+                return str(self._frame.index[self._data_row(section)])
         return None
 
     def setHeaderData(self, section, orientation, value, role):
@@ -45,42 +219,124 @@ class PandasModel(QAbstractTableModel):
             new_columns = self._data.columns.tolist()
             new_columns[section] = value
             self._data.columns = new_columns
+            self.invalidate_display_cache(section)
+            self._mark_structure_changed()
             self.headerDataChanged.emit(orientation, section, section)
             return True
         return super().setHeaderData(section, orientation, value, role)
 
     def sort(self, column, order):
-        """DataFrameをソートする"""
+        """
+        指定した列で表示順を並べ替える。
+        DataFrame自体は並べ替えず、表示行と実データ行の対応だけを差し替える。
+        """
+        if column == self._sort_column and order == self._sort_order and self._row_order is not None:
+            return
+        
         try:
-            col_name = self._data.columns[column]
+            ascending = (order == Qt.SortOrder.AscendingOrder)
+            row_order = self._sort_cache.get((column, ascending))
+            if row_order is None:
+                row_order = self._column(column).reset_index(drop=True).sort_values(
+                    ascending=ascending,
+                    kind='mergesort'
+                ).index.to_numpy()
+                self._sort_cache[(column, ascending)] = row_order
             
             self.layoutAboutToBeChanged.emit()
-            self._data = self._data.sort_values(
-                by=col_name,
-                ascending=(order == Qt.SortOrder.AscendingOrder),
-                kind='mergesort'
-            ).reset_index(drop=True)
+            self._row_order = row_order
+            self._sort_column = column
+            self._sort_order = order
+            self._data_version = next(_DATA_VERSIONS)
             self.layoutChanged.emit()
             
         except Exception as e:
             print(f"Sort error: {e}")
 
+    def reset_sort(self):
+        """並べ替えを解除し、元の行の並び順に戻す"""
+        if self._row_order is None:
+            return
+        self.layoutAboutToBeChanged.emit()
+        self._row_order = None
+        self._sort_column = -1
+        self._data_version = next(_DATA_VERSIONS)
+        self.layoutChanged.emit()
+
+    def is_sorted(self):
+        """並べ替えが適用されているかどうかを返す"""
+        return self._row_order is not None
+
+    def _invalidate_sort_cache(self, column=None):
+        """並べ替え結果のキャッシュを破棄する。columnを省略した場合は全列を破棄する。"""
+        if column is None:
+            self._sort_cache.clear()
+        else:
+            for key in [key for key in self._sort_cache if key[0] == column]:
+                del self._sort_cache[key]
+
+    def _apply_row_order(self):
+        """
+        行の挿入・削除の前に、現在の表示順をDataFrameに反映させる。
+        """
+        if self._row_order is None:
+            return
+        self._data = self._data.iloc[self._row_order].reset_index(drop=True)
+        self._row_order = None
+        self._sort_column = -1
+        self._invalidate_sort_cache()
+        self.invalidate_display_cache()
+
     def setData(self, index, value, role):
         """
         ユーザーによってセルのデータが編集されたときに呼び出される。
         """
         if role == Qt.ItemDataRole.EditRole:
+            row = self._data_row(index.row())
             try:
-                original_value = self._data.iloc[index.row(), index.column()]
+                original_value = self._data.iloc[row, index.column()]
                 value = type(original_value)(value)
-                self._data.iloc[index.row(), index.column()] = value
+                self._data.iloc[row, index.column()] = value
             except (ValueError, TypeError):
-                self._data.iloc[index.row(), index.column()] = value
+                self._data.iloc[row, index.column()] = value
             
+            self.invalidate_display_cache(index.column())
+            self._invalidate_sort_cache(index.column())
+            self._data_version = next(_DATA_VERSIONS)
+            self._column_versions[self._data.columns[index.column()]] = self._data_version
             self.dataChanged.emit(index, index)
             return True
         return False
 
+    def set_column(self, name, values):
+        """
+        列の値をまとめて設定する。列がなければ末尾に追加する。
+        その列の版数だけを更新するため、他の列に依存するキャッシュはそのまま使える。
+        """
+        columns = self._data.columns
+        if name in columns and not isinstance(columns.get_loc(name), int):
+            # 同じ名前の列が複数ある場合は、構成の変更として扱う
+            self._data[name] = values
+            self.refresh_model()
+            return
+
+        if name in columns:
+            col = columns.get_loc(name)
+            self._data[name] = values
+            self.invalidate_display_cache(col)
+            self._invalidate_sort_cache(col)
+            self._data_version = next(_DATA_VERSIONS)
+            self._column_versions[name] = self._data_version
+            self.dataChanged.emit(self.index(0, col), self.index(max(len(self._data) - 1, 0), col))
+            return
+
+        col = len(columns)
+        self.beginInsertColumns(QModelIndex(), col, col)
+        self._data[name] = values
+        self._data_version = next(_DATA_VERSIONS)
+        self._column_versions[name] = self._data_version
+        self.endInsertColumns()
+
     def flags(self, index):
         """すべてのセルを編集可能にするためのフラグを返す"""
         return super().flags(index) | Qt.ItemFlag.ItemIsEditable
@@ -90,10 +346,17 @@ class PandasModel(QAbstractTableModel):
         DataFrameの構造が大きく変更された後（列の追加・削除など）に
         ビュー全体を更新するために呼び出す。
         """
+        if self._row_order is not None and len(self._row_order) != self.rowCount():
+            self._row_order = None
+            self._sort_column = -1
+        self._invalidate_sort_cache()
+        self.invalidate_display_cache()
+        self._mark_structure_changed()
         self.layoutChanged.emit()
 
     def insertRows(self, row, count, parent=QModelIndex()):
         """指定された位置に行を挿入する"""
+        self._apply_row_order()
         self.beginInsertRows(parent, row, row + count - 1)
         
         df_top = self._data.iloc[:row]
@@ -101,16 +364,21 @@ class PandasModel(QAbstractTableModel):
         df_new = pd.DataFrame(index=range(count), columns=self._data.columns).fillna('')
         
         self._data = pd.concat([df_top, df_new, df_bottom]).reset_index(drop=True)
+        self.invalidate_display_cache()
+        self._mark_structure_changed()
         
         self.endInsertRows()
         return True
 
     def removeRows(self, row, count, parent=QModelIndex()):
         """指定された位置の行を削除する"""
+        self._apply_row_order()
         self.beginRemoveRows(parent, row, row + count - 1)
         
         self._data.drop(self._data.index[row:row+count], inplace=True)
         self._data.reset_index(drop=True, inplace=True)
+        self.invalidate_display_cache()
+        self._mark_structure_changed()
         
         self.endRemoveRows()
         return True
@@ -122,6 +390,10 @@ class PandasModel(QAbstractTableModel):
         for i in range(count):
             new_col_name = f"Unnamed_{len(self._data.columns) + i}"
             self._data.insert(col + i, new_col_name, '')
+        self._sort_column = -1
+        self._invalidate_sort_cache()
+        self.invalidate_display_cache()
+        self._mark_structure_changed()
 
         self.endInsertColumns()
         return True
@@ -132,6 +404,10 @@ class PandasModel(QAbstractTableModel):
 
         cols_to_drop = self._data.columns[col:col+count]
         self._data.drop(columns=cols_to_drop, inplace=True)
+        self._sort_column = -1
+        self._invalidate_sort_cache()
+        self.invalidate_display_cache()
+        self._mark_structure_changed()
 
         self.endRemoveColumns()
         return True
\ No newline at end of file
@@ -0,0 +1,178 @@
+# profiling.py
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+
+# この環境変数が設定されている場合は、起動時から計測を有効にする
+PROFILE_ENV = "CALCITE_PROFILE"
+
+# 保持する計測結果の件数の上限（古いものから破棄する）
+MAX_PROFILE_EVENTS = 20000
+
+_enabled = bool(os.environ.get(PROFILE_ENV))
+_lock = threading.Lock()
+# 計測結果（区間）の記録。Chrome tracing形式の出力と、最近の処理の内訳の表示に使う
+_events = deque(maxlen=MAX_PROFILE_EVENTS)
+# 区間名 -> 集計（件数・合計・直近・最大）。記録の上限で破棄された区間も含む
+_stats = {}
+# スレッドID -> スレッド名
+_thread_names = {}
+# スレッドごとの、実行中の区間の入れ子の深さ
+_local = threading.local()
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    """spanが返す、計測中の区間。終了時に結果を記録する。"""
+    __slots__ = ("name", "category", "args", "start", "depth")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.depth = getattr(_local, "depth", 0)
+        _local.depth = self.depth + 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        _local.depth = self.depth
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        _record(self.name, self.category, self.start, end - self.start, self.depth, self.args)
+        return False
+
+
+def _record(name, category, start, duration, depth, args):
+    thread = threading.current_thread()
+    event = {
+        "name": name, "cat": category, "start": start, "dur": duration,
+        "tid": thread.ident, "depth": depth, "args": args,
+    }
+    with _lock:
+        _thread_names.setdefault(thread.ident, thread.name)
+        _events.append(event)
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = {"category": category, "count": 0, "total": 0.0, "last": 0.0, "max": 0.0}
+        stats["count"] += 1
+        stats["total"] += duration
+        stats["last"] = duration
+        stats["max"] = max(stats["max"], duration)
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(enabled):
+    """計測の有効・無効を切り替える。無効の間、spanとprofiledはほとんど負荷がかからない。"""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def span(name, category="app", **args):
+    """
+    処理の区間の時間を計測するコンテキストマネージャを返す。
+    `with span("copy_data", "data"):` のように使う。argsはChrome tracingの出力に含まれる。
+    計測が無効の場合は何もしない。
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def profiled(name=None, category="app"):
+    """
+    関数の実行時間を計測するデコレータ。nameを省略した場合は関数の修飾名を使う。
+    計測が無効の場合は、そのまま関数を呼び出す。
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def clear():
+    """記録した計測結果と集計を破棄する"""
+    with _lock:
+        _events.clear()
+        _stats.clear()
+
+
+def summary():
+    """区間名 -> 集計の辞書のコピーを返す。集計は count, total, last, max（秒）と category。"""
+    with _lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def recent_breakdowns(limit=3):
+    """
+    最近終了した最上位の区間を、名前ごとに最新の1件ずつ最大limit件、終了順に返す。
+    各要素は (区間, その中で実行された1段下の区間のリスト)。
+    """
+    with _lock:
+        events = list(_events)
+    breakdowns = []
+    seen = set()
+    for i in range(len(events) - 1, -1, -1):
+        root = events[i]
+        if root["depth"] != 0 or root["name"] in seen:
+            continue
+        seen.add(root["name"])
+        # 入れ子の区間は外側の区間より先に終了して記録されるため、終了時刻が外側の開始より前になるまで遡る
+        children = []
+        for j in range(i - 1, -1, -1):
+            event = events[j]
+            if event["start"] + event["dur"] < root["start"]:
+                break
+            if event["tid"] == root["tid"] and event["depth"] == 1 and event["start"] >= root["start"]:
+                children.append(event)
+        breakdowns.append((root, children[::-1]))
+        if len(breakdowns) >= limit:
+            break
+    return breakdowns[::-1]
+
+
+def export_chrome_trace(file_path):
+    """
+    記録した計測結果を、Chrome tracing（chrome://tracing, Perfetto）で読み込めるJSONファイルに書き出す。
+    書き出した区間の数を返す。
+    """
+    with _lock:
+        events = list(_events)
+        thread_names = dict(_thread_names)
+    pid = os.getpid()
+    origin = min((event["start"] for event in events), default=0.0)
+
+    trace_events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "Calcite"}}]
+    trace_events.extend(
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}}
+        for tid, thread_name in thread_names.items()
+    )
+    trace_events.extend(
+        {
+            "name": event["name"], "cat": event["cat"], "ph": "X", "pid": pid, "tid": event["tid"],
+            "ts": (event["start"] - origin) * 1e6, "dur": event["dur"] * 1e6,
+            "args": {key: str(value) for key, value in event["args"].items()},
+        }
+        for event in events
+    )
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+    return len(events)
@@ -0,0 +1,119 @@
+# profiling_widget.py
+
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+    QHeaderView, QFileDialog, QMessageBox
+)
+from PySide6.QtCore import Qt, QTimer
+
+from . import profiling
+
+# 表示を更新する間隔（ミリ秒）
+REFRESH_INTERVAL_MS = 500
+
+# ステータスバーに内訳を表示する、1段下の区間の件数
+STATUS_CHILDREN = 4
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}"
+
+
+class ProfilingWidget(QWidget):
+    """
+    計測した処理時間（calcite.profiling）を表示するパネル。
+    区間ごとの件数・直近・平均・最大の時間を一覧にし、Chrome tracing形式で書き出せる。
+    status_labelには、最近の処理とその内訳を1行で表示する（ステータスバーに配置する）。
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(5, 5, 5, 5)
+
+        self.table = QTableWidget(0, 6)
+        self.table.setHorizontalHeaderLabels(["Span", "Category", "Count", "Last (ms)", "Mean (ms)", "Max (ms)"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSortingEnabled(True)
+
+        clear_button = QPushButton("Clear")
+        export_button = QPushButton("Export Chrome Trace...")
+        clear_button.clicked.connect(self.clear)
+        export_button.clicked.connect(self.export_trace)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        button_layout.addWidget(clear_button)
+        button_layout.addWidget(export_button)
+
+        main_layout.addWidget(self.table)
+        main_layout.addLayout(button_layout)
+
+        self.status_label = QLabel()
+
+        # 記録は描画用スレッドなどからも行われるため、一定間隔で集計を読み取って表示する
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_INTERVAL_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def start(self):
+        """計測を有効にし、表示の更新を始める"""
+        profiling.set_enabled(True)
+        self._timer.start()
+        self.refresh()
+
+    def stop(self):
+        """計測を無効にし、表示の更新を止める（記録済みの結果は残す）"""
+        profiling.set_enabled(False)
+        self._timer.stop()
+        self.status_label.clear()
+
+    def refresh(self):
+        """集計の一覧とステータスバーの表示を更新する"""
+        stats = profiling.summary()
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(stats))
+        for row, (name, item) in enumerate(sorted(stats.items(), key=lambda entry: -entry[1]["total"])):
+            cells = [
+                name, item["category"], item["count"],
+                item["last"] * 1000, item["total"] / item["count"] * 1000, item["max"] * 1000,
+            ]
+            for column, value in enumerate(cells):
+                cell = QTableWidgetItem()
+                if isinstance(value, float):
+                    cell.setData(Qt.ItemDataRole.DisplayRole, round(value, 1))
+                else:
+                    cell.setData(Qt.ItemDataRole.DisplayRole, value)
+                self.table.setItem(row, column, cell)
+        self.table.setSortingEnabled(True)
+
+        parts = []
+        for root, children in profiling.recent_breakdowns():
+            text = f"{root['name']} {_ms(root['dur'])} ms"
+            children = sorted(children, key=lambda event: -event["dur"])[:STATUS_CHILDREN]
+            if children:
+                text += " (" + ", ".join(f"{child['name']} {_ms(child['dur'])}" for child in children) + ")"
+            parts.append(text)
+        self.status_label.setText(" | ".join(parts))
+
+    def clear(self):
+        profiling.clear()
+        self.refresh()
+
+    def export_trace(self):
+        """記録した計測結果をChrome tracing形式のJSONファイルに書き出す"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Export Chrome Trace", "calcite-trace.json", "Trace Files (*.json);;All Files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            count = profiling.export_chrome_trace(file_path)
+            QMessageBox.information(
+                self, "Success",
+                f"Exported {count} spans to:\n{file_path}\n\nOpen it in chrome://tracing or https://ui.perfetto.dev."
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to export trace: {e}")
@@ -1,6 +1,6 @@
 # results_widget.py (新規作成)
 
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QTextEdit, QLabel
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QTextEdit, QLabel, QProgressBar
 from PySide6.QtGui import QFont
 
 class ResultsWidget(QWidget):
@@ -22,7 +22,12 @@ class ResultsWidget(QWidget):
         font = QFont("Courier New")
         self.results_text_edit.setFont(font)
 
+        # 時間のかかる解析の進捗表示（解析中のみ表示する）
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+
         main_layout.addWidget(title_label)
+        main_layout.addWidget(self.progress_bar)
         main_layout.addWidget(self.results_text_edit)
 
     def set_results_text(self, text):
@@ -35,4 +40,19 @@ class ResultsWidget(QWidget):
         """
         パネルのテキストをクリアする。
         """
-        self.results_text_edit.clear()
\ No newline at end of file
+        self.results_text_edit.clear()
+
+    def show_progress(self, label, done, total):
+        """
+        解析の進捗を表示する。labelは進捗バーに表示する処理名。
+        """
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(done)
+        self.progress_bar.setFormat(f"{label}: %v / %m")
+        self.progress_bar.setVisible(True)
+
+    def hide_progress(self):
+        """
+        進捗表示を隠す。
+        """
+        self.progress_bar.setVisible(False)
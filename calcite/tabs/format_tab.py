@@ -6,7 +6,11 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Signal
 from functools import partial
-import seaborn as sns
+
+from ..lazy_imports import LazyModule
+
+# seabornは読み込みに時間がかかるため、パレットを初めて作成するときに読み込む
+sns = LazyModule("seaborn")
 
 class NoScrollComboBox(QComboBox):
     """
@@ -93,6 +97,13 @@ class FormatTab(QWidget):
         self.marker_edgewidth_spin.setRange(0, 10); self.marker_edgewidth_spin.setSingleStep(0.5); self.marker_edgewidth_spin.setValue(1.0)
         marker_layout.addRow(QLabel("Edge Width:"), self.marker_edgewidth_spin)
         
+        # 点が非常に多い散布図は、画素単位で集計した密度画像として描く
+        self.scatter_mode_combo = NoScrollComboBox()
+        self.scatter_mode_combo.addItem("Auto (density for large data)", "auto")
+        self.scatter_mode_combo.addItem("Always Markers", "markers")
+        self.scatter_mode_combo.addItem("Always Density", "density")
+        marker_layout.addRow(QLabel("Scatter Rendering:"), self.scatter_mode_combo)
+        
         elements_layout.addWidget(marker_sub_group)
 
         # --- 2b. Bars のサブグループ ---
@@ -190,6 +201,7 @@ class FormatTab(QWidget):
         self.marker_edgewidth_spin.valueChanged.connect(lambda: self.propertiesChanged.emit())
         self.marker_size_spin.valueChanged.connect(lambda: self.propertiesChanged.emit())
         self.marker_alpha_spin.valueChanged.connect(lambda: self.propertiesChanged.emit())
+        self.scatter_mode_combo.currentIndexChanged.connect(lambda: self.propertiesChanged.emit())
         self.linestyle_combo.currentIndexChanged.connect(lambda: self.propertiesChanged.emit())
         self.bar_edgewidth_spin.valueChanged.connect(lambda: self.propertiesChanged.emit())
         self.capsize_spin.valueChanged.connect(lambda: self.propertiesChanged.emit())
@@ -212,6 +224,7 @@ class FormatTab(QWidget):
             'marker_edgewidth': self.marker_edgewidth_spin.value(),
             'marker_size': self.marker_size_spin.value(),
             'marker_alpha': self.marker_alpha_spin.value(),
+            'scatter_mode': self.scatter_mode_combo.currentData(),
 
             # Bar properties
             'bar_edgecolor': self.current_bar_edgecolor,
@@ -242,6 +255,9 @@ class FormatTab(QWidget):
         self.marker_edgewidth_spin.setValue(props.get('marker_edgewidth', 1.0))
         self.marker_size_spin.setValue(props.get('marker_size', 5.0))
         self.marker_alpha_spin.setValue(props.get('marker_alpha', 1.0))
+        scatter_mode_index = self.scatter_mode_combo.findData(props.get('scatter_mode', 'auto'))
+        if scatter_mode_index != -1:
+            self.scatter_mode_combo.setCurrentIndex(scatter_mode_index)
         
         # Line properties
         self.linestyle_combo.setCurrentText(props.get('linestyle', '-'))
@@ -19,14 +19,15 @@ setuptools.setup(
     # アプリケーションが依存するライブラリ
     install_requires=[
         "PySide6",
-        "pandas",
+        "pandas>=3", # PandasModelのビューとグラフのスナップショットがCopy-on-Writeを前提にしている
         "numpy",
         "seaborn",
         "scipy",
         "statsmodels",
         "scikit-posthocs",
-        "statannotations",
-        "matplotlib"
+        "statannotations>=0.7,<0.8", # graph_renderer._patch_statannotationsが0.7系の構成を前提にしている
+        "matplotlib",
+        "pyarrow"
     ],
 
     # 'calcite'コマンドでアプリを起動する
@@ -45,5 +46,5 @@ setuptools.setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.10',
+    python_requires='>=3.11',
 )